@@ -1,62 +1,130 @@
 from dependencies.container import container
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+from functools import cache
 import logging
-import os
+import math
 
-from services.metrics_analyzer import MetricsAnalyser
+from config.settings import Settings
+from db.columnar import ColumnarResult
 from utils.logger import setup_logger
 from utils.sql import clean_sql
+from utils.tracing import record_cache, span
+
+SQL_TEMPLATE = """
+    Use schema to answer question. Return valid SQL only.
+    Schema:
+    {schema}
+
+    Question:
+    {question}
+    SQL Query:
+"""
+
+
+@cache
+def sql_prompt():
+    # LangChain is imported on the first generated query, not when the agent module loads
+    from langchain_core.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_template(SQL_TEMPLATE)
+
 
 class BaseAgent:
+    # Scheduler lane for this agent's LLM calls; cohort agents run as "bulk"
+    llm_lane = "interactive"
+
+    # Tables and columns described to the LLM; None sends the full reflected schema
+    schema_tables = {
+        "student_metrics": [
+            "user_id", "week", "homework_submitted", "homework_on_time", "homework_score",
+            "attendance", "student_participation", "teacher_participation", "test_score",
+        ],
+        "users": ["id", "email"],
+    }
+
     def __init__(self):
+        # Agents are process-wide singletons (container.student_analysis_agent etc.),
+        # so everything here is shared and built once
         self.llm = container.llm
-        self.db = container.sql_db
-        self.mycursor = container.mysql_connection.cursor()
-        self.metric_weights = {
-            "homework_submitted": float(os.getenv("WEIGHT_HOMEWORK_SUBMITTED", 0.1)),
-            "homework_on_time": float(os.getenv("WEIGHT_HOMEWORK_ON_TIME", 0.1)),
-            "homework_score": float(os.getenv("WEIGHT_HOMEWORK_SCORE", 0.2)),
-            "attendance": float(os.getenv("WEIGHT_ATTENDANCE", 0.2)),
-            "student_participation": float(os.getenv("WEIGHT_STUDENT_PARTICIPATION", 0.1)),
-            "teacher_participation": float(os.getenv("WEIGHT_TEACHER_PARTICIPATION", 0.1)),
-            "test_score": float(os.getenv("WEIGHT_TEST_SCORE", 0.1)),
-        }
-        self.analyser = MetricsAnalyser(llm=self.llm, metric_weights=self.metric_weights)
+        self.sql_cache = container.sql_cache
+        self.sql_guard = container.sql_guard
+        self.report_cache = container.report_cache
+        self.db_pool = container.db_pool
+        self.metric_weights = Settings.metric_weights()
+        self.analyser = container.metrics_analyser
+        self.queries = container.metrics_queries
+        # None unless SNAPSHOT_READS; fast-path reads then skip the database while a snapshot exists
+        self.snapshot = container.metrics_snapshot
+        self.use_fast_path = Settings.SQL_FAST_PATH
+        self.max_workers = Settings.ANALYSIS_MAX_WORKERS
+        self.item_timeout = Settings.ANALYSIS_ITEM_TIMEOUT
         self.logger = setup_logger(self.__class__.__name__)
 
+    @property
+    def db(self):
+        # Only the LLM SQL path needs SQLDatabase; building it connects and reflects
+        return container.sql_db
+
+    @property
+    def schema_cache(self):
+        return container.schema_cache
+
     def _get_schema(self, _: dict = None):
-        return self.db.get_table_info()
+        with span("schema"):
+            return self.schema_cache.get(self.schema_tables)
+
+    def _run_query(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with span("db"):
+            return self.db_pool.fetchall(sql, params)
+
+    def _run_columnar(self, sql: str, params: tuple = (), key_columns: int = 1) -> ColumnarResult:
+        with span("db"):
+            return self.db_pool.fetch_columnar(sql, params, key_columns=key_columns)
 
-    def _build_and_run(self, question: str, stop: str = None):
+    def _students_averages(self, emails: list[str], week_from: int, week_to: int) -> ColumnarResult:
+        """Averages per known email, from the snapshot when there is one, else with one query."""
+        if self.snapshot is not None:
+            with span("snapshot"):
+                averages = self.snapshot.student_averages(list(self.metric_weights), emails, week_from, week_to)
+            if averages is not None:
+                return averages
+
+        return self._run_columnar(*self.queries.students_averages(emails, week_from, week_to))
+
+    @staticmethod
+    def _to_floats(values) -> list[float]:
+        floats = [math.nan if value is None else float(value) for value in values]
+        if any(math.isnan(value) for value in floats):
+            raise ValueError("No metrics found for the given week range")
+
+        return floats
+
+    def _build_and_run(self, question: str, stop: str = None) -> list[tuple]:
         sql = self._run_llm_sql_chain(question, stop)
 
-        return self.db.run(sql)
+        # Typed rows straight from the cursor instead of SQLDatabase.run's string repr
+        return self._run_query(sql)
 
     def _run_llm_sql_chain(self, question: str, stop: str = None) -> str:
-        prompt = ChatPromptTemplate.from_template("""
-            Use schema to answer question. Return valid SQL only.
-            Schema:
-            {schema}
-
-            Question:
-            {question}
-            SQL Query:
-        """)
+        schema = self._get_schema()
+        model = getattr(self.llm, "model_name", None) or self.llm.__class__.__name__
+        cache_question = f"{question}\nstop={stop}" if stop else question
+
+        cached_sql = self.sql_cache.get(cache_question, schema, model)
+        record_cache("sql", "miss" if cached_sql is None else "hit")
+        if cached_sql is not None:
+            logging.info(f"Cached SQL:\n{cached_sql}")
+            # Plans change as the tables grow, so cached SQL is vetted again
+            return self._vet_sql(cached_sql)
+
         llm = self.llm
         if stop:
             llm = llm.bind(stop=stop)
 
         try:
-            chain = (
-                RunnablePassthrough.assign(schema=self._get_schema)
-                | prompt
-                | llm
-                | StrOutputParser()
-            )
+            from langchain_core.output_parsers import StrOutputParser
+            chain = sql_prompt() | llm | StrOutputParser()
 
-            response = chain.invoke({"question": question})
+            with span("sql_generation"):
+                response = chain.invoke({"schema": schema, "question": question})
 
             # Normalize to string safely
             if hasattr(response, "content"):
@@ -67,11 +135,23 @@ class BaseAgent:
             # Clean and log
             sql = clean_sql(raw_sql.strip())
             logging.info(f"Generated SQL:\n{sql}")
+            sql = self._vet_sql(sql)
+
+            self.sql_cache.set(cache_question, schema, model, sql)
 
             return sql
         except Exception as e:
             logging.error(f"Error: {e}")
             raise
 
+    def _vet_sql(self, sql: str) -> str:
+        if self.sql_guard is None:
+            return sql
+        with span("sql_guard"):
+            return self.sql_guard.vet(sql)
+
     def _analyse_metrics(self, parsed_result: list[float]) -> list[dict]:
-        return self.analyser.analyse(parsed_result)
\ No newline at end of file
+        return self.analyser.analyse(parsed_result)
+
+    def _analyse_metrics_many(self, rows: list[list[float]]) -> list:
+        return self.analyser.analyse_many(rows)
\ No newline at end of file
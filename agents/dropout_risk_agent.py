@@ -1,68 +1,150 @@
-import ast
 import time
 
 from agents.base import BaseAgent
+from db.columnar import ColumnarResult
+from services.llm_scheduler import llm_options
+from utils.concurrency import iter_bounded, run_bounded
+from utils.tracing import span
 
 class DropoutRiskAgent(BaseAgent):
-    def _get_user_ids(self, metric_type: str, week_from: int, week_to: int, num_students: int = 1):
-        # Build SQL query using LLM for top motivated students
-        self.logger.info("Build SQL query using LLM for top motivated students")
-        question = self._build_metrics_prompt(metric_type, week_from, week_to, num_students)
-        sql = self._run_llm_sql_chain(question)
-
-        self.logger.info(f"SQL for building metrics: {sql}")
-        self.mycursor.execute(sql)
-        rows = self.mycursor.fetchall()
-        self.logger.info(f"SQL result: {rows}")
-
-        if not rows:
+    llm_lane = "bulk"
+
+    def _get_user_ids(self, metric_type: str, week_from: int, week_to: int, num_students: int = 1) -> ColumnarResult:
+        """Ranked users as a ColumnarResult: user ids as keys, metric averages as the value matrix."""
+        if self.use_fast_path and self.snapshot is not None:
+            with span("snapshot"):
+                ranked = self.snapshot.top_students(
+                    list(self.metric_weights), metric_type, week_from, week_to, num_students
+                )
+            if ranked is not None:
+                self.logger.info(f"Snapshot ranking: {len(ranked)} users")
+                return ranked
+
+        if self.use_fast_path:
+            self.logger.info("Run compiled ranking query for top motivated students")
+            sql, params = self.queries.top_students(metric_type, week_from, week_to, num_students)
+        else:
+            # Build SQL query using LLM for top motivated students
+            self.logger.info("Build SQL query using LLM for top motivated students")
+            question = self._build_metrics_prompt(metric_type, week_from, week_to, num_students)
+            sql = self._run_llm_sql_chain(question)
+            params = ()
+
+            self.logger.info(f"SQL for building metrics: {sql}")
+
+        ranked = self._run_columnar(sql, params)
+        self.logger.info(f"SQL result: {len(ranked)} users")
+
+        if not len(ranked):
             self.logger.warning("No rows returned from SQL #1")
-            return []
 
-        return rows
+        return ranked
 
     def _get_users_by_ids(self, user_ids):
-        result = self._build_and_run(self._build_user_prompt_bulk(user_ids), stop="\nSQL Result:")
+        if not user_ids:
+            return {}
 
-        return {row[0]: row[1] for row in ast.literal_eval(result)}
+        if self.use_fast_path and self.snapshot is not None:
+            emails = self.snapshot.emails_by_ids(user_ids)
+            if emails is not None:
+                return emails
+
+        if self.use_fast_path:
+            rows = self._run_query(*self.queries.emails_by_ids(user_ids))
+        else:
+            rows = self._build_and_run(self._build_user_prompt_bulk(user_ids), stop="\nSQL Result:")
+
+        return {row[0]: row[1] for row in rows}
 
     def run_analysis(self, metric_type: str, week_from: int, week_to: int, num_students: int):
         start_time = time.time()
         self.logger.info("Start: motivated student analysis")
 
+        def compute(limit: int = num_students):
+            return self._rank_and_analyse(metric_type, week_from, week_to, limit)
+
+        with span("dropout_risk"), llm_options(lane=self.llm_lane):
+            if self.report_cache is not None:
+                key = self.report_cache.make_key("dropout_risk", week_from, week_to, self.metric_weights, metric_type)
+                # Cached in ranking order, so a larger cached report also answers a smaller N
+                ranked = self.report_cache.get_or_compute(key, week_from, week_to, compute, num_students=num_students)
+            else:
+                ranked = compute()
+
+        summary = self.sort_by_metric(ranked[:num_students], metric_type)
+
+        elapsed_time = time.time() - start_time
+        self.logger.info(f"Full analysis completed in {elapsed_time:.2f} seconds")
+
+        return summary
+
+    def iter_analysis(self, metric_type: str, week_from: int, week_to: int, num_students: int,
+                      ranked: list[tuple] = None):
+        """Yield ``(rank, item)`` as each student's analysis finishes, in completion order.
+
+        ``rank`` is the position in the SQL ranking, or in ``ranked`` when a
+        (possibly filtered) result of ``rank_students`` is passed in; failed
+        students are logged and skipped.
+        """
+        parsed = ranked
+        if parsed is None:
+            with llm_options(lane=self.llm_lane):
+                parsed = self.rank_students(metric_type, week_from, week_to, num_students)
+        rows = [metric_values for _, _, metric_values in parsed]
+
+        for rank, analysis in iter_bounded(self._analyse_in_lane, rows, max(1, self.max_workers)):
+            user_id, email, _ = parsed[rank]
+            if isinstance(analysis, Exception):
+                self.logger.error(f"Failed to analyse metrics for user_id={user_id}: {analysis}")
+                continue
+            yield rank, {"email": email, "student_analysis": analysis}
+
+    def _analyse_in_lane(self, metric_values):
+        with llm_options(lane=self.llm_lane):
+            return self._analyse_metrics(metric_values)
+
+    def _rank_and_analyse(self, metric_type: str, week_from: int, week_to: int, num_students: int) -> list[dict]:
+        parsed = self.rank_students(metric_type, week_from, week_to, num_students)
+
+        self.logger.info(f"Start analysing metrics for {len(parsed)} users")
+        rows = [metric_values for _, _, metric_values in parsed]
+        if self.max_workers > 1 and not self.analyser.prefers_batch:
+            analyses = run_bounded(self._analyse_metrics, rows, self.max_workers, self.item_timeout)
+        else:
+            # Score all users together so motivational messages are fetched in one batch
+            analyses = self._analyse_metrics_many(rows)
+
+        summary = []
+        for (user_id, email, _), analysis in zip(parsed, analyses):
+            if analysis is None or isinstance(analysis, Exception):
+                self.logger.error(f"Failed to analyse metrics for user_id={user_id}: {analysis}")
+                continue
+            summary.append({"email": email, "student_analysis": analysis})
+
+        return summary
+
+    def rank_students(self, metric_type: str, week_from: int, week_to: int, num_students: int) -> list[tuple]:
+        """Ranked ``(user_id, email, metric_values)`` of students with complete metrics, before analysis."""
         try:
             # Get user emails in bulk
-            users = self._get_user_ids(metric_type, week_from, week_to, num_students)
-            id_to_email = self._get_users_by_ids([row[0] for row in users])
+            with span("ranking"):
+                ranked = self._get_user_ids(metric_type, week_from, week_to, num_students)
+                id_to_email = self._get_users_by_ids(ranked.keys)
         except Exception as e:
             self.logger.error(f"Failed to parse email list: {e}")
             raise ValueError("Could not extract emails from result")
 
-        # Analyse each user individually
-        summary = []
-        for user in users:
-            try:
-                user_id = user[0]
-                metric_values = user[1:]
-                email = id_to_email.get(user_id, f"user-{user_id}@unknown.local")
-            except Exception as e:
-                self.logger.error(f"Parse error in row: {e}")
+        # Collect metrics per user; each metric row is a view into the ranking matrix
+        parsed = []
+        complete = ranked.complete_rows()
+        for user_id, metric_values, is_complete in zip(ranked.keys, ranked.values, complete):
+            if not is_complete:
+                self.logger.error(f"Missing metrics for user_id={user_id}")
                 continue
+            email = id_to_email.get(user_id, f"user-{user_id}@unknown.local")
+            parsed.append((user_id, email, metric_values))
 
-            try:
-                self.logger.info(f"Start analysing metrics for user_id={user_id}")
-                analysis = self._analyse_metrics(metric_values)
-                summary.append({"email": email, "student_analysis": analysis})
-            except Exception as e:
-                self.logger.error(f"Failed to analyse metrics for user_id={user_id}: {e}")
-                continue
-
-        summary = self.sort_by_metric(summary, metric_type)
-
-        elapsed_time = time.time() - start_time
-        self.logger.info(f"Full analysis completed in {elapsed_time:.2f} seconds")
-
-        return summary
+        return parsed
 
     def sort_by_metric(self, summary: list[dict], metric_type: str) -> list[dict]:
         reverse = True if metric_type == 'highest' else False
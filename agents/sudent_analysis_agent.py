@@ -1,7 +1,9 @@
-import ast
 import time
 import logging
 from agents.base import BaseAgent
+from config.settings import Settings
+from services.llm_scheduler import llm_options
+from utils.tracing import span
 
 class StudentAnalysisAgent(BaseAgent):
     def build_sql_prompt(self, email: str, week_from: int, week_to: int) -> str:
@@ -18,13 +20,34 @@ class StudentAnalysisAgent(BaseAgent):
         start_time = time.time()
         logging.info("Start analysis")
 
+        def compute(_: int = None):
+            return self._analyse_student(email, week_from, week_to)
+
+        with span("analyse_student"), llm_options(lane=self.llm_lane):
+            if self.report_cache is not None:
+                key = self.report_cache.make_key("analyse_student", week_from, week_to, self.metric_weights, email)
+                analysis = self.report_cache.get_or_compute(key, week_from, week_to, compute)
+            else:
+                analysis = compute()
+
+        elapsed_time = time.time() - start_time
+        logging.info(f"Full analysis completed in {elapsed_time:.2f} seconds")
+
+        return analysis
+
+    def _analyse_student(self, email: str, week_from: int, week_to: int) -> dict:
         try:
             logging.info("Start executing SQL query")
-            result = self._build_and_run(self.build_sql_prompt(email, week_from, week_to), stop="\nSQL Result:")
+            if self.use_fast_path and self.snapshot is not None:
+                rows = self._students_averages([email], week_from, week_to).values.tolist()
+            elif self.use_fast_path:
+                rows = self._run_query(*self.queries.student_averages(email, week_from, week_to))
+            else:
+                rows = self._build_and_run(self.build_sql_prompt(email, week_from, week_to), stop="\nSQL Result:")
 
-            # Parse result
-            logging.info("Start parsing result")
-            parsed = ast.literal_eval(result)[0]
+            if not rows:
+                raise ValueError("No metrics found for the given week range")
+            parsed = self._to_floats(rows[0])
             logging.info(f"Parsed result:\n{parsed}")
 
             # Analyse
@@ -34,7 +57,54 @@ class StudentAnalysisAgent(BaseAgent):
             logging.error(f"Error: {e}")
             raise
 
+        return analysis
+
+    def run_batch(self, emails: list[str], week_from: int, week_to: int) -> list[dict]:
+        """Analyse many students with one query and one scoring pass.
+
+        Returns one entry per distinct email, in the given order: either
+        ``{"email", "student_analysis"}`` or ``{"email", "error"}`` for unknown
+        addresses and students without metrics in the range. Always uses the
+        parameterized query; the LLM SQL path has no set-based equivalent.
+        """
+        emails = list(dict.fromkeys(email.strip() for email in emails if email and email.strip()))
+        if not emails:
+            raise ValueError("No emails given")
+        if len(emails) > Settings.ANALYSIS_BATCH_MAX_EMAILS:
+            raise ValueError(f"At most {Settings.ANALYSIS_BATCH_MAX_EMAILS} emails per request, got {len(emails)}")
+
+        start_time = time.time()
+        logging.info(f"Start batch analysis of {len(emails)} students")
+
+        def compute(_: int = None):
+            return self._analyse_students(emails, week_from, week_to)
+
+        with span("analyse_students"), llm_options(lane=self.llm_lane):
+            if self.report_cache is not None:
+                key = self.report_cache.make_key("analyse_students", week_from, week_to, self.metric_weights, *emails)
+                analysis = self.report_cache.get_or_compute(key, week_from, week_to, compute)
+            else:
+                analysis = compute()
+
         elapsed_time = time.time() - start_time
-        logging.info(f"Full analysis completed in {elapsed_time:.2f} seconds")
+        logging.info(f"Batch analysis completed in {elapsed_time:.2f} seconds")
+
+        return analysis
+
+    def _analyse_students(self, emails: list[str], week_from: int, week_to: int) -> list[dict]:
+        result = self._students_averages(emails, week_from, week_to)
+        analyses = self._analyse_metrics_many(result.values)
+
+        # Email comparison in MySQL is case-insensitive, so match the returned rows the same way
+        found = {email.lower(): analysis for email, analysis in zip(result.keys, analyses)}
 
-        return analysis
\ No newline at end of file
+        summary = []
+        for email in emails:
+            key = email.lower()
+            if key not in found:
+                summary.append({"email": email, "error": "Unknown email"})
+            elif found[key] is None:
+                summary.append({"email": email, "error": "No metrics found for the given week range"})
+            else:
+                summary.append({"email": email, "student_analysis": found[key]})
+        return summary
\ No newline at end of file
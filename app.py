@@ -1,37 +1,77 @@
-from flask import Flask, render_template, request, jsonify
-from agents.dropout_risk_agent import DropoutRiskAgent
-from agents.sudent_analysis_agent import StudentAnalysisAgent
+from flask import Flask, Response, g, render_template, request, jsonify
 import math
 import re
-import mysql.connector
 from config.settings import Settings
+from dependencies.container import container
+from jobs.handlers import job_params
+from services.fragment_cache import Uncacheable
+from utils.analysis_request import InvalidAnalysisRequest, parse_analysis_request
+from utils.tracing import registry, span, start_trace
 from datetime import datetime
 import os
+import time
 
 app = Flask(__name__)
 application = app
 application.config['API_BASE_URL'] = os.getenv('API_BASE_URL', '/')
 
-def get_paginated_students(page: int, per_page: int = 10):
-    offset = (page - 1) * per_page
+if Settings.EMAIL_SEARCH_INDEX:
+    container.email_search.start()
+if Settings.JOB_WORKERS > 0:
+    container.job_queue.start()
+if Settings.WARM_UP:
+    container.warm_up()
+
+@app.before_request
+def start_request_trace():
+    g.trace = start_trace()
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    if "request_started" in g:
+        registry.observe(
+            "http_request_seconds",
+            time.perf_counter() - g.request_started,
+            endpoint=request.endpoint or "unknown"
+        )
+    return response
+
+def get_paginated_students(after: str = None, before: str = None, per_page: int = 10):
     try:
-        conn = mysql.connector.connect(**Settings.mysql_dsn())
-        cursor = conn.cursor()
+        result = container.student_directory.page(after=after, before=before, per_page=per_page)
+        total = container.student_directory.count()
 
-        cursor.execute("SELECT COUNT(*) FROM users")
-        total = cursor.fetchone()[0]
+        return result, total
+    except Exception:
+        app.logger.exception("Error fetching students")
+        return None, 0
 
-        cursor.execute("SELECT email FROM users ORDER BY email LIMIT %s OFFSET %s", (per_page, offset))
-        rows = cursor.fetchall()
-
-        students = [{"email": row[0]} for row in rows]
-
-        cursor.close()
-        conn.close()
-        return students, total
-    except Exception as e:
-        print(f"Error fetching students: {e}")
-        return [], 0
+def cached_response(route: str, key: tuple, build, mimetype: str) -> Response:
+    """Serve ``build()`` through the fragment cache with a strong ETag, 304s and gzip/brotli for larger bodies."""
+    cache = container.fragment_cache
+    try:
+        if cache is None:
+            return Response(build(), mimetype=mimetype)
+        fragment = cache.get_or_build(route, key, build, mimetype)
+    except Uncacheable as e:
+        response = Response(e.body, mimetype=mimetype)
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+    encoding = fragment.negotiate(request.headers.get("Accept-Encoding", ""))
+    # POST bodies are cached server-side only; conditional POSTs mean something else in HTTP
+    if request.method == "GET" and any(request.if_none_match.contains_weak(etag) for etag in fragment.etags()):
+        registry.inc("http_not_modified_total", endpoint=route)
+        response = Response(status=304)
+    else:
+        response = Response(fragment.encoded(encoding), mimetype=mimetype)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+    response.set_etag(fragment.etag_for(encoding))
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
 
 def extract_metrics_table(output: str) -> list[dict]:
     metrics = []
@@ -46,6 +86,24 @@ def extract_metrics_table(output: str) -> list[dict]:
             metrics.append({"metric": parts[0], "average": parts[1]})
     return metrics
 
+def render_analysis(action: str, result, email: str = None) -> str:
+    with span("render"):
+        if action == "analyse_student":
+            return render_template(
+                "partials/analysis.html",
+                analysis=result,
+                student_email=email
+            )
+        if action == "analyse_students":
+            return render_template(
+                "partials/students_analysis.html",
+                analysis=result
+            )
+        return render_template(
+            "partials/motivated.html",
+            analysis=result
+        )
+
 @app.route("/", methods=["GET"])
 def index():
     current_week = datetime.now().isocalendar()[1]
@@ -57,53 +115,118 @@ def students_table():
         page = int(request.args.get("page", 1))
     except ValueError:
         page = 1
-    students, total = get_paginated_students(page)
-    total_pages = math.ceil(total / 10)
-    return render_template("partials/table.html", students=students, page=page, total_pages=total_pages)
-
-@app.route("/analysis", methods=["POST"])
+    after = request.args.get("after") or None
+    before = request.args.get("before") or None
+
+    def render():
+        result, total = get_paginated_students(after=after, before=before)
+        html = render_template(
+            "partials/table.html",
+            students=result["students"] if result else [],
+            page=page,
+            total_pages=math.ceil(total / 10),
+            next_cursor=result["next_cursor"] if result else None,
+            prev_cursor=result["prev_cursor"] if result else None
+        )
+        if result is None:
+            # The empty page shown on a database error must not be cached or validated
+            raise Uncacheable(html)
+        return html
+
+    return cached_response("students", (page, after, before), render, "text/html")
+
+@app.route("/analysis", methods=["GET", "POST"])
 def student_analysis():
     try:
-        data = request.get_json()
-        action = data.get("action")
-        week_from = data.get("week_from")
-        week_to = data.get("week_to")
-        email = data.get("email")
-        num_students = int(data.get("num_students", 1))
-
-        if action == "analyse_student":
-            agent = StudentAnalysisAgent()
-            result = agent.run_analysis(email, week_from, week_to)
-            html = render_template(
-                "partials/analysis.html",
-                analysis=result,
-                student_email=email
-            )
-        elif action == "most_motivated" or action == "less_motivated":
-            agent = DropoutRiskAgent()
-            approach = 'highest' if action == "most_motivated" else 'lowest'
-            result = agent.run_analysis(approach, week_from, week_to, num_students)
-            html = render_template(
-                "partials/motivated.html",
-                analysis=result
-            )
-        else:
-            return jsonify({"error": "Unknown action"}), 400
-
-        return jsonify({"html": html})
+        # GET takes the same fields as query parameters, so repeat views can be answered with a 304
+        data = request.get_json() if request.method == "POST" else request.args.to_dict()
+        try:
+            params = parse_analysis_request(data or {})
+        except InvalidAnalysisRequest as e:
+            return jsonify({"error": str(e)}), 400
+        action, email, emails = params["action"], params["email"], params["emails"]
+        week_from, week_to, num_students = params["week_from"], params["week_to"], params["num_students"]
+
+        if action == "analyse_students" and not emails:
+            # Without a list, analyse one page of the /students table, addressed by the same cursors
+            page = container.student_directory.page(after=params["after"], before=params["before"])
+            emails = [student["email"] for student in page["students"]]
+
+        if params["background"]:
+            params = job_params(action, week_from, week_to, email, num_students, emails)
+            job_id = container.job_queue.submit(action, params)
+            return jsonify({"job_id": job_id, "status_url": f"/jobs/{job_id}"}), 202
+
+        def analyse():
+            if action == "analyse_student":
+                agent = container.student_analysis_agent
+                result = agent.run_analysis(email, week_from, week_to)
+            elif action == "analyse_students":
+                agent = container.student_analysis_agent
+                result = agent.run_batch(emails, week_from, week_to)
+            else:
+                agent = container.dropout_risk_agent
+                approach = 'highest' if action == "most_motivated" else 'lowest'
+                result = agent.run_analysis(approach, week_from, week_to, num_students)
+            return {"html": render_analysis(action, result, email)}
+
+        if params["trace"]:
+            # Per-stage breakdown of this request: spans, LLM tokens and cache hits
+            response = analyse()
+            response["trace"] = g.trace.summary()
+            return jsonify(response)
+
+        key = (action, week_from, week_to, email, num_students, tuple(emails or ()))
+        return cached_response("analysis", key, lambda: app.json.dumps(analyse()), "application/json")
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = container.job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+
+    response = {key: job[key] for key in ("id", "kind", "status", "progress", "error")}
+    if job["status"] == "done":
+        response["html"] = render_analysis(job["kind"], job["result"], job["params"].get("email"))
+    return jsonify(response)
+
 @app.route("/search-students", methods=["GET"])
 def search_students():
     query = request.args.get("q", "").strip()
     if not query or len(query) < 2:
         return jsonify([])
 
-    conn = mysql.connector.connect(**Settings.mysql_dsn())
-    cursor = conn.cursor()
-    sql = "SELECT email FROM users WHERE email LIKE %s LIMIT 10"
-    cursor.execute(sql, (f"%{query}%",))
-    results = [row[0] for row in cursor.fetchall()]
-
-    return jsonify(results)
\ No newline at end of file
+    def search():
+        results = container.email_search.search(query) if Settings.EMAIL_SEARCH_INDEX else None
+        if results is not None:
+            return app.json.dumps(results)
+
+        # Index disabled or still warming up; a failing query raises and is not cached either
+        sql = "SELECT email FROM users WHERE email LIKE %s LIMIT 10"
+        results = [row[0] for row in container.db_pool.fetchall(sql, (f"%{query}%",))]
+        if Settings.EMAIL_SEARCH_INDEX:
+            # Served only until the index is ready
+            raise Uncacheable(app.json.dumps(results))
+        return app.json.dumps(results)
+
+    return cached_response("search-students", (query,), search, "application/json")
+
+@app.route("/sql-cache/stats", methods=["GET"])
+def sql_cache_stats():
+    return jsonify(container.sql_cache.stats())
+
+@app.route("/sql-guard/stats", methods=["GET"])
+def sql_guard_stats():
+    guard = container.sql_guard
+    return jsonify(guard.stats() if guard is not None else {"enabled": False})
+
+@app.route("/fragment-cache/stats", methods=["GET"])
+def fragment_cache_stats():
+    cache = container.fragment_cache
+    return jsonify(cache.stats() if cache is not None else {"enabled": False})
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
\ No newline at end of file
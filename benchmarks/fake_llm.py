@@ -0,0 +1,86 @@
+import hashlib
+import re
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+WORDS = (
+    "keep", "going", "every", "small", "step", "counts", "you", "can", "improve", "your",
+    "results", "with", "steady", "practice", "and", "focus", "on", "one", "goal", "today",
+)
+METRICS = (
+    "homework_submitted", "homework_on_time", "homework_score", "attendance",
+    "student_participation", "teacher_participation", "test_score",
+)
+
+
+def canned_sql(prompt: str) -> str:
+    """The SQL a well-behaved model writes for the agents' known questions, or None for any other prompt."""
+    if "SQL Query:" not in prompt:
+        return None
+
+    averages = ", ".join(f"AVG(sm.{m}) AS avg_{m}" for m in METRICS)
+    weeks = re.search(r"week between (\d+) and (\d+)", prompt, re.I)
+
+    student = re.search(r"email = '([^']*)'", prompt)
+    if student and weeks:
+        return (
+            f"SELECT {averages} FROM student_metrics sm JOIN users u ON u.id = sm.user_id "
+            f"WHERE u.email = '{student.group(1)}' AND sm.week BETWEEN {weeks.group(1)} AND {weeks.group(2)}"
+        )
+
+    ranking = re.search(r"top (\d+) users with the (highest|lowest)", prompt)
+    if ranking and weeks:
+        overall = " + ".join(f"AVG(sm.{m})" for m in METRICS)
+        order = "DESC" if ranking.group(2) == "highest" else "ASC"
+        return (
+            f"SELECT sm.user_id, {averages} FROM student_metrics sm "
+            f"WHERE sm.week BETWEEN {weeks.group(1)} AND {weeks.group(2)} GROUP BY sm.user_id "
+            f"ORDER BY ({overall}) / {len(METRICS)} {order} LIMIT {ranking.group(1)}"
+        )
+
+    users = re.search(r"with id in \(([\d, ]*)\)", prompt)
+    if users:
+        return f"SELECT id, email FROM users WHERE id IN ({users.group(1)})"
+    return None
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic chat model for offline benchmarks.
+
+    Replies are derived from a hash of the prompt, take ``latency`` seconds
+    and are ``output_tokens`` words long; token usage is reported like the
+    OpenAI model so tracing counts it. SQL prompts for the agents' known
+    questions are answered with working SQL (see ``canned_sql``), so the LLM
+    SQL path can be benchmarked end to end.
+    """
+
+    latency: float = 0.0
+    output_tokens: int = 20
+    model_name: str = "fake-chat"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        if self.latency:
+            time.sleep(self.latency)
+
+        text = canned_sql(prompt)
+        if text is None:
+            digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+            text = " ".join(WORDS[digest[i % len(digest)] % len(WORDS)] for i in range(self.output_tokens))
+        prompt_tokens = len(prompt.split())
+        output_tokens = len(text.split())
+        usage = {"input_tokens": prompt_tokens, "output_tokens": output_tokens,
+                 "total_tokens": prompt_tokens + output_tokens}
+
+        message = AIMessage(content=text, usage_metadata=usage)
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={"token_usage": {"prompt_tokens": prompt_tokens, "completion_tokens": output_tokens}}
+        )
@@ -0,0 +1,216 @@
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from langchain_community.utilities import SQLDatabase
+
+from benchmarks.fake_llm import FakeChatModel
+from benchmarks.sqlite_pool import SQLitePool
+from config.settings import Settings
+from db.snapshot import export_snapshot
+from dependencies.container import container
+from services.chat_model import ScheduledChatModel, TokenUsageCallback
+
+DEFAULT_TOP_N = (10, 50, 200)
+# Differences below these are noise on sub-millisecond scenarios, whatever the ratio
+MIN_LATENCY_DELTA_MS = 0.05
+MIN_PEAK_DELTA_KB = 16
+# Options that change the workload; results are only comparable when they match
+WORKLOAD_OPTIONS = ("students", "weeks", "llm_latency", "llm_tokens", "message_mode", "seed", "snapshot", "sql_path")
+
+
+def setup(students: int, weeks: int, latency: float, output_tokens: int, seed: int, directory: str,
+          snapshot: bool = False) -> dict:
+    """Point the container at a fake LLM and a SQLite database filled by MetricsGenerator.
+
+    With ``snapshot`` the data is also exported to a metrics snapshot that the agents read instead.
+    """
+    path = os.path.join(directory, "bench.sqlite3")
+    pool = SQLitePool(path)
+    llm = FakeChatModel(latency=latency, output_tokens=output_tokens)
+    if Settings.LLM_SCHEDULER:
+        llm = ScheduledChatModel(llm, container.llm_scheduler, callbacks=[TokenUsageCallback()])
+    container.override(
+        llm=llm,
+        db_pool=pool,
+        sql_db=SQLDatabase.from_uri(f"sqlite:///{path}", sample_rows_in_table_info=0),
+        # Reports must be recomputed on every iteration to measure the pipeline
+        report_cache=None
+    )
+
+    from data.generate_fake_data import MetricsGenerator
+    MetricsGenerator().generate_metrics_bulk(num_students=students, weeks=weeks, seed=seed)
+
+    if snapshot:
+        Settings.SNAPSHOT_READS = True
+        Settings.SNAPSHOT_DIR = os.path.join(directory, "snapshot")
+        export_snapshot(pool, Settings.SNAPSHOT_DIR, list(Settings.metric_weights()))
+
+    emails = [row[0] for row in pool.fetchall("SELECT email FROM users ORDER BY id")]
+    index = container.email_search
+    index.refresh()
+    return {"emails": emails, "weeks": weeks}
+
+
+def build_scenarios(data: dict, top_n: tuple, rng: random.Random) -> dict:
+    emails = data["emails"]
+    weeks = data["weeks"]
+    directory = container.student_directory
+    search = container.email_search
+    pages = {"cursor": None}
+
+    def single_student():
+        container.student_analysis_agent.run_analysis(rng.choice(emails), 1, weeks)
+
+    def ranking(metric_type: str, num_students: int):
+        return lambda: container.dropout_risk_agent.run_analysis(metric_type, 1, weeks, num_students)
+
+    def pagination():
+        page = directory.page(after=pages["cursor"])
+        pages["cursor"] = page["next_cursor"]
+
+    def email_search():
+        email = rng.choice(emails)
+        start = rng.randrange(max(1, len(email) - 3))
+        search.search(email[start:start + 3])
+
+    scenarios = {"single_student": single_student}
+    for num_students in top_n:
+        scenarios[f"top_{num_students}"] = ranking("highest", num_students)
+        scenarios[f"bottom_{num_students}"] = ranking("lowest", num_students)
+    scenarios["pagination"] = pagination
+    scenarios["search"] = email_search
+    return scenarios
+
+
+def measure(fn, iterations: int, warmup: int = 1) -> dict:
+    for _ in range(warmup):
+        fn()
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+
+    # A separate traced call, so tracemalloc overhead does not skew the latencies
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "iterations": iterations,
+        "throughput": round(iterations / elapsed, 2),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Return one line per metric that regressed by more than ``tolerance`` (a fraction)."""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric, min_delta in (("p50_ms", MIN_LATENCY_DELTA_MS), ("p99_ms", MIN_LATENCY_DELTA_MS),
+                                  ("peak_kb", MIN_PEAK_DELTA_KB)):
+            if result[metric] > previous[metric] * (1 + tolerance) and result[metric] - previous[metric] > min_delta:
+                regressions.append(f"{name}: {metric} {previous[metric]} -> {result[metric]}")
+        if result["throughput"] < previous["throughput"] / (1 + tolerance):
+            regressions.append(f"{name}: throughput {previous['throughput']} -> {result['throughput']}")
+    return regressions
+
+
+def print_table(results: dict, baseline: dict):
+    print(f"{'scenario':<16} {'ops/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'peak KB':>10}  vs baseline p50")
+    for name, result in results.items():
+        previous = baseline.get(name)
+        change = ""
+        if previous and previous["p50_ms"]:
+            change = f"{(result['p50_ms'] / previous['p50_ms'] - 1) * 100:+.1f}%"
+        print(f"{name:<16} {result['throughput']:>10} {result['p50_ms']:>10} {result['p99_ms']:>10} "
+              f"{result['peak_kb']:>10}  {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks with a fake LLM and a SQLite database")
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--weeks", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--top-n", type=int, nargs="+", default=list(DEFAULT_TOP_N))
+    parser.add_argument("--scenario", action="append", help="Run only these scenarios (repeatable)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds per fake LLM call")
+    parser.add_argument("--llm-tokens", type=int, default=20, help="Words per fake LLM reply")
+    parser.add_argument("--message-mode", choices=["pool", "batch", "llm"], default=Settings.MESSAGE_MODE)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--snapshot", action="store_true", help="Rank and look up students from a metrics snapshot")
+    parser.add_argument("--sql-path", choices=["fast", "llm"], default="fast",
+                        help="Compiled queries, or SQL written by the fake LLM through the SQL cache and guard")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", help="Write these results as a baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression, as a fraction")
+    args = parser.parse_args()
+
+    Settings.MESSAGE_MODE = args.message_mode
+    Settings.METRIC_AGGREGATES = False
+    Settings.SQL_FAST_PATH = args.sql_path == "fast"
+
+    with tempfile.TemporaryDirectory() as directory:
+        data = setup(args.students, args.weeks, args.llm_latency, args.llm_tokens, args.seed, directory,
+                     snapshot=args.snapshot)
+        # Agents log every stage at INFO; keep the benchmark output readable
+        logging.disable(logging.INFO)
+
+        scenarios = build_scenarios(data, tuple(args.top_n), random.Random(args.seed))
+        selected = args.scenario or list(scenarios)
+        unknown = [name for name in selected if name not in scenarios]
+        if unknown:
+            parser.error(f"Unknown scenarios: {', '.join(unknown)}; choose from {', '.join(scenarios)}")
+
+        results = {name: measure(scenarios[name], args.iterations) for name in selected}
+        container.db_pool.close()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            saved = json.load(handle)
+        baseline = saved["results"]
+        mismatched = [
+            option for option in WORKLOAD_OPTIONS
+            if option in saved.get("config", {}) and saved["config"][option] != getattr(args, option)
+        ]
+        if mismatched:
+            print(f"Warning: baseline was recorded with different {', '.join(mismatched)}")
+
+    print_table(results, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as handle:
+            json.dump({"config": vars(args), "results": results}, handle, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nRegressions:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
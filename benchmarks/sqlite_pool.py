@@ -0,0 +1,106 @@
+import queue
+import sqlite3
+from contextlib import contextmanager
+
+from db.columnar import ColumnarResult, to_columnar
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT NOT NULL UNIQUE
+    );
+    CREATE TABLE IF NOT EXISTS student_metrics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL REFERENCES users (id),
+        week INTEGER NOT NULL,
+        attendance REAL,
+        homework_submitted REAL,
+        homework_on_time REAL,
+        homework_score REAL,
+        test_score REAL,
+        student_participation REAL,
+        teacher_participation REAL,
+        silence REAL
+    );
+    CREATE INDEX IF NOT EXISTS idx_student_metrics_user_week ON student_metrics (user_id, week);
+    CREATE INDEX IF NOT EXISTS idx_student_metrics_week ON student_metrics (week);
+"""
+
+
+class SQLiteCursor:
+    """Accepts the MySQL ``%s`` paramstyle used throughout the app and runs it on SQLite."""
+
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+
+    def execute(self, sql: str, params=()):
+        return self._cursor.execute(sql.replace("%s", "?"), tuple(params))
+
+    def executemany(self, sql: str, rows):
+        return self._cursor.executemany(sql.replace("%s", "?"), rows)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class SQLitePool:
+    """Stand-in for db.connection_pool.ConnectionPool backed by one SQLite file."""
+
+    def __init__(self, path: str, size: int = 10):
+        self.path = path
+        self.size = size
+        self._connections = queue.Queue()
+        for _ in range(size):
+            conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._connections.put(conn)
+
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def connection(self):
+        conn = self._connections.get()
+        try:
+            yield conn
+        finally:
+            self._connections.put(conn)
+
+    @contextmanager
+    def cursor(self, commit: bool = False, **cursor_kwargs):
+        with self.connection() as conn:
+            cursor = SQLiteCursor(conn.cursor())
+            try:
+                yield cursor
+                if commit:
+                    conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def fetchall(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def fetchmany(self, sql: str, params: tuple = (), batch_size: int = 1000):
+        with self.cursor() as cursor:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+
+    def fetch_columnar(self, sql: str, params: tuple = (), key_columns: int = 1,
+                       batch_size: int = 1000) -> ColumnarResult:
+        with self.cursor() as cursor:
+            cursor.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            return to_columnar(columns, iter(lambda: cursor.fetchmany(batch_size), []), key_columns)
+
+    def close(self):
+        while not self._connections.empty():
+            self._connections.get().close()
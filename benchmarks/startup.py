@@ -0,0 +1,38 @@
+import argparse
+import subprocess
+import sys
+
+DEFAULT_MODULES = (
+    "dependencies.container",
+    "agents.base",
+    "agents.dropout_risk_agent",
+    "jobs.handlers",
+    "cli.analyse_student",
+)
+
+TIMER = "import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)"
+
+
+def cold_import(module: str) -> float:
+    """Seconds to import ``module`` in a fresh interpreter, so nothing is cached in sys.modules."""
+    output = subprocess.run(
+        [sys.executable, "-c", TIMER.format(module=module)],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold import time of the entry-point modules")
+    parser.add_argument("--module", action="append", help="Modules to time (repeatable)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per module; the fastest is reported")
+    args = parser.parse_args()
+
+    print(f"{'module':<28} {'seconds':>8}")
+    for module in args.module or DEFAULT_MODULES:
+        seconds = min(cold_import(module) for _ in range(args.repeat))
+        print(f"{module:<28} {seconds:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
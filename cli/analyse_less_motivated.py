@@ -1,21 +1,27 @@
 import argparse
-from agents.dropout_risk_agent import DropoutRiskAgent
+from cli.formatting import format_analysis, print_report
+from dependencies.container import container
+from jobs.handlers import job_params
 
 def main():
-    parser = argparse.ArgumentParser(description="Find the most motivated student in a week range")
+    parser = argparse.ArgumentParser(description="Find the least motivated students in a week range")
     parser.add_argument("--week-from", type=int, required=True)
     parser.add_argument("--week-to", type=int, required=True)
-    parser.add_argument("--limit", type=int)
+    parser.add_argument("--limit", type=int, default=3, help="Number of students to rank")
+    parser.add_argument("--background", action="store_true", help="Submit as a background job and print its id")
     args = parser.parse_args()
 
-    agent = DropoutRiskAgent()
-    result = agent.run_analysis('lowest', args.week_from, args.week_to, 3)
+    if args.background:
+        params = job_params("less_motivated", args.week_from, args.week_to, num_students=args.limit)
+        job_id = container.job_queue.submit("less_motivated", params)
+        print(f"Submitted job {job_id}; track it with: python -m cli.jobs status {job_id} --wait")
+        return
 
-    print("\n" + "=" * 60)
-    print("Most Motivated Student Analysis")
-    print("=" * 60)
-    print(result)
-    print("=" * 60 + "\n")
+    agent = container.dropout_risk_agent
+    result = agent.run_analysis('lowest', args.week_from, args.week_to, args.limit)
+
+    sections = [format_analysis(item["student_analysis"], item["email"]) for item in result]
+    print_report("Least Motivated Student Analysis", sections)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
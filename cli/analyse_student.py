@@ -1,21 +1,45 @@
 import argparse
-from agents.sudent_analysis_agent import StudentAnalysisAgent
+from cli.formatting import format_analysis, print_report
+from dependencies.container import container
+from jobs.handlers import job_params
 
 def main():
-    parser = argparse.ArgumentParser(description="Find the most motivated student in a week range")
-    parser.add_argument("--email", type=str, required=True)
+    parser = argparse.ArgumentParser(description="Analyse one or more students in a week range")
+    parser.add_argument("--email", type=str, action="append", default=[], help="Student email (repeatable)")
+    parser.add_argument("--emails-file", type=str, help="File with one email per line, analysed in one batch")
     parser.add_argument("--week-from", type=int, required=True)
     parser.add_argument("--week-to", type=int, required=True)
+    parser.add_argument("--background", action="store_true", help="Submit as a background job and print its id")
     args = parser.parse_args()
 
-    agent = StudentAnalysisAgent()
-    result = agent.run_analysis(args.email,args. week_from, args.week_to)
+    emails = list(args.email)
+    if args.emails_file:
+        with open(args.emails_file, encoding="utf-8") as handle:
+            emails.extend(line.strip() for line in handle if line.strip())
+    if not emails:
+        parser.error("Pass --email or --emails-file")
 
-    print("\n" + "=" * 60)
-    print("Student Analysis")
-    print("=" * 60)
-    print(result)
-    print("=" * 60 + "\n")
+    # Several emails go through the batch path: one query and one scoring pass for all of them
+    action = "analyse_student" if len(emails) == 1 else "analyse_students"
+
+    if args.background:
+        params = job_params(action, args.week_from, args.week_to, email=emails[0], emails=emails)
+        job_id = container.job_queue.submit(action, params)
+        print(f"Submitted job {job_id}; track it with: python -m cli.jobs status {job_id} --wait")
+        return
+
+    agent = container.student_analysis_agent
+    if action == "analyse_student":
+        result = agent.run_analysis(emails[0], args.week_from, args.week_to)
+        print_report("Student Analysis", [format_analysis(result, emails[0])])
+        return
+
+    results = agent.run_batch(emails, args.week_from, args.week_to)
+    sections = [
+        f"{row['email']}\n  Error: {row['error']}" if "error" in row else format_analysis(row["student_analysis"], row["email"])
+        for row in results
+    ]
+    print_report(f"Analysis of {len(results)} students", sections)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
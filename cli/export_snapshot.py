@@ -0,0 +1,24 @@
+import argparse
+import time
+from config.settings import Settings
+from db.snapshot import export_snapshot
+from dependencies.container import container
+
+def main():
+    parser = argparse.ArgumentParser(description="Export users and student_metrics to the memory-mapped snapshot")
+    parser.add_argument("--dir", default=Settings.SNAPSHOT_DIR, help="Snapshot root directory")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Rows per fetch from the server-side cursor")
+    parser.add_argument("--keep", type=int, default=2, help="Snapshot versions to keep on disk")
+    parser.add_argument("--every", type=float, help="Re-export every N seconds instead of once")
+    args = parser.parse_args()
+
+    metrics = list(Settings.metric_weights())
+    while True:
+        directory = export_snapshot(container.db_pool, args.dir, metrics, batch_size=args.batch_size, keep=args.keep)
+        print(f"Snapshot written to {directory}")
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,17 @@
+def format_analysis(analysis: dict, email: str = None) -> str:
+    lines = []
+    if email:
+        lines.append(email)
+    lines.append(f"  Zone: {analysis['metric_zone']}  Total: {analysis['total']}  Subtotal: {analysis['subtotal']}")
+    for metric in analysis["metrics"]:
+        lines.append(f"  {metric['label']:<24} {metric['value']:>6}")
+    lines.append(f"  {analysis['motivation_message']}")
+    return "\n".join(lines)
+
+
+def print_report(title: str, sections: list[str]):
+    print("\n" + "=" * 60)
+    print(title)
+    print("=" * 60)
+    print("\n\n".join(sections) if sections else "No students found")
+    print("=" * 60 + "\n")
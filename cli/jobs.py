@@ -0,0 +1,61 @@
+import argparse
+import json
+import time
+
+from config.settings import Settings
+from dependencies.container import container
+
+
+def show_status(job_id: str, wait: bool, interval: float):
+    while True:
+        job = container.job_queue.get(job_id)
+        if job is None:
+            print(f"Unknown job {job_id}")
+            return
+
+        progress = job["progress"]
+        print(f"{job['id']} {job['kind']}: {job['status']} ({progress['done']}/{progress['total'] or '?'})")
+        if not wait or job["status"] in ("done", "failed"):
+            break
+        time.sleep(interval)
+
+    if job["status"] == "done":
+        print(json.dumps(job["result"], indent=2))
+    elif job["error"]:
+        print(f"Error: {job['error']}")
+
+
+def run_worker(workers: int):
+    queue = container.job_queue
+    queue.workers = workers
+    queue.start()
+    print(f"Running {workers} job workers on {Settings.JOB_QUEUE_PATH}; Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        # Interrupted jobs are picked up again from their checkpoints once their heartbeat goes stale
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and run background analysis jobs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    status = subparsers.add_parser("status", help="Show progress and the result of a job")
+    status.add_argument("job_id")
+    status.add_argument("--wait", action="store_true", help="Poll until the job finishes")
+    status.add_argument("--interval", type=float, default=2)
+
+    worker = subparsers.add_parser("worker", help="Run job workers in the foreground")
+    worker.add_argument("--workers", type=int, default=Settings.JOB_WORKERS)
+
+    args = parser.parse_args()
+    if args.command == "status":
+        show_status(args.job_id, args.wait, args.interval)
+    else:
+        run_worker(args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+import argparse
+from dependencies.container import container
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild or refresh the student_metrics_prefix aggregate table")
+    parser.add_argument("--from-week", type=int, help="Only recompute weeks from this one on (incremental refresh)")
+    args = parser.parse_args()
+
+    aggregates = container.metrics_aggregates
+    if args.from_week:
+        aggregates.ensure_table()
+        aggregates.refresh(from_week=args.from_week)
+        print(f"student_metrics_prefix refreshed from week {args.from_week}")
+    else:
+        aggregates.rebuild()
+        print("student_metrics_prefix rebuilt")
+
+if __name__ == "__main__":
+    main()
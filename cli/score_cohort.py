@@ -0,0 +1,86 @@
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from config.settings import Settings
+from db.connection_pool import ConnectionPool
+from services.cohort_export import EXPORT_WRITERS, CohortScorer, id_shards, parse_window
+
+_scorer = None
+
+
+def _init_worker(batch_size: int):
+    # Each process opens its own connection; pooled connections cannot cross a process boundary
+    global _scorer
+    pool = ConnectionPool(Settings.mysql_dsn(), size=1, name=f"cohort-{os.getpid()}")
+    _scorer = CohortScorer(pool, Settings.metric_weights(), batch_size=batch_size)
+
+
+def _score_shard(shard: tuple[int, int], windows: list[tuple[int, int]]) -> list[dict]:
+    return _scorer.score_shard(shard[0], shard[1], windows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score every student for one or more week windows and export the result")
+    parser.add_argument("--window", action="append", required=True, type=parse_window,
+                        help="Week window FROM-TO, e.g. 1-12 (repeatable)")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--format", choices=sorted(EXPORT_WRITERS), help="Defaults to the output file extension")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shard-size", type=int, default=20000, help="User ids per shard")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Rows per fetch from the server-side cursor")
+    args = parser.parse_args()
+
+    export_format = args.format or os.path.splitext(args.output)[1].lstrip(".").lower()
+    if export_format not in EXPORT_WRITERS:
+        parser.error(f"Cannot infer the format from '{args.output}'; pass --format")
+
+    pool = ConnectionPool(Settings.mysql_dsn(), size=1, name="cohort-main")
+    first_id, last_id = pool.fetchall("SELECT MIN(id), MAX(id) FROM users")[0]
+    if first_id is None:
+        print("No users to score")
+        return
+    shards = id_shards(first_id, last_id, args.shard_size)
+
+    start_time = time.time()
+    writer = EXPORT_WRITERS[export_format](args.output)
+    written = 0
+    try:
+        if args.processes <= 1:
+            _init_worker(args.batch_size)
+            for shard in shards:
+                records = _score_shard(shard, args.window)
+                writer.write(records)
+                written += len(records)
+        else:
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(args.processes, mp_context=context, initializer=_init_worker,
+                                     initargs=(args.batch_size,)) as executor:
+                # Keep only a couple of shards per process in flight so finished results never pile up
+                pending = set()
+                remaining = iter(shards)
+                for shard in remaining:
+                    pending.add(executor.submit(_score_shard, shard, args.window))
+                    if len(pending) >= args.processes * 2:
+                        break
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        records = future.result()
+                        writer.write(records)
+                        written += len(records)
+                        shard = next(remaining, None)
+                        if shard is not None:
+                            pending.add(executor.submit(_score_shard, shard, args.window))
+    finally:
+        writer.close()
+
+    elapsed_time = time.time() - start_time
+    print(f"Wrote {written} rows for {len(args.window)} windows and {len(shards)} shards "
+          f"to {args.output} in {elapsed_time:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
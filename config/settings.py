@@ -14,6 +14,117 @@ class Settings:
     MYSQL_DB = os.getenv("MYSQL_DB")
     MYSQL_USER = os.getenv("MYSQL_USER")
     MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD")
+    MYSQL_ALLOW_LOCAL_INFILE = os.getenv("MYSQL_ALLOW_LOCAL_INFILE", "false").lower() in ("1", "true", "yes")
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+
+    # Risk score weights, in the column order used by the scoring engine
+    WEIGHT_HOMEWORK_SUBMITTED = float(os.getenv("WEIGHT_HOMEWORK_SUBMITTED", 0.1))
+    WEIGHT_HOMEWORK_ON_TIME = float(os.getenv("WEIGHT_HOMEWORK_ON_TIME", 0.1))
+    WEIGHT_HOMEWORK_SCORE = float(os.getenv("WEIGHT_HOMEWORK_SCORE", 0.2))
+    WEIGHT_ATTENDANCE = float(os.getenv("WEIGHT_ATTENDANCE", 0.2))
+    WEIGHT_STUDENT_PARTICIPATION = float(os.getenv("WEIGHT_STUDENT_PARTICIPATION", 0.1))
+    WEIGHT_TEACHER_PARTICIPATION = float(os.getenv("WEIGHT_TEACHER_PARTICIPATION", 0.1))
+    WEIGHT_TEST_SCORE = float(os.getenv("WEIGHT_TEST_SCORE", 0.1))
+
+    # Build the DB pool, LLM client and agents when the app starts instead of on the first request
+    WARM_UP = os.getenv("WARM_UP", "true").lower() in ("1", "true", "yes")
+
+    # Seconds the /students total count is reused before re-counting
+    STUDENT_COUNT_TTL = float(os.getenv("STUDENT_COUNT_TTL", 60))
+
+    # In-memory autocomplete index for /search-students
+    EMAIL_SEARCH_INDEX = os.getenv("EMAIL_SEARCH_INDEX", "true").lower() in ("1", "true", "yes")
+    EMAIL_SEARCH_REFRESH_INTERVAL = float(os.getenv("EMAIL_SEARCH_REFRESH_INTERVAL", 30))
+
+    # Read range averages from the student_metrics_prefix table (build it with cli/rebuild_aggregates.py)
+    METRIC_AGGREGATES = os.getenv("METRIC_AGGREGATES", "false").lower() in ("1", "true", "yes")
+    MAX_WEEK = int(os.getenv("MAX_WEEK", 53))
+
+    # Deterministic SQL for known analysis intents; set to false to benchmark the LLM SQL chain
+    SQL_FAST_PATH = os.getenv("SQL_FAST_PATH", "true").lower() in ("1", "true", "yes")
+
+    # Sample rows appended to reflected table info sent to the LLM
+    SCHEMA_SAMPLE_ROWS = int(os.getenv("SCHEMA_SAMPLE_ROWS", 0))
+
+    # Motivational messages: pool (cached per metric/zone), batch (one call per report) or llm (per student)
+    MESSAGE_MODE = os.getenv("MESSAGE_MODE", "pool")
+    MESSAGE_POOL_SIZE = int(os.getenv("MESSAGE_POOL_SIZE", 3))
+    MESSAGE_REFRESH_INTERVAL = int(os.getenv("MESSAGE_REFRESH_INTERVAL", 3600))
+
+    # Per-student analysis concurrency; 1 scores a report sequentially with batched messages
+    ANALYSIS_MAX_WORKERS = int(os.getenv("ANALYSIS_MAX_WORKERS", 8))
+    ANALYSIS_ITEM_TIMEOUT = float(os.getenv("ANALYSIS_ITEM_TIMEOUT", 60))
+    # Most emails one analyse_students request may carry
+    ANALYSIS_BATCH_MAX_EMAILS = int(os.getenv("ANALYSIS_BATCH_MAX_EMAILS", 500))
+
+    # Whole-report cache for /analysis: memory, file or none
+    REPORT_CACHE_BACKEND = os.getenv("REPORT_CACHE_BACKEND", "memory")
+    REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", str(BASE_DIR / "report_cache"))
+    REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", 300))
+    REPORT_CACHE_STALE_TTL = float(os.getenv("REPORT_CACHE_STALE_TTL", 3600))
+    REPORT_CACHE_CHECK_INTERVAL = float(os.getenv("REPORT_CACHE_CHECK_INTERVAL", 10))
+    # Most reports the memory backend keeps; least recently used ones are evicted first
+    REPORT_CACHE_MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", 1000))
+
+    # Scheduler in front of the shared chat model: coalescing, rate limits, retries and priority lanes
+    LLM_SCHEDULER = os.getenv("LLM_SCHEDULER", "true").lower() in ("1", "true", "yes")
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+    LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", 500))
+    LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", 200000))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 4))
+    LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", 0.5))
+    LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", 20))
+    LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", 256))
+
+    # Background analysis jobs: SQLite queue file (":memory:" keeps jobs in-process) and local workers
+    JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", str(BASE_DIR / "jobs.sqlite3"))
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+    JOB_STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", 120))
+
+    # Rendered /students, /analysis and /search-students responses, keyed by their arguments and the data
+    # version (highest ids of users and student_metrics, re-read every DATA_VERSION_CHECK_INTERVAL seconds)
+    FRAGMENT_CACHE = os.getenv("FRAGMENT_CACHE", "true").lower() in ("1", "true", "yes")
+    FRAGMENT_CACHE_SIZE = int(os.getenv("FRAGMENT_CACHE_SIZE", 512))
+    FRAGMENT_CACHE_TTL = float(os.getenv("FRAGMENT_CACHE_TTL", 300))
+    DATA_VERSION_CHECK_INTERVAL = float(os.getenv("DATA_VERSION_CHECK_INTERVAL", 5))
+    # Smallest body in bytes worth compressing with gzip or brotli
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+
+    # Memory-mapped snapshot of users and student_metrics (write it with cli/export_snapshot.py);
+    # with SNAPSHOT_READS the fast-path ranking and student lookups read it instead of the database
+    SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", str(BASE_DIR / "snapshot"))
+    SNAPSHOT_READS = os.getenv("SNAPSHOT_READS", "false").lower() in ("1", "true", "yes")
+    SNAPSHOT_CHECK_INTERVAL = float(os.getenv("SNAPSHOT_CHECK_INTERVAL", 10))
+
+    # Metric ingestion: rows per bulk write, and seconds between background flushes of smaller batches
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 1000))
+    INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", 1.0))
+
+    # Vetting of LLM-generated SQL: a single read-only SELECT, LIMIT capped at SQL_GUARD_MAX_ROWS, rejected when
+    # EXPLAIN estimates more than SQL_GUARD_MAX_SCAN_ROWS rows examined, MAX_EXECUTION_TIME hint in milliseconds
+    SQL_GUARD = os.getenv("SQL_GUARD", "true").lower() in ("1", "true", "yes")
+    SQL_GUARD_MAX_ROWS = int(os.getenv("SQL_GUARD_MAX_ROWS", 1000))
+    SQL_GUARD_MAX_SCAN_ROWS = int(os.getenv("SQL_GUARD_MAX_SCAN_ROWS", 10000000))
+    SQL_GUARD_TIMEOUT_MS = int(os.getenv("SQL_GUARD_TIMEOUT_MS", 10000))
+
+    # Generated-SQL cache: memory, sqlite or none
+    SQL_CACHE_BACKEND = os.getenv("SQL_CACHE_BACKEND", "memory")
+    SQL_CACHE_SIZE = int(os.getenv("SQL_CACHE_SIZE", 256))
+    SQL_CACHE_TTL = int(os.getenv("SQL_CACHE_TTL", 3600))
+    SQL_CACHE_PATH = os.getenv("SQL_CACHE_PATH", str(BASE_DIR / "sql_cache.sqlite3"))
+
+    @classmethod
+    def metric_weights(cls) -> dict:
+        return {
+            "homework_submitted": cls.WEIGHT_HOMEWORK_SUBMITTED,
+            "homework_on_time": cls.WEIGHT_HOMEWORK_ON_TIME,
+            "homework_score": cls.WEIGHT_HOMEWORK_SCORE,
+            "attendance": cls.WEIGHT_ATTENDANCE,
+            "student_participation": cls.WEIGHT_STUDENT_PARTICIPATION,
+            "teacher_participation": cls.WEIGHT_TEACHER_PARTICIPATION,
+            "test_score": cls.WEIGHT_TEST_SCORE,
+        }
 
     @classmethod
     def mysql_uri(cls):
@@ -30,4 +141,5 @@ class Settings:
             "user": cls.MYSQL_USER,
             "password": cls.MYSQL_PASSWORD,
             "database": cls.MYSQL_DB,
+            "allow_local_infile": cls.MYSQL_ALLOW_LOCAL_INFILE,
         }
\ No newline at end of file
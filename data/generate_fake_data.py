@@ -1,23 +1,36 @@
+import argparse
+import csv
 import random
-import mysql.connector
 import os
 import logging
+import tempfile
+import time
 from datetime import datetime
+import numpy as np
 from faker import Faker
 from config.settings import Settings
+from dependencies.container import container
 
 fake = Faker()
 
+LEVEL_RANGES = {
+    "green": (0.76, 1.0),
+    "yellow": (0.4, 0.7),
+    "red": (0.1, 0.4),
+    "random": (0.1, 1.0),
+}
+METRIC_COLUMNS = (
+    "attendance", "homework_submitted", "homework_on_time", "homework_score",
+    "test_score", "student_participation", "teacher_participation", "silence",
+)
+METRICS_INSERT_SQL = f"""
+    INSERT INTO student_metrics (user_id, week, {", ".join(METRIC_COLUMNS)})
+    VALUES ({", ".join(["%s"] * (len(METRIC_COLUMNS) + 2))})
+"""
+
 class MetricsGenerator:
     def __init__(self):
-        self.mydb = mysql.connector.connect(
-            host=Settings.MYSQL_HOST,
-            user=Settings.MYSQL_USER,
-            password=Settings.MYSQL_PASSWORD,
-            database=Settings.MYSQL_DB
-        )
-        self.conn = mysql.connector.connect(**Settings.mysql_dsn())
-        self.cursor = self.conn.cursor()
+        self.db_pool = container.db_pool
         self.levels = ["red", "yellow", "green"]
 
         self._configure_logger()
@@ -35,7 +48,7 @@ class MetricsGenerator:
         )
         logging.getLogger().addHandler(logging.StreamHandler())
 
-    def generate_and_insert_metrics(self, user_id, weeks=10, motivation_level="random"):
+    def generate_and_insert_metrics(self, cursor, user_id, weeks=10, motivation_level="random"):
         for week in range(1, weeks + 1):
             if motivation_level == "green":
                 base_min, base_max = 0.76, 1.0
@@ -58,7 +71,7 @@ class MetricsGenerator:
                 min(0.3, 1.0 - base_min)
             ), 2)
 
-            self.cursor.execute("""
+            cursor.execute("""
                 INSERT INTO student_metrics (
                     user_id, week, attendance,
                     homework_submitted, homework_on_time, homework_score,
@@ -73,38 +86,213 @@ class MetricsGenerator:
 
     def clear_metrics(self):
         logging.info("Clearing metrics table")
-        self.cursor.execute("DELETE FROM student_metrics;")
-        self.cursor.execute("DELETE FROM users;")
-        self.conn.commit()
+        with self.db_pool.cursor(commit=True) as cursor:
+            cursor.execute("DELETE FROM student_metrics;")
+            cursor.execute("DELETE FROM users;")
+            if Settings.METRIC_AGGREGATES:
+                cursor.execute("DELETE FROM student_metrics_prefix;")
 
     def generate_metrics(self, num_students=100, weeks=52):
         logging.info("Starting generation of metrics")
-        for _ in range(num_students):
-            email = fake.email()
-            logging.info(f"New user email: {email}")
-
-            try:
-                self.cursor.execute("INSERT INTO users (email) VALUES (%s) RETURNING id;", (email,))
-                user_id = self.cursor.fetchone()[0]
-                logging.info(f"User ID: {user_id}")
-            except Exception as e:
-                logging.error(f"Error while inserting a new user: {e}")
-                raise
-
-            level = random.choice(self.levels)
-            try:
-                self.generate_and_insert_metrics(user_id, weeks=weeks, motivation_level=level)
-                logging.info(f"User ID: {user_id}; Weeks: 1-{weeks}; Level: {level}")
-            except Exception as e:
-                logging.error(f"Error while inserting metrics: {e}")
-                raise
-
-        self.conn.commit()
-        self.cursor.close()
-        self.conn.close()
+        with self.db_pool.cursor(commit=True) as cursor:
+            for _ in range(num_students):
+                email = fake.email()
+                logging.info(f"New user email: {email}")
+
+                try:
+                    cursor.execute("INSERT INTO users (email) VALUES (%s) RETURNING id;", (email,))
+                    user_id = cursor.fetchone()[0]
+                    logging.info(f"User ID: {user_id}")
+                except Exception as e:
+                    logging.error(f"Error while inserting a new user: {e}")
+                    raise
+
+                level = random.choice(self.levels)
+                try:
+                    self.generate_and_insert_metrics(cursor, user_id, weeks=weeks, motivation_level=level)
+                    logging.info(f"User ID: {user_id}; Weeks: 1-{weeks}; Level: {level}")
+                except Exception as e:
+                    logging.error(f"Error while inserting metrics: {e}")
+                    raise
+
+        if Settings.METRIC_AGGREGATES:
+            container.metrics_aggregates.refresh()
         print("Fake data inserted.")
 
-if __name__ == "__main__":
+    def generate_metrics_bulk(self, num_students=100, weeks=52, batch_size=5000, seed=None, method="executemany"):
+        """Generate students in vectorized chunks, writing each chunk in bulk and committing per chunk.
+
+        method is "executemany" (multi-row INSERT) or "load-data" (LOAD DATA LOCAL INFILE from a
+        temp CSV; needs MYSQL_ALLOW_LOCAL_INFILE on the server and the client).
+        """
+        rng = np.random.default_rng(seed)
+        if seed is not None:
+            Faker.seed(seed)
+            random.seed(seed)
+
+        logging.info(f"Starting bulk generation: students={num_students}, weeks={weeks}, batch_size={batch_size}")
+        first_index = self._next_email_index()
+        for start in range(0, num_students, batch_size):
+            size = min(batch_size, num_students - start)
+            # The running index keeps emails unique without Faker's slow unique proxy, also across --keep runs
+            emails = [f"{fake.user_name()}.{first_index + start + i}@{fake.free_email_domain()}" for i in range(size)]
+
+            with self.db_pool.cursor(commit=True) as cursor:
+                cursor.executemany("INSERT INTO users (email) VALUES (%s)", [(email,) for email in emails])
+                placeholders = ", ".join(["%s"] * size)
+                cursor.execute(f"SELECT id, email FROM users WHERE email IN ({placeholders})", emails)
+                ids_by_email = dict((email, user_id) for user_id, email in cursor.fetchall())
+                user_ids = np.array([ids_by_email[email] for email in emails], dtype=np.int64)
+
+                rows = self._generate_metric_rows(rng, user_ids, weeks)
+                if method == "load-data":
+                    self._load_data_infile(cursor, rows)
+                else:
+                    cursor.executemany(METRICS_INSERT_SQL, rows)
+
+            if Settings.METRIC_AGGREGATES:
+                container.metrics_aggregates.refresh(user_ids=user_ids.tolist())
+            logging.info(f"Inserted students {start + 1}-{start + size} ({len(rows)} metric rows)")
+
+        print("Fake data inserted.")
+
+    def replay_weeks(self, weeks=4, first_week=None, num_students=None, micro_batch=500, drift=0.1, seed=None,
+                     ingestor=None) -> dict:
+        """Stream synthetic weeks for existing students through MetricsIngestor, to load-test ingestion offline.
+
+        Weeks follow the latest stored week unless ``first_week`` is given. Every
+        week the motivation level of a ``drift`` share of students is drawn again,
+        so some of them change risk zone.
+        """
+        ingestor = ingestor or container.metrics_ingestor
+        rng = np.random.default_rng(seed)
+
+        sql = "SELECT id FROM users ORDER BY id"
+        params = ()
+        if num_students:
+            sql += " LIMIT %s"
+            params = (int(num_students),)
+        user_ids = np.array([row[0] for row in self.db_pool.fetchall(sql, params)], dtype=np.int64)
+        if first_week is None:
+            first_week = (self.db_pool.fetchall("SELECT MAX(week) FROM student_metrics")[0][0] or 0) + 1
+
+        changes = []
+        ingestor.subscribe(changes.extend)
+        levels = rng.choice(self.levels, size=len(user_ids))
+        columns = ("user_id", "week", *METRIC_COLUMNS)
+        rows_written = 0
+        started = time.perf_counter()
+        try:
+            for week in range(first_week, first_week + weeks):
+                moved = rng.random(len(user_ids)) < drift
+                levels[moved] = rng.choice(self.levels, size=int(moved.sum()))
+                rows = self._generate_metric_rows(rng, user_ids, 1, levels=levels, first_week=week)
+                for start in range(0, len(rows), micro_batch):
+                    ingestor.submit([dict(zip(columns, row)) for row in rows[start:start + micro_batch]])
+                rows_written += len(rows)
+                logging.info(f"Replayed week {week} for {len(user_ids)} students")
+            ingestor.flush()
+        finally:
+            ingestor.unsubscribe(changes.extend)
+
+        elapsed = time.perf_counter() - started
+        return {
+            "students": len(user_ids),
+            "weeks": f"{first_week}-{first_week + weeks - 1}",
+            "rows": rows_written,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(rows_written / elapsed, 1) if elapsed else None,
+            "zone_changes": len(changes),
+        }
+
+    def _next_email_index(self) -> int:
+        """First email index of a new run: above every index used so far, since each run's indices stay
+        below the user ids it inserted."""
+        return int(self.db_pool.fetchall("SELECT COALESCE(MAX(id), 0) FROM users")[0][0])
+
+    def _generate_metric_rows(self, rng, user_ids: np.ndarray, weeks: int, levels=None,
+                              first_week: int = 1) -> list[tuple]:
+        if levels is None:
+            levels = rng.choice(self.levels, size=len(user_ids))
+        low = np.array([LEVEL_RANGES[level][0] for level in levels])[:, None, None]
+        high = np.array([LEVEL_RANGES[level][1] for level in levels])[:, None, None]
+
+        shape = (len(user_ids), weeks, len(METRIC_COLUMNS) - 1)
+        metrics = np.round(low + (high - low) * rng.random(shape), 2)
+        silence_low = np.maximum(0.03, 1.0 - high)
+        silence_high = np.minimum(0.3, 1.0 - low)
+        silence = np.round(silence_low + (silence_high - silence_low) * rng.random((len(user_ids), weeks, 1)), 2)
+        values = np.concatenate([metrics, silence], axis=2).reshape(-1, len(METRIC_COLUMNS)).tolist()
+
+        user_column = np.repeat(user_ids, weeks).tolist()
+        week_column = np.tile(np.arange(first_week, first_week + weeks), len(user_ids)).tolist()
+
+        return [(user_id, week, *row) for user_id, week, row in zip(user_column, week_column, values)]
+
+    @staticmethod
+    def _load_data_infile(cursor, rows: list[tuple]):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", newline="", delete=False) as handle:
+            csv.writer(handle).writerows(rows)
+            path = handle.name
+        try:
+            cursor.execute(f"""
+                LOAD DATA LOCAL INFILE %s INTO TABLE student_metrics
+                FIELDS TERMINATED BY ',' LINES TERMINATED BY '\\r\\n'
+                (user_id, week, {", ".join(METRIC_COLUMNS)})
+            """, (path,))
+        finally:
+            os.remove(path)
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate fake students and weekly metrics")
+    parser.add_argument("--students", type=int, default=100)
+    parser.add_argument("--weeks", type=int, default=52)
+    parser.add_argument("--batch-size", type=int, default=5000, help="Students per bulk chunk and commit")
+    parser.add_argument("--seed", type=int, help="Seed for reproducible datasets")
+    parser.add_argument("--method", choices=["row", "executemany", "load-data"], default="executemany",
+                        help="row inserts one row per statement (legacy path)")
+    parser.add_argument("--keep", action="store_true", help="Do not clear existing users and metrics first")
+    parser.add_argument("--replay-weeks", type=int,
+                        help="Instead of generating students, stream this many new weeks for the existing "
+                             "ones through the metrics ingestor")
+    parser.add_argument("--replay-students", type=int, help="Replay only the first N students (default: all)")
+    parser.add_argument("--micro-batch", type=int, default=500, help="Records per ingestor submit when replaying")
+    parser.add_argument("--drift", type=float, default=0.1,
+                        help="Share of students changing motivation level each replayed week")
+    args = parser.parse_args()
+
     generator = MetricsGenerator()
-    generator.clear_metrics()
-    generator.generate_metrics()
\ No newline at end of file
+    if args.replay_weeks:
+        stats = generator.replay_weeks(
+            weeks=args.replay_weeks,
+            num_students=args.replay_students,
+            micro_batch=args.micro_batch,
+            drift=args.drift,
+            seed=args.seed
+        )
+        print(f"Replay: {stats}")
+        return
+
+    if not args.keep:
+        generator.clear_metrics()
+
+    if args.method == "row":
+        if args.seed is not None:
+            # fake.email() has no running index; a kept table needs a different seed to get new emails
+            seed = args.seed + generator._next_email_index() if args.keep else args.seed
+            Faker.seed(seed)
+            random.seed(seed)
+        generator.generate_metrics(num_students=args.students, weeks=args.weeks)
+    else:
+        generator.generate_metrics_bulk(
+            num_students=args.students,
+            weeks=args.weeks,
+            batch_size=args.batch_size,
+            seed=args.seed,
+            method=args.method
+        )
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
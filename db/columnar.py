@@ -0,0 +1,51 @@
+import numpy as np
+
+
+class ColumnarResult:
+    """A query result split into leading key columns and a float64 value matrix.
+
+    ``values`` is one C-contiguous rows x columns array that the scoring code
+    consumes as-is; SQL NULLs become NaN and ``Decimal`` values are converted
+    by numpy, so no row is turned into a string or parsed back.
+    """
+
+    def __init__(self, columns: list[str], keys: list, values: np.ndarray):
+        self.columns = columns
+        self.keys = keys
+        self.values = values
+
+    def __len__(self):
+        return len(self.values)
+
+    def column(self, name: str) -> np.ndarray:
+        return self.values[:, self.columns.index(name)]
+
+    def complete_rows(self) -> np.ndarray:
+        """Boolean mask of rows without NULL values."""
+        return ~np.isnan(self.values).any(axis=1)
+
+
+def to_columnar(columns: list[str], batches, key_columns: int = 1) -> ColumnarResult:
+    """Build a ColumnarResult from an iterable of row batches (e.g. ``ConnectionPool.fetchmany``).
+
+    The first ``key_columns`` columns are kept as Python values (scalars for
+    one key column, tuples otherwise); the rest go into the value matrix.
+    """
+    keys = []
+    blocks = []
+    for batch in batches:
+        if key_columns == 1:
+            keys.extend(row[0] for row in batch)
+        elif key_columns:
+            keys.extend(tuple(row[:key_columns]) for row in batch)
+        blocks.append(np.array([row[key_columns:] for row in batch], dtype=np.float64))
+
+    width = len(columns) - key_columns
+    if not blocks:
+        values = np.empty((0, width), dtype=np.float64)
+    elif len(blocks) == 1:
+        values = blocks[0]
+    else:
+        values = np.concatenate(blocks)
+
+    return ColumnarResult(list(columns[key_columns:]), keys, values.reshape(-1, width))
@@ -0,0 +1,102 @@
+import logging
+import threading
+from contextlib import contextmanager
+
+from mysql.connector import pooling
+
+from db.columnar import ColumnarResult, to_columnar
+
+# mysql.connector refuses pools larger than this
+MAX_POOL_SIZE = pooling.CNX_POOL_MAXSIZE
+
+
+class ConnectionPool:
+    """Bounded MySQL connection pool with health-checked, context-managed checkout.
+
+    ``connection()`` blocks up to ``checkout_timeout`` seconds when every
+    connection is in use instead of failing immediately, and always returns
+    the connection to the pool on exit.
+    """
+
+    def __init__(self, dsn: dict, size: int = 10, name: str = "app", checkout_timeout: float = 10):
+        self.size = max(1, min(size, MAX_POOL_SIZE))
+        self.checkout_timeout = checkout_timeout
+        self._dsn = dsn
+        self._name = name
+        self._pool = None
+        self._init_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+
+    @contextmanager
+    def connection(self):
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            raise TimeoutError(f"No database connection available within {self.checkout_timeout}s")
+
+        conn = None
+        try:
+            conn = self._get_pool().get_connection()
+            self._ensure_healthy(conn)
+            yield conn
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception as e:
+                    logging.error(f"Failed to return connection to pool: {e}")
+            self._slots.release()
+
+    @contextmanager
+    def cursor(self, commit: bool = False, **cursor_kwargs):
+        with self.connection() as conn:
+            cursor = conn.cursor(**cursor_kwargs)
+            try:
+                yield cursor
+                if commit:
+                    conn.commit()
+            except Exception:
+                if commit:
+                    conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def fetchall(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def fetchmany(self, sql: str, params: tuple = (), batch_size: int = 1000):
+        """Yield rows in batches of ``batch_size``; the connection is held until the generator is exhausted."""
+        with self.cursor() as cursor:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+
+    def fetch_columnar(self, sql: str, params: tuple = (), key_columns: int = 1,
+                       batch_size: int = 1000) -> ColumnarResult:
+        """Run ``sql`` and return its rows as keys plus a float64 matrix of the remaining columns."""
+        with self.cursor() as cursor:
+            cursor.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            return to_columnar(columns, iter(lambda: cursor.fetchmany(batch_size), []), key_columns)
+
+    def _get_pool(self) -> pooling.MySQLConnectionPool:
+        if self._pool is None:
+            with self._init_lock:
+                if self._pool is None:
+                    self._pool = pooling.MySQLConnectionPool(
+                        pool_name=self._name,
+                        pool_size=self.size,
+                        pool_reset_session=True,
+                        **self._dsn
+                    )
+        return self._pool
+
+    @staticmethod
+    def _ensure_healthy(conn):
+        if not conn.is_connected():
+            logging.warning("Pooled connection is stale, reconnecting")
+            conn.reconnect(attempts=3, delay=1)
@@ -0,0 +1,143 @@
+class MetricsQueryBuilder:
+    """Parameterized SQL for the known analysis intents, compiled once per agent.
+
+    With ``use_aggregates`` the averages come from ``student_metrics_prefix``
+    (two rows per user) instead of scanning every week in ``student_metrics``.
+    """
+
+    def __init__(self, metrics, use_aggregates: bool = False, max_week: int = 53):
+        self.metrics = list(metrics)
+        self.use_aggregates = use_aggregates
+        self.max_week = max_week
+
+        averages = ",\n                ".join(f"AVG({m}) AS avg_{m}" for m in self.metrics)
+        overall = " + ".join(f"AVG({m})" for m in self.metrics)
+
+        self._ranking_sql = {
+            order: f"""
+                SELECT
+                user_id,
+                {averages}
+                FROM student_metrics
+                WHERE week BETWEEN %s AND %s
+                GROUP BY user_id
+                ORDER BY ({overall}) / {len(self.metrics)} {order}
+                LIMIT %s
+            """.strip()
+            for order in ("ASC", "DESC")
+        }
+
+        student_averages = ",\n                ".join(f"AVG(sm.{m}) AS avg_{m}" for m in self.metrics)
+        self._student_sql = f"""
+            SELECT
+            {student_averages}
+            FROM student_metrics sm
+            JOIN users u ON u.id = sm.user_id
+            WHERE u.email = %s AND sm.week BETWEEN %s AND %s
+        """.strip()
+
+        prefix_averages = ",\n                ".join(f"{self._prefix_average(m)} AS avg_{m}" for m in self.metrics)
+        prefix_overall = " + ".join(self._prefix_average(m) for m in self.metrics)
+        prefix_from = """
+                FROM student_metrics_prefix a
+                JOIN student_metrics_prefix b ON b.user_id = a.user_id AND b.week = %s
+        """.strip()
+
+        self._prefix_ranking_sql = {
+            order: f"""
+                SELECT
+                a.user_id,
+                {prefix_averages}
+                {prefix_from}
+                WHERE a.week = %s AND a.cnt > b.cnt
+                ORDER BY ({prefix_overall}) / {len(self.metrics)} {order}
+                LIMIT %s
+            """.strip()
+            for order in ("ASC", "DESC")
+        }
+
+        self._prefix_student_sql = f"""
+                SELECT
+                {prefix_averages}
+                {prefix_from}
+                JOIN users u ON u.id = a.user_id
+                WHERE u.email = %s AND a.week = %s AND a.cnt > b.cnt
+        """.strip()
+
+    def top_students(self, metric_type: str, week_from: int, week_to: int, num_students: int) -> tuple[str, tuple]:
+        order = "DESC" if metric_type == "highest" else "ASC"
+
+        if self.use_aggregates:
+            week_from, week_to = self._clamp_weeks(week_from, week_to)
+            return self._prefix_ranking_sql[order], (week_from - 1, week_to, int(num_students))
+
+        return self._ranking_sql[order], (int(week_from), int(week_to), int(num_students))
+
+    def student_averages(self, email: str, week_from: int, week_to: int) -> tuple[str, tuple]:
+        if self.use_aggregates:
+            week_from, week_to = self._clamp_weeks(week_from, week_to)
+            return self._prefix_student_sql, (week_from - 1, email, week_to)
+
+        return self._student_sql, (email, int(week_from), int(week_to))
+
+    def students_averages(self, emails: list[str], week_from: int, week_to: int) -> tuple[str, tuple]:
+        """One row per known email: the email, then its averages (NULL when it has no weeks in range).
+
+        Unknown emails have no row at all, so callers can tell them apart from
+        students without metrics.
+        """
+        placeholders = ", ".join(["%s"] * len(emails))
+
+        if self.use_aggregates:
+            week_from, week_to = self._clamp_weeks(week_from, week_to)
+            averages = ",\n                ".join(f"{self._prefix_average(m)} AS avg_{m}" for m in self.metrics)
+            sql = f"""
+                SELECT
+                u.email,
+                {averages}
+                FROM users u
+                LEFT JOIN student_metrics_prefix a ON a.user_id = u.id AND a.week = %s
+                LEFT JOIN student_metrics_prefix b ON b.user_id = u.id AND b.week = %s
+                WHERE u.email IN ({placeholders})
+            """.strip()
+            return sql, (week_to, week_from - 1, *emails)
+
+        averages = ",\n                ".join(f"AVG(sm.{m}) AS avg_{m}" for m in self.metrics)
+        sql = f"""
+            SELECT
+            u.email,
+            {averages}
+            FROM users u
+            LEFT JOIN student_metrics sm ON sm.user_id = u.id AND sm.week BETWEEN %s AND %s
+            WHERE u.email IN ({placeholders})
+            GROUP BY u.id, u.email
+        """.strip()
+        return sql, (int(week_from), int(week_to), *emails)
+
+    def cohort_weeks(self, first_id: int, last_id: int, week_from: int, week_to: int) -> tuple[str, tuple]:
+        """Raw weekly rows for a user id range, unordered; callers aggregate them while streaming."""
+        columns = ", ".join(self.metrics)
+        sql = f"""
+            SELECT user_id, week, {columns}
+            FROM student_metrics
+            WHERE user_id BETWEEN %s AND %s AND week BETWEEN %s AND %s
+        """.strip()
+        return sql, (int(first_id), int(last_id), int(week_from), int(week_to))
+
+    def emails_between(self, first_id: int, last_id: int) -> tuple[str, tuple]:
+        return "SELECT id, email FROM users WHERE id BETWEEN %s AND %s", (int(first_id), int(last_id))
+
+    def emails_by_ids(self, user_ids: list[int]) -> tuple[str, tuple]:
+        placeholders = ", ".join(["%s"] * len(user_ids))
+
+        return f"SELECT id, email FROM users WHERE id IN ({placeholders})", tuple(int(i) for i in user_ids)
+
+    @staticmethod
+    def _prefix_average(metric: str) -> str:
+        # Divided by the metric's own count, so NULL values are skipped like AVG() does
+        return f"(a.sum_{metric} - b.sum_{metric}) / NULLIF(a.cnt_{metric} - b.cnt_{metric}, 0)"
+
+    def _clamp_weeks(self, week_from: int, week_to: int) -> tuple[int, int]:
+        week_from = min(max(1, int(week_from)), self.max_week)
+        week_to = min(max(week_from - 1, int(week_to)), self.max_week)
+        return week_from, week_to
@@ -0,0 +1,25 @@
+-- Per-user cumulative metric totals by week, maintained by services/metrics_aggregates.py.
+-- Row (user_id, week) holds sums and counts of student_metrics for weeks 0..week: cnt counts rows,
+-- cnt_<metric> the non-NULL values of that metric. The average of a metric over weeks [a, b] is
+-- (sum b - sum a-1) / (cnt_<metric> b - cnt_<metric> a-1), which skips NULLs like AVG(). Week 0 is always zero.
+CREATE TABLE IF NOT EXISTS student_metrics_prefix (
+    user_id INT NOT NULL,
+    week INT NOT NULL,
+    cnt INT NOT NULL,
+    cnt_homework_submitted INT NOT NULL,
+    sum_homework_submitted DOUBLE NOT NULL,
+    cnt_homework_on_time INT NOT NULL,
+    sum_homework_on_time DOUBLE NOT NULL,
+    cnt_homework_score INT NOT NULL,
+    sum_homework_score DOUBLE NOT NULL,
+    cnt_attendance INT NOT NULL,
+    sum_attendance DOUBLE NOT NULL,
+    cnt_student_participation INT NOT NULL,
+    sum_student_participation DOUBLE NOT NULL,
+    cnt_teacher_participation INT NOT NULL,
+    sum_teacher_participation DOUBLE NOT NULL,
+    cnt_test_score INT NOT NULL,
+    sum_test_score DOUBLE NOT NULL,
+    PRIMARY KEY (user_id, week),
+    KEY idx_student_metrics_prefix_week (week, user_id)
+);
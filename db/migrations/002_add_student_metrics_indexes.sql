@@ -0,0 +1,7 @@
+-- Indexes for the analysis queries, including the LLM-generated ones vetted by db/sql_guard.py, which
+-- logs full scans these would have avoided. (user_id, week) serves per-student week ranges and the
+-- users join; (week, user_id) serves week-range scans across all students.
+-- Apply once: mysql <database> < db/migrations/002_add_student_metrics_indexes.sql
+ALTER TABLE student_metrics
+    ADD INDEX idx_student_metrics_user_week (user_id, week),
+    ADD INDEX idx_student_metrics_week (week, user_id);
\ No newline at end of file
@@ -0,0 +1,63 @@
+import threading
+
+from sqlalchemy import inspect
+
+
+class SchemaCache:
+    """Per-process cache of table info handed to the SQL generation prompt.
+
+    Callers may pass a ``{table: [columns]}`` spec to describe only what they
+    query; the rendered DDL never includes sample rows, so its size does not
+    grow with the rest of the database.
+    """
+
+    def __init__(self, sql_db):
+        self.sql_db = sql_db
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, tables: dict = None) -> str:
+        key = self._key(tables)
+        schema = self._entries.get(key)
+        if schema is not None:
+            return schema
+
+        with self._lock:
+            schema = self._entries.get(key)
+            if schema is None:
+                schema = self._load(tables)
+                self._entries[key] = schema
+        return schema
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def _key(tables: dict = None):
+        if tables is None:
+            return None
+        return tuple(sorted((table, tuple(columns or ())) for table, columns in tables.items()))
+
+    def _load(self, tables: dict = None) -> str:
+        if tables is None:
+            return self.sql_db.get_table_info()
+
+        inspector = inspect(self.sql_db._engine)
+        blocks = []
+        for table, columns in tables.items():
+            wanted = set(columns or ())
+            lines = [
+                f"\t{column['name']} {column['type']}"
+                for column in inspector.get_columns(table)
+                if not wanted or column["name"] in wanted
+            ]
+            for fk in inspector.get_foreign_keys(table):
+                if not wanted or set(fk["constrained_columns"]) & wanted:
+                    lines.append(
+                        f"\tFOREIGN KEY({', '.join(fk['constrained_columns'])}) "
+                        f"REFERENCES {fk['referred_table']} ({', '.join(fk['referred_columns'])})"
+                    )
+            blocks.append(f"CREATE TABLE {table} (\n" + ",\n".join(lines) + "\n)")
+
+        return "\n\n".join(blocks)
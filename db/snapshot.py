@@ -0,0 +1,280 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from db.columnar import ColumnarResult, to_columnar
+
+CURRENT_FILE = "CURRENT"
+
+
+def export_snapshot(db_pool, root: str, metrics: list[str], batch_size: int = 10000, keep: int = 2) -> str:
+    """Write ``users`` and ``student_metrics`` to a new snapshot version under ``root`` and publish it.
+
+    Layout of a version directory:
+        meta.json             metrics, number of users and weeks, creation time
+        user_ids.npy          int64, one entry per user row, ascending
+        emails.npy            fixed-width bytes, email of each user row
+        emails_sorted.npy     lowercased emails, sorted, with
+        email_rows.npy        the user row of each sorted email (the email dictionary)
+        <metric>.npy          float32 users x weeks; week N is column N - 1, NaN where missing
+
+    Duplicate rows for the same user and week are averaged. The version is
+    written to a temporary directory, renamed into place and only then named
+    in ``CURRENT``, so readers never see a partial snapshot. Returns the
+    version directory.
+    """
+    started = time.perf_counter()
+    os.makedirs(root, exist_ok=True)
+    version = time.strftime("%Y%m%dT%H%M%S") + f"-{os.getpid()}"
+    directory = os.path.join(root, version)
+    staging = f"{directory}.tmp"
+    os.makedirs(staging)
+
+    try:
+        users = db_pool.fetchall("SELECT id, email FROM users ORDER BY id")
+        weeks = int(db_pool.fetchall("SELECT MAX(week) FROM student_metrics")[0][0] or 0)
+
+        user_ids = np.array([row[0] for row in users], dtype=np.int64)
+        emails = np.array([row[1].encode("utf-8") for row in users], dtype=np.bytes_)
+        lowered = np.char.lower(emails)
+        order = np.argsort(lowered, kind="stable")
+        np.save(os.path.join(staging, "user_ids.npy"), user_ids)
+        np.save(os.path.join(staging, "emails.npy"), emails)
+        np.save(os.path.join(staging, "emails_sorted.npy"), lowered[order])
+        np.save(os.path.join(staging, "email_rows.npy"), order.astype(np.int64))
+
+        shape = (len(user_ids), weeks)
+        values = {
+            metric: open_memmap(os.path.join(staging, f"{metric}.npy"), mode="w+", dtype=np.float32, shape=shape)
+            for metric in metrics
+        }
+        counts = {metric: np.zeros(shape, dtype=np.uint16) for metric in metrics}
+
+        columns = ["user_id", "week", *metrics]
+        sql = f"SELECT {', '.join(columns)} FROM student_metrics"
+        rows_read = 0
+        batches = db_pool.fetchmany(sql, (), batch_size) if len(user_ids) else []
+        for batch in batches:
+            block = to_columnar(columns, [batch], key_columns=0).values
+            rows_read += len(block)
+            batch_users = block[:, 0].astype(np.int64)
+            positions = np.minimum(np.searchsorted(user_ids, batch_users), len(user_ids) - 1)
+            week_index = block[:, 1].astype(np.int64) - 1
+            # Rows of deleted users or week 0 and below have no cell in the grid
+            known = (user_ids[positions] == batch_users) & (week_index >= 0)
+            for i, metric in enumerate(metrics):
+                metric_values = block[:, 2 + i]
+                present = known & ~np.isnan(metric_values)
+                cells = (positions[present], week_index[present])
+                np.add.at(values[metric], cells, metric_values[present])
+                np.add.at(counts[metric], cells, 1)
+
+        for metric in metrics:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                values[metric][:] = np.where(counts[metric] > 0, values[metric] / counts[metric], np.nan)
+            values[metric].flush()
+        del values
+
+        with open(os.path.join(staging, "meta.json"), "w", encoding="utf-8") as handle:
+            json.dump({
+                "version": version,
+                "metrics": list(metrics),
+                "users": len(user_ids),
+                "weeks": weeks,
+                "rows": rows_read,
+                "created_at": time.time(),
+            }, handle)
+        os.rename(staging, directory)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    current = os.path.join(root, CURRENT_FILE)
+    with open(f"{current}.tmp", "w", encoding="utf-8") as handle:
+        handle.write(version)
+    os.replace(f"{current}.tmp", current)
+
+    _prune_versions(root, keep)
+    logging.info(f"Snapshot {version}: {len(user_ids)} users, {weeks} weeks, {rows_read} rows "
+                 f"in {time.perf_counter() - started:.2f}s")
+    return directory
+
+
+def _prune_versions(root: str, keep: int):
+    # Processes still mapping a removed version keep reading it until they switch; the files stay alive until then
+    versions = sorted(
+        name for name in os.listdir(root)
+        if os.path.isdir(os.path.join(root, name)) and not name.endswith(".tmp")
+    )
+    for name in versions[:-max(1, keep)]:
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+class MetricsSnapshot:
+    """One snapshot version, memory-mapped read-only so every worker process shares the page cache."""
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as handle:
+            meta = json.load(handle)
+        self.version = meta["version"]
+        self.metrics = meta["metrics"]
+        self.weeks = meta["weeks"]
+        self.created_at = meta["created_at"]
+
+        def load(name):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+        self.user_ids = load("user_ids")
+        self.emails = load("emails")
+        self._emails_sorted = load("emails_sorted")
+        self._email_rows = load("email_rows")
+        self._values = {metric: load(metric) for metric in self.metrics}
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def averages(self, metrics: list[str], week_from: int, week_to: int, rows: np.ndarray = None) -> np.ndarray:
+        """Users x metrics float64 averages over the week range; NaN where a user has no value."""
+        first = max(1, int(week_from)) - 1
+        last = min(int(week_to), self.weeks)
+        size = len(self) if rows is None else len(rows)
+        averages = np.full((size, len(metrics)), np.nan)
+        if first >= last or not size:
+            return averages
+
+        for i, metric in enumerate(metrics):
+            grid = self._values[metric]
+            block = grid[:, first:last] if rows is None else grid[rows, first:last]
+            # float32 keeps about 7 significant digits; rounding the cells to 6 decimals restores the stored
+            # values of fractional metrics (0.57 rather than 0.569999992), so scores round like SQL AVG's
+            block = np.round(block.astype(np.float64), 6)
+            counts = np.count_nonzero(~np.isnan(block), axis=1)
+            sums = np.nansum(block, axis=1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                averages[:, i] = sums / counts
+        return averages
+
+    def rows_for_emails(self, emails: list[str]) -> np.ndarray:
+        """User row per email (case-insensitive), -1 for unknown ones."""
+        if not len(self):
+            return np.full(len(emails), -1, dtype=np.int64)
+        encoded = [email.lower().encode("utf-8") for email in emails]
+        # Longer keys would be truncated to the stored width and could match a prefix
+        fits = np.array([len(key) <= self._emails_sorted.itemsize for key in encoded], dtype=bool)
+        keys = np.array(encoded, dtype=self._emails_sorted.dtype)
+        positions = np.minimum(np.searchsorted(self._emails_sorted, keys), len(self) - 1)
+        found = fits & (self._emails_sorted[positions] == keys)
+        return np.where(found, self._email_rows[positions], -1)
+
+    def rows_for_ids(self, user_ids) -> np.ndarray:
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        if not len(self):
+            return np.full(len(user_ids), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.user_ids, user_ids), len(self) - 1)
+        return np.where(self.user_ids[positions] == user_ids, positions, -1)
+
+    def email(self, row: int) -> str:
+        return bytes(self.emails[row]).decode("utf-8")
+
+
+class SnapshotReader:
+    """Answers ranking and per-student queries from the current snapshot under ``root``.
+
+    ``CURRENT`` is re-read at most every ``check_interval`` seconds and a new
+    version is mapped when it changes. Every method returns None when there is
+    no snapshot yet, so callers fall back to the database.
+    """
+
+    def __init__(self, root: str, check_interval: float = 10):
+        self.root = root
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def snapshot(self) -> MetricsSnapshot:
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            with self._lock:
+                if time.monotonic() - self._checked_at >= self.check_interval:
+                    self._checked_at = time.monotonic()
+                    self._switch_version()
+        return self._snapshot
+
+    def top_students(self, metrics: list[str], metric_type: str, week_from: int, week_to: int,
+                     num_students: int) -> ColumnarResult:
+        """Same ranking as MetricsQueryBuilder.top_students: by the mean of the metric averages."""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+
+        averages = snapshot.averages(metrics, week_from, week_to)
+        complete = np.flatnonzero(~np.isnan(averages).any(axis=1))
+        overall = averages[complete].mean(axis=1)
+        if metric_type == "highest":
+            overall = -overall
+        count = min(int(num_students), len(complete))
+        if count <= 0:
+            picked = complete[:0]
+        else:
+            candidates = np.argpartition(overall, count - 1)[:count]
+            picked = complete[candidates[np.argsort(overall[candidates], kind="stable")]]
+
+        return ColumnarResult(
+            ["user_id", *(f"avg_{metric}" for metric in metrics)],
+            snapshot.user_ids[picked].tolist(),
+            np.ascontiguousarray(averages[picked])
+        )
+
+    def student_averages(self, metrics: list[str], emails: list[str], week_from: int, week_to: int) -> ColumnarResult:
+        """Like MetricsQueryBuilder.students_averages: one row per known email, NaN without metrics."""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+
+        rows = snapshot.rows_for_emails(emails)
+        known = rows >= 0
+        return ColumnarResult(
+            ["email", *(f"avg_{metric}" for metric in metrics)],
+            [email for email, is_known in zip(emails, known) if is_known],
+            snapshot.averages(metrics, week_from, week_to, rows=rows[known])
+        )
+
+    def emails_by_ids(self, user_ids: list[int]) -> dict:
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+
+        rows = snapshot.rows_for_ids(user_ids)
+        return {int(user_id): snapshot.email(row) for user_id, row in zip(user_ids, rows.tolist()) if row >= 0}
+
+    def stats(self) -> dict:
+        snapshot = self.snapshot
+        if snapshot is None:
+            return {"version": None}
+        return {
+            "version": snapshot.version,
+            "users": len(snapshot),
+            "weeks": snapshot.weeks,
+            "age_seconds": round(time.time() - snapshot.created_at, 1),
+        }
+
+    def _switch_version(self):
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE), encoding="utf-8") as handle:
+                version = handle.read().strip()
+        except FileNotFoundError:
+            return
+        if self._snapshot is not None and self._snapshot.version == version:
+            return
+        try:
+            self._snapshot = MetricsSnapshot(os.path.join(self.root, version))
+            logging.info(f"Mapped metrics snapshot {version}")
+        except Exception as e:
+            logging.error(f"Failed to map metrics snapshot {version}: {e}")
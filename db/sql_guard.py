@@ -0,0 +1,223 @@
+import logging
+import re
+from collections import Counter
+
+from utils.tracing import registry
+
+# Quoted strings are kept (and masked for parsing); comments are dropped, including any hints the LLM wrote
+_STRINGS_AND_COMMENTS = re.compile(
+    r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"|--[^\n]*|#[^\n]*|/\*.*?\*/",
+    re.S
+)
+_FORBIDDEN_KEYWORDS = {
+    "INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "CREATE", "TRUNCATE", "GRANT", "REVOKE",
+    "RENAME", "CALL", "LOAD", "HANDLER", "LOCK", "UNLOCK", "INTO",
+}
+_FORBIDDEN_FUNCTIONS = re.compile(r"\b(SLEEP|BENCHMARK|GET_LOCK|LOAD_FILE)\s*\(", re.I)
+_LIMIT = re.compile(r"\s+(\d+)(?:(\s*,\s*)(\d+))?", re.I)
+_TABLE_REFERENCE = re.compile(r"(\bFROM|\bJOIN|,)\s*([A-Za-z_]\w*)(?![\w.(])(?:\s+(?:AS\s+)?([A-Za-z_]\w*))?", re.I)
+_CLAUSE = re.compile(r"\b(SELECT|FROM|WHERE|ON|USING|GROUP\s+BY|ORDER\s+BY|HAVING|LIMIT|JOIN|UNION)\b", re.I)
+_COLUMN_REFERENCE = re.compile(r"\b(?:([A-Za-z_]\w*)\.)?([A-Za-z_]\w*)\b")
+_NOT_ALIASES = {
+    "WHERE", "ON", "USING", "JOIN", "LEFT", "RIGHT", "INNER", "OUTER", "CROSS", "NATURAL", "STRAIGHT_JOIN",
+    "FROM", "GROUP", "ORDER", "HAVING", "LIMIT", "UNION", "WINDOW",
+}
+
+
+class SQLGuardError(ValueError):
+    pass
+
+
+class SQLGuard:
+    """Vets LLM-generated SQL before it runs on the shared pool.
+
+    ``vet`` accepts a single read-only SELECT (or WITH ... SELECT), caps its
+    top-level LIMIT at ``max_rows`` (adding one when missing) and adds a
+    MAX_EXECUTION_TIME hint of ``timeout_ms``. It then runs EXPLAIN and
+    rejects statements whose plan examines more than ``max_scan_rows`` rows,
+    estimated as the product of the per-table row estimates of each SELECT.
+
+    Full table scans of at least ``advise_min_rows`` rows are logged with
+    the index that would have served them: the scanned table's columns used
+    in WHERE, ON, USING and GROUP BY, in the order they appear. The advisor
+    is a heuristic on the statement text and needs MySQL's tabular EXPLAIN.
+    """
+
+    def __init__(self, db_pool, max_rows: int = 1000, max_scan_rows: int = 10_000_000, timeout_ms: int = 10000,
+                 advise_min_rows: int = 10000):
+        self.db_pool = db_pool
+        self.max_rows = max_rows
+        self.max_scan_rows = max_scan_rows
+        self.timeout_ms = timeout_ms
+        self.advise_min_rows = advise_min_rows
+        self.passed = 0
+        self.rewritten = 0
+        self.rejected = 0
+        self.index_suggestions = Counter()
+        self._table_columns = {}
+
+    def vet(self, sql: str) -> str:
+        """Return ``sql`` as it should run, or raise SQLGuardError."""
+        try:
+            statement = self._strip_comments(sql).strip().rstrip(";").strip()
+            masked = self._mask_strings(statement)
+            self._check_read_only(masked)
+            limited = self._limit_rows(statement, masked)
+            guarded = self._add_timeout(limited)
+            plan = self._explain(guarded)
+            self._advise(self._mask_strings(guarded), plan)
+            self._check_cost(plan)
+        except SQLGuardError as e:
+            self.rejected += 1
+            registry.inc("sql_guard_total", result="rejected")
+            logging.warning(f"SQL guard rejected query: {e}\n{sql}")
+            raise
+
+        result = "rewritten" if limited != statement else "passed"
+        setattr(self, result, getattr(self, result) + 1)
+        registry.inc("sql_guard_total", result=result)
+        return guarded
+
+    def stats(self) -> dict:
+        return {
+            "passed": self.passed,
+            "rewritten": self.rewritten,
+            "rejected": self.rejected,
+            "index_suggestions": dict(self.index_suggestions.most_common()),
+        }
+
+    @staticmethod
+    def _strip_comments(sql: str) -> str:
+        return _STRINGS_AND_COMMENTS.sub(
+            lambda match: match.group(0) if match.group(0)[0] in "'\"" else " ", sql
+        )
+
+    @staticmethod
+    def _mask_strings(sql: str) -> str:
+        # Same length as the input, so positions found in the masked text apply to the statement
+        return _STRINGS_AND_COMMENTS.sub(lambda match: "'" + "_" * (len(match.group(0)) - 2) + "'", sql)
+
+    @staticmethod
+    def _check_read_only(masked: str):
+        if ";" in masked:
+            raise SQLGuardError("Only a single statement is allowed")
+        words = re.findall(r"[A-Za-z_]\w*", masked.upper())
+        if not words or words[0] not in ("SELECT", "WITH"):
+            raise SQLGuardError("Only SELECT statements are allowed")
+        forbidden = _FORBIDDEN_KEYWORDS.intersection(words)
+        if forbidden:
+            raise SQLGuardError(f"Forbidden keywords: {', '.join(sorted(forbidden))}")
+        function = _FORBIDDEN_FUNCTIONS.search(masked)
+        if function:
+            raise SQLGuardError(f"Forbidden function: {function.group(1).upper()}")
+
+    def _limit_rows(self, statement: str, masked: str) -> str:
+        limit = None
+        for match in self._top_level(masked, r"\bLIMIT\b"):
+            limit = match
+        if limit is None:
+            return f"{statement} LIMIT {self.max_rows}"
+
+        count = _LIMIT.match(masked, limit.end())
+        if count is None:
+            raise SQLGuardError("LIMIT must be a number")
+        # LIMIT offset, count or LIMIT count [OFFSET offset]
+        group = 3 if count.group(3) else 1
+        if int(count.group(group)) <= self.max_rows:
+            return statement
+        return f"{statement[:count.start(group)]}{self.max_rows}{statement[count.end(group):]}"
+
+    def _add_timeout(self, statement: str) -> str:
+        if not self.timeout_ms:
+            return statement
+        # Only the outermost SELECT takes the hint; CTE bodies are inside parentheses
+        select = next(self._top_level(self._mask_strings(statement), r"\bSELECT\b"), None)
+        if select is None:
+            return statement
+        hint = f" /*+ MAX_EXECUTION_TIME({int(self.timeout_ms)}) */"
+        return f"{statement[:select.end()]}{hint}{statement[select.end():]}"
+
+    @staticmethod
+    def _top_level(masked: str, pattern: str):
+        depth = 0
+        for match in re.finditer(rf"\(|\)|{pattern}", masked, re.I):
+            if match.group(0) == "(":
+                depth += 1
+            elif match.group(0) == ")":
+                depth -= 1
+            elif depth == 0:
+                yield match
+
+    def _explain(self, statement: str) -> list[dict]:
+        try:
+            with self.db_pool.cursor() as cursor:
+                cursor.execute(f"EXPLAIN {statement}")
+                columns = [column[0].lower() for column in cursor.description]
+                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        except Exception as e:
+            raise SQLGuardError(f"EXPLAIN failed: {e}")
+
+    def _check_cost(self, plan: list[dict]):
+        if not plan or "rows" not in plan[0]:
+            # Not MySQL's tabular plan (e.g. SQLite bytecode); only the static checks apply
+            return
+
+        estimates = {}
+        for step in plan:
+            estimates[step.get("id")] = estimates.get(step.get("id"), 1) * float(step.get("rows") or 1)
+        examined = sum(estimates.values())
+        if examined > self.max_scan_rows:
+            raise SQLGuardError(f"Plan examines about {examined:,.0f} rows, above the limit of {self.max_scan_rows:,}")
+
+    def _advise(self, masked: str, plan: list[dict]):
+        aliases = {}
+        for keyword, table, alias in _TABLE_REFERENCE.findall(masked):
+            names = [table] + ([alias] if alias and alias.upper() not in _NOT_ALIASES else [])
+            for name in names:
+                # After a comma this may be a select-list item; never let it shadow a FROM or JOIN name
+                if keyword == "," and name.lower() in aliases:
+                    continue
+                aliases[name.lower()] = table
+
+        for step in plan:
+            if str(step.get("type")).upper() != "ALL" or float(step.get("rows") or 0) < self.advise_min_rows:
+                continue
+            table = aliases.get(str(step.get("table")).lower())
+            if table is None:
+                continue
+            columns = self._predicate_columns(masked, step["table"], table, aliases)
+            if not columns:
+                continue
+            suggestion = f"{table}({', '.join(columns)})"
+            self.index_suggestions[suggestion] += 1
+            logging.warning(
+                f"SQL guard: full scan of {table} (~{float(step['rows']):,.0f} rows); "
+                f"an index on {suggestion} would have helped"
+            )
+
+    def _predicate_columns(self, masked: str, alias: str, table: str, aliases: dict) -> list[str]:
+        known = self._columns_of(table)
+        parts = _CLAUSE.split(masked)
+        columns = []
+        # split() with a capturing group alternates text and the clause keyword that precedes it
+        for keyword, text in zip(parts[1::2], parts[2::2]):
+            if re.sub(r"\s+", " ", keyword.upper()) not in ("WHERE", "ON", "USING", "GROUP BY"):
+                continue
+            for qualifier, column in _COLUMN_REFERENCE.findall(text):
+                if qualifier and aliases.get(qualifier.lower()) != table and qualifier.lower() != str(alias).lower():
+                    continue
+                if column.lower() in known and column.lower() not in columns:
+                    columns.append(column.lower())
+        return columns
+
+    def _columns_of(self, table: str) -> set:
+        if table not in self._table_columns:
+            try:
+                with self.db_pool.cursor() as cursor:
+                    cursor.execute(f"SELECT * FROM {table} LIMIT 0")
+                    self._table_columns[table] = {column[0].lower() for column in cursor.description}
+                    cursor.fetchall()
+            except Exception as e:
+                logging.error(f"SQL guard: could not read the columns of {table}: {e}")
+                return set()
+        return self._table_columns[table]
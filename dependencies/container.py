@@ -1,40 +1,361 @@
-from langchain_openai import ChatOpenAI
-from langchain_community.utilities import SQLDatabase
-import mysql.connector
+import logging
+import time
+from typing import TYPE_CHECKING
+
 from config.settings import Settings
 
+if TYPE_CHECKING:
+    from langchain_community.utilities import SQLDatabase
+    from langchain_core.language_models.chat_models import BaseChatModel
+
+    from agents.dropout_risk_agent import DropoutRiskAgent
+    from agents.sudent_analysis_agent import StudentAnalysisAgent
+    from db.connection_pool import ConnectionPool
+    from db.metrics_queries import MetricsQueryBuilder
+    from db.schema_cache import SchemaCache
+    from db.snapshot import SnapshotReader
+    from db.sql_guard import SQLGuard
+    from jobs.queue import JobQueue
+    from services.email_search import EmailSearchIndex
+    from services.fragment_cache import DataVersion, FragmentCache
+    from services.llm_scheduler import LLMScheduler
+    from services.message_provider import MotivationMessageProvider
+    from services.metrics_aggregates import MetricsAggregates
+    from services.metrics_analyzer import MetricsAnalyser
+    from services.metrics_ingestion import MetricsIngestor
+    from services.report_cache import ReportCache
+    from services.sql_cache import SQLCache
+    from services.student_directory import StudentDirectory
+
+
 class DependencyContainer:
-    """Singleton-like container for shared services."""
+    """Singleton-like container for shared services.
+
+    Services are built on first use and their modules imported only then, so
+    CLI paths that never touch the LLM or SQLAlchemy do not pay for importing them.
+    """
 
     def __init__(self):
         self._llm = None
-        self._db = None
-        self._mydb = None
+        self._llm_scheduler = None
+        self._sql_db = None
+        self._db_pool = None
+        self._sql_cache = None
+        self._sql_guard = None
+        self._sql_guard_built = False
+        self._schema_cache = None
+        self._message_provider = None
+        self._student_directory = None
+        self._email_search = None
+        self._metrics_aggregates = None
+        self._report_cache = None
+        self._report_cache_built = False
+        self._job_queue = None
+        self._metrics_analyser = None
+        self._metrics_queries = None
+        self._student_analysis_agent = None
+        self._dropout_risk_agent = None
+        self._metrics_ingestor = None
+        self._metrics_snapshot = None
+        self._metrics_snapshot_built = False
+        self._data_version = None
+        self._fragment_cache = None
+        self._fragment_cache_built = False
+
+    def override(self, **services):
+        """Replace services before they are first built, e.g. ``override(llm=fake, db_pool=pool)``."""
+        for name, service in services.items():
+            if not hasattr(self, f"_{name}"):
+                raise AttributeError(f"Unknown service '{name}'")
+            setattr(self, f"_{name}", service)
+            if name in ("report_cache", "metrics_snapshot", "fragment_cache", "sql_guard"):
+                setattr(self, f"_{name}_built", True)
 
     @property
-    def llm(self) -> ChatOpenAI:
+    def llm(self) -> "BaseChatModel":
         if self._llm is None:
-            self._llm = ChatOpenAI(
-                api_key=Settings.OPENAI_API_KEY,
-                model=Settings.OPENAI_API_MODEL
-            )
+            from langchain_openai import ChatOpenAI
+            from services.chat_model import ScheduledChatModel, TokenUsageCallback
+
+            if not Settings.LLM_SCHEDULER:
+                self._llm = ChatOpenAI(
+                    api_key=Settings.OPENAI_API_KEY,
+                    model=Settings.OPENAI_API_MODEL,
+                    callbacks=[TokenUsageCallback()]
+                )
+            else:
+                # Retries are the scheduler's job, so the client does not retry on its own
+                chat_model = ChatOpenAI(
+                    api_key=Settings.OPENAI_API_KEY,
+                    model=Settings.OPENAI_API_MODEL,
+                    max_retries=0
+                )
+                self._llm = ScheduledChatModel(
+                    chat_model,
+                    self.llm_scheduler,
+                    expected_output_tokens=Settings.LLM_EXPECTED_OUTPUT_TOKENS,
+                    callbacks=[TokenUsageCallback()]
+                )
         return self._llm
 
     @property
-    def sql_db(self) -> SQLDatabase:
-        if self._db is None:
-            self._db = SQLDatabase.from_uri(Settings.mysql_uri())
-        return self._db
+    def llm_scheduler(self) -> "LLMScheduler":
+        if self._llm_scheduler is None:
+            from services.llm_scheduler import LLMScheduler
+            self._llm_scheduler = LLMScheduler(
+                max_concurrency=Settings.LLM_MAX_CONCURRENCY,
+                requests_per_minute=Settings.LLM_REQUESTS_PER_MINUTE,
+                tokens_per_minute=Settings.LLM_TOKENS_PER_MINUTE,
+                max_retries=Settings.LLM_MAX_RETRIES,
+                retry_base_delay=Settings.LLM_RETRY_BASE_DELAY,
+                retry_max_delay=Settings.LLM_RETRY_MAX_DELAY
+            )
+        return self._llm_scheduler
+
+    @property
+    def sql_db(self) -> "SQLDatabase":
+        if self._sql_db is None:
+            from langchain_community.utilities import SQLDatabase
+            self._sql_db = SQLDatabase.from_uri(
+                Settings.mysql_uri(),
+                sample_rows_in_table_info=Settings.SCHEMA_SAMPLE_ROWS
+            )
+        return self._sql_db
+
+    @property
+    def schema_cache(self) -> "SchemaCache":
+        if self._schema_cache is None:
+            from db.schema_cache import SchemaCache
+            self._schema_cache = SchemaCache(self.sql_db)
+        return self._schema_cache
+
+    @property
+    def db_pool(self) -> "ConnectionPool":
+        if self._db_pool is None:
+            from db.connection_pool import ConnectionPool
+            self._db_pool = ConnectionPool(
+                Settings.mysql_dsn(),
+                size=Settings.DB_POOL_SIZE,
+                checkout_timeout=Settings.DB_POOL_TIMEOUT
+            )
+        return self._db_pool
+
+    @property
+    def student_directory(self) -> "StudentDirectory":
+        if self._student_directory is None:
+            from services.student_directory import StudentDirectory
+            self._student_directory = StudentDirectory(self.db_pool, count_ttl=Settings.STUDENT_COUNT_TTL)
+        return self._student_directory
+
+    @property
+    def email_search(self) -> "EmailSearchIndex":
+        if self._email_search is None:
+            from services.email_search import EmailSearchIndex
+            self._email_search = EmailSearchIndex(self.db_pool, refresh_interval=Settings.EMAIL_SEARCH_REFRESH_INTERVAL)
+        return self._email_search
+
+    @property
+    def metrics_aggregates(self) -> "MetricsAggregates":
+        if self._metrics_aggregates is None:
+            from services.metrics_aggregates import MetricsAggregates
+            self._metrics_aggregates = MetricsAggregates(
+                self.db_pool,
+                metrics=Settings.metric_weights().keys(),
+                max_week=Settings.MAX_WEEK
+            )
+        return self._metrics_aggregates
+
+    @property
+    def message_provider(self) -> "MotivationMessageProvider":
+        if self._message_provider is None:
+            from services.message_provider import MotivationMessageProvider
+            self._message_provider = MotivationMessageProvider(
+                self.llm,
+                mode=Settings.MESSAGE_MODE,
+                pool_size=Settings.MESSAGE_POOL_SIZE,
+                refresh_interval=Settings.MESSAGE_REFRESH_INTERVAL
+            )
+            self._message_provider.start_background_refresh()
+        return self._message_provider
+
+    @property
+    def report_cache(self) -> "ReportCache":
+        """Shared report cache, or None when REPORT_CACHE_BACKEND disables it."""
+        if not self._report_cache_built:
+            from services.report_cache import build_report_cache
+            self._report_cache = build_report_cache(
+                Settings.REPORT_CACHE_BACKEND,
+                directory=Settings.REPORT_CACHE_DIR,
+                ttl=Settings.REPORT_CACHE_TTL,
+                stale_ttl=Settings.REPORT_CACHE_STALE_TTL,
+                db_pool=self.db_pool,
+                check_interval=Settings.REPORT_CACHE_CHECK_INTERVAL,
+                max_entries=Settings.REPORT_CACHE_MAX_ENTRIES
+            )
+            self._report_cache_built = True
+        return self._report_cache
 
     @property
-    def mysql_connection(self):
-        if self._mydb is None:
-            self._mydb = mysql.connector.connect(
-                host=Settings.MYSQL_HOST,
-                user=Settings.MYSQL_USER,
-                password=Settings.MYSQL_PASSWORD,
-                database=Settings.MYSQL_DB
+    def sql_cache(self) -> "SQLCache":
+        if self._sql_cache is None:
+            from services.sql_cache import build_sql_cache
+            self._sql_cache = build_sql_cache(
+                Settings.SQL_CACHE_BACKEND,
+                max_size=Settings.SQL_CACHE_SIZE,
+                ttl=Settings.SQL_CACHE_TTL,
+                path=Settings.SQL_CACHE_PATH
             )
-        return self._mydb
+        return self._sql_cache
+
+    @property
+    def sql_guard(self) -> "SQLGuard":
+        """Vetting of LLM-generated SQL, or None when SQL_GUARD is disabled."""
+        if not self._sql_guard_built:
+            if Settings.SQL_GUARD:
+                from db.sql_guard import SQLGuard
+                self._sql_guard = SQLGuard(
+                    self.db_pool,
+                    max_rows=Settings.SQL_GUARD_MAX_ROWS,
+                    max_scan_rows=Settings.SQL_GUARD_MAX_SCAN_ROWS,
+                    timeout_ms=Settings.SQL_GUARD_TIMEOUT_MS
+                )
+            self._sql_guard_built = True
+        return self._sql_guard
+
+    @property
+    def job_queue(self) -> "JobQueue":
+        """Background job queue; workers are started by whoever serves jobs (app or cli/jobs.py)."""
+        if self._job_queue is None:
+            # Handlers build agents, which import this module
+            from jobs.handlers import HANDLERS
+            from jobs.queue import JobQueue
+            self._job_queue = JobQueue(
+                Settings.JOB_QUEUE_PATH,
+                handlers=HANDLERS,
+                workers=Settings.JOB_WORKERS,
+                stale_after=Settings.JOB_STALE_AFTER
+            )
+        return self._job_queue
+
+    @property
+    def metrics_snapshot(self) -> "SnapshotReader":
+        """Reader of the on-disk metrics snapshot, or None unless SNAPSHOT_READS is enabled."""
+        if not self._metrics_snapshot_built:
+            if Settings.SNAPSHOT_READS:
+                from db.snapshot import SnapshotReader
+                self._metrics_snapshot = SnapshotReader(
+                    Settings.SNAPSHOT_DIR,
+                    check_interval=Settings.SNAPSHOT_CHECK_INTERVAL
+                )
+            self._metrics_snapshot_built = True
+        return self._metrics_snapshot
+
+    @property
+    def data_version(self) -> "DataVersion":
+        """Token that changes when users or student_metrics get new rows, or a new snapshot is mapped."""
+        if self._data_version is None:
+            from services.fragment_cache import DataVersion
+            self._data_version = DataVersion(
+                self.db_pool,
+                check_interval=Settings.DATA_VERSION_CHECK_INTERVAL,
+                snapshot=self.metrics_snapshot
+            )
+        return self._data_version
+
+    @property
+    def fragment_cache(self) -> "FragmentCache":
+        """Cache of rendered HTTP responses, or None when FRAGMENT_CACHE is disabled."""
+        if not self._fragment_cache_built:
+            if Settings.FRAGMENT_CACHE:
+                from services.fragment_cache import FragmentCache
+                self._fragment_cache = FragmentCache(
+                    self.data_version,
+                    max_entries=Settings.FRAGMENT_CACHE_SIZE,
+                    ttl=Settings.FRAGMENT_CACHE_TTL,
+                    min_compress_size=Settings.COMPRESS_MIN_SIZE
+                )
+            self._fragment_cache_built = True
+        return self._fragment_cache
+
+    @property
+    def metrics_ingestor(self) -> "MetricsIngestor":
+        """Ingestion of new weekly metrics; call ``start()`` to flush partial batches in the background."""
+        if self._metrics_ingestor is None:
+            from services.metrics_ingestion import MetricsIngestor
+            self._metrics_ingestor = MetricsIngestor(
+                self.db_pool,
+                Settings.metric_weights(),
+                batch_size=Settings.INGEST_BATCH_SIZE,
+                flush_interval=Settings.INGEST_FLUSH_INTERVAL,
+                aggregates=self.metrics_aggregates if Settings.METRIC_AGGREGATES else None,
+                report_cache=self.report_cache
+            )
+        return self._metrics_ingestor
+
+    @property
+    def metrics_analyser(self) -> "MetricsAnalyser":
+        if self._metrics_analyser is None:
+            from services.metrics_analyzer import MetricsAnalyser
+            self._metrics_analyser = MetricsAnalyser(
+                llm=self.llm,
+                metric_weights=Settings.metric_weights(),
+                message_provider=self.message_provider
+            )
+        return self._metrics_analyser
+
+    @property
+    def metrics_queries(self) -> "MetricsQueryBuilder":
+        if self._metrics_queries is None:
+            from db.metrics_queries import MetricsQueryBuilder
+            self._metrics_queries = MetricsQueryBuilder(
+                Settings.metric_weights().keys(),
+                use_aggregates=Settings.METRIC_AGGREGATES,
+                max_week=Settings.MAX_WEEK
+            )
+        return self._metrics_queries
+
+    @property
+    def student_analysis_agent(self) -> "StudentAnalysisAgent":
+        """Process-wide agent; agents keep no per-request state, so one instance serves every request."""
+        if self._student_analysis_agent is None:
+            from agents.sudent_analysis_agent import StudentAnalysisAgent
+            self._student_analysis_agent = StudentAnalysisAgent()
+        return self._student_analysis_agent
+
+    @property
+    def dropout_risk_agent(self) -> "DropoutRiskAgent":
+        if self._dropout_risk_agent is None:
+            from agents.dropout_risk_agent import DropoutRiskAgent
+            self._dropout_risk_agent = DropoutRiskAgent()
+        return self._dropout_risk_agent
+
+    def warm_up(self) -> dict:
+        """Build the services a request needs before the first one arrives; returns seconds per step.
+
+        A failing step is logged and skipped so an unavailable dependency does
+        not stop the app from starting.
+        """
+        steps = [
+            ("db_pool", lambda: self.db_pool.fetchall("SELECT 1")),
+            ("llm", lambda: self.llm),
+            ("agents", lambda: (self.student_analysis_agent, self.dropout_risk_agent)),
+        ]
+        if not Settings.SQL_FAST_PATH:
+            # Only the LLM-generated SQL path reads the schema; reflection is the slowest step
+            from agents.base import BaseAgent
+            steps.append(("schema_cache", lambda: self.schema_cache.get(BaseAgent.schema_tables)))
+
+        timings = {}
+        for name, step in steps:
+            started = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                logging.error(f"Warm-up step {name} failed: {e}")
+                continue
+            timings[name] = round(time.perf_counter() - started, 3)
+
+        logging.info(f"Warm-up finished: {timings}")
+        return timings
 
 container = DependencyContainer()
\ No newline at end of file
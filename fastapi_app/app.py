@@ -0,0 +1,228 @@
+import json
+import math
+import os
+import time
+from datetime import datetime
+
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+from config.settings import BASE_DIR, Settings
+from dependencies.container import container
+from jobs.handlers import job_params
+from utils.analysis_request import InvalidAnalysisRequest, parse_analysis_request
+from utils.logger import setup_logger
+from utils.tracing import registry, span, start_trace
+
+app = FastAPI(title="Student Motivation Analysis")
+logger = setup_logger("fastapi_app")
+app.mount("/static", StaticFiles(directory=BASE_DIR / "static"), name="static")
+
+# The templates are shared with the Flask app, so provide the two Flask globals they use
+templates = Environment(
+    loader=FileSystemLoader(BASE_DIR / "templates"),
+    autoescape=select_autoescape(["html"])
+)
+templates.globals["config"] = {"API_BASE_URL": os.getenv("API_BASE_URL", "")}
+templates.globals["url_for"] = lambda endpoint, filename: f"/{endpoint}/{filename}"
+
+if Settings.EMAIL_SEARCH_INDEX:
+    container.email_search.start()
+if Settings.JOB_WORKERS > 0:
+    container.job_queue.start()
+if Settings.WARM_UP:
+    container.warm_up()
+
+
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    registry.observe(
+        "http_request_seconds",
+        time.perf_counter() - started,
+        endpoint=getattr(route, "name", None) or "unknown"
+    )
+    return response
+
+
+def render(template: str, **context) -> str:
+    return templates.get_template(template).render(**context)
+
+
+def render_student(item: dict) -> str:
+    analysis = item["student_analysis"]
+    return render(
+        "partials/student_summary.html",
+        email=item["email"],
+        metrics=analysis["metrics"],
+        metric_zone=analysis["metric_zone"],
+        subtotal=analysis["subtotal"],
+        total=analysis["total"],
+        motivation_message=analysis["motivation_message"]
+    )
+
+
+def render_analysis(action: str, result, email: str = None) -> str:
+    with span("render"):
+        if action == "analyse_student":
+            return render("partials/analysis.html", analysis=result, student_email=email)
+        if action == "analyse_students":
+            return render("partials/students_analysis.html", analysis=result)
+        return render("partials/motivated.html", analysis=result)
+
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.get("/", response_class=HTMLResponse)
+async def index():
+    current_week = datetime.now().isocalendar()[1]
+    return render("index.html", current_week=current_week)
+
+
+@app.get("/students", response_class=HTMLResponse)
+async def students_table(page: int = 1, after: str = None, before: str = None):
+    directory = container.student_directory
+    try:
+        result = await run_in_threadpool(directory.page, after=after or None, before=before or None)
+        total = await run_in_threadpool(directory.count)
+    except Exception:
+        logger.exception("Error fetching students")
+        result, total = {"students": [], "next_cursor": None, "prev_cursor": None}, 0
+
+    return render(
+        "partials/table.html",
+        students=result["students"],
+        page=page,
+        total_pages=math.ceil(total / 10),
+        next_cursor=result["next_cursor"],
+        prev_cursor=result["prev_cursor"]
+    )
+
+
+@app.api_route("/analysis", methods=["GET", "POST"])
+async def student_analysis(request: Request):
+    trace = start_trace()
+    try:
+        # GET takes the same fields as query parameters, as in the Flask app
+        data = await request.json() if request.method == "POST" else dict(request.query_params)
+        try:
+            params = parse_analysis_request(data or {})
+        except InvalidAnalysisRequest as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        action, email, emails = params["action"], params["email"], params["emails"]
+        week_from, week_to, num_students = params["week_from"], params["week_to"], params["num_students"]
+
+        if action == "analyse_students" and not emails:
+            # Without a list, analyse one page of the /students table, addressed by the same cursors
+            page = await run_in_threadpool(
+                container.student_directory.page,
+                after=params["after"],
+                before=params["before"]
+            )
+            emails = [student["email"] for student in page["students"]]
+
+        if params["background"]:
+            params = job_params(action, week_from, week_to, email, num_students, emails)
+            job_id = await run_in_threadpool(container.job_queue.submit, action, params)
+            return JSONResponse({"job_id": job_id, "status_url": f"/jobs/{job_id}"}, status_code=202)
+
+        # Agents block on the DB and the LLM, so they run on the threadpool
+        if action == "analyse_student":
+            agent = container.student_analysis_agent
+            result = await run_in_threadpool(agent.run_analysis, email, week_from, week_to)
+        elif action == "analyse_students":
+            agent = container.student_analysis_agent
+            result = await run_in_threadpool(agent.run_batch, emails, week_from, week_to)
+        else:
+            agent = container.dropout_risk_agent
+            approach = 'highest' if action == "most_motivated" else 'lowest'
+            result = await run_in_threadpool(agent.run_analysis, approach, week_from, week_to, num_students)
+        response = {"html": render_analysis(action, result, email)}
+        if params["trace"]:
+            # Per-stage breakdown of this request: spans, LLM tokens and cache hits
+            response["trace"] = trace.summary()
+        return response
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = await run_in_threadpool(container.job_queue.get, job_id)
+    if job is None:
+        return JSONResponse({"error": "Unknown job"}, status_code=404)
+
+    response = {key: job[key] for key in ("id", "kind", "status", "progress", "error")}
+    if job["status"] == "done":
+        response["html"] = render_analysis(job["kind"], job["result"], job["params"].get("email"))
+    return response
+
+
+@app.get("/analysis/stream")
+async def stream_analysis(action: str, week_from: int, week_to: int, num_students: int = 1):
+    """Server-sent events: one ``student`` event per finished student, then ``done`` with the ranked table."""
+    if action not in ("most_motivated", "less_motivated"):
+        return JSONResponse({"error": "Unknown action"}, status_code=400)
+
+    approach = 'highest' if action == "most_motivated" else 'lowest'
+
+    async def events():
+        agent = await run_in_threadpool(lambda: container.dropout_risk_agent)
+        finished = []
+        try:
+            async for rank, item in iterate_in_threadpool(
+                agent.iter_analysis(approach, week_from, week_to, num_students)
+            ):
+                finished.append(item)
+                yield sse("student", {"rank": rank, "email": item["email"], "html": render_student(item)})
+        except Exception as e:
+            yield sse("error", {"error": str(e)})
+            return
+
+        ranked = agent.sort_by_metric(finished, approach)
+        yield sse("done", {"html": render("partials/motivated.html", analysis=ranked)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/search-students")
+async def search_students(q: str = ""):
+    query = q.strip()
+    if not query or len(query) < 2:
+        return []
+
+    results = container.email_search.search(query) if Settings.EMAIL_SEARCH_INDEX else None
+    if results is None:
+        # Index disabled or still warming up
+        sql = "SELECT email FROM users WHERE email LIKE %s LIMIT 10"
+        rows = await run_in_threadpool(container.db_pool.fetchall, sql, (f"%{query}%",))
+        results = [row[0] for row in rows]
+
+    return results
+
+
+@app.get("/sql-cache/stats")
+async def sql_cache_stats():
+    return container.sql_cache.stats()
+
+
+@app.get("/sql-guard/stats")
+async def sql_guard_stats():
+    guard = container.sql_guard
+    return guard.stats() if guard is not None else {"enabled": False}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,79 @@
+import logging
+
+from dependencies.container import container
+from services.llm_scheduler import llm_options
+
+
+def analyse_student(ctx) -> dict:
+    params = ctx.params
+    ctx.set_progress(0, 1)
+    result = container.student_analysis_agent.run_analysis(params["email"], params["week_from"], params["week_to"])
+    ctx.set_progress(1, 1)
+    return result
+
+
+def analyse_students(ctx) -> list[dict]:
+    params = ctx.params
+    ctx.set_progress(0, len(params["emails"]))
+    result = container.student_analysis_agent.run_batch(params["emails"], params["week_from"], params["week_to"])
+    ctx.set_progress(len(result), len(result))
+    return result
+
+
+def _rank_students(ctx, metric_type: str) -> list[dict]:
+    # Cohort jobs queue behind interactive requests for the LLM
+    with llm_options(lane="bulk"):
+        return _rank_and_checkpoint(ctx, metric_type)
+
+
+def _rank_and_checkpoint(ctx, metric_type: str) -> list[dict]:
+    params = ctx.params
+    agent = container.dropout_risk_agent
+    week_from, week_to, num_students = params["week_from"], params["week_to"], params["num_students"]
+    parsed = agent.rank_students(metric_type, week_from, week_to, num_students)
+
+    # Students finished before a crash are checkpointed under their user id and not analysed again
+    done = ctx.checkpoints()
+    pending = [(user_id, email, values) for user_id, email, values in parsed if str(user_id) not in done]
+    ctx.set_progress(len(parsed) - len(pending), len(parsed))
+    if done:
+        logging.info(f"Job {ctx.job_id}: resuming with {len(done)} students already analysed")
+
+    # Failed students are logged by the agent and left out, as in a synchronous report
+    for index, item in agent.iter_analysis(metric_type, week_from, week_to, num_students, ranked=pending):
+        user_id = pending[index][0]
+        done[str(user_id)] = item
+        ctx.checkpoint(str(user_id), done[str(user_id)])
+        ctx.set_progress(len(done), len(parsed))
+
+    summary = [done[str(user_id)] for user_id, _, _ in parsed if str(user_id) in done]
+    return agent.sort_by_metric(summary, metric_type)
+
+
+def most_motivated(ctx) -> list[dict]:
+    return _rank_students(ctx, "highest")
+
+
+def less_motivated(ctx) -> list[dict]:
+    return _rank_students(ctx, "lowest")
+
+
+def job_params(action: str, week_from: int, week_to: int, email: str = None, num_students: int = 1,
+               emails: list[str] = None) -> dict:
+    """Parameters for an /analysis action; identical requests map to the same dict and are deduplicated."""
+    params = {"week_from": int(week_from), "week_to": int(week_to)}
+    if action == "analyse_student":
+        params["email"] = email
+    elif action == "analyse_students":
+        params["emails"] = list(emails or [])
+    else:
+        params["num_students"] = int(num_students)
+    return params
+
+
+HANDLERS = {
+    "analyse_student": analyse_student,
+    "analyse_students": analyse_students,
+    "most_motivated": most_motivated,
+    "less_motivated": less_motivated,
+}
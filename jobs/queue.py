@@ -0,0 +1,243 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobContext:
+    """Handed to a job handler: progress reporting and per-item checkpoints."""
+
+    def __init__(self, queue, job_id: str, params: dict):
+        self.queue = queue
+        self.job_id = job_id
+        self.params = params
+
+    def checkpoints(self) -> dict:
+        return self.queue.checkpoints(self.job_id)
+
+    def checkpoint(self, item_key: str, value):
+        self.queue.save_checkpoint(self.job_id, item_key, value)
+
+    def set_progress(self, done: int, total: int):
+        self.queue.set_progress(self.job_id, done, total)
+
+
+class JobQueue:
+    """Local, SQLite-backed job queue with an in-process worker pool.
+
+    Jobs with the same kind and parameters are deduplicated while one is
+    queued or running. Handlers checkpoint finished items, and a running job
+    whose heartbeat stops (crashed worker or process) goes back to the queue
+    and resumes from its checkpoints. ``path=":memory:"`` keeps everything
+    in-process.
+    """
+
+    def __init__(self, path: str, handlers: dict = None, workers: int = 2, stale_after: float = 120,
+                 poll_interval: float = 1.0):
+        self.path = path
+        self.handlers = dict(handlers or {})
+        self.workers = workers
+        self.stale_after = stale_after
+        self.poll_interval = poll_interval
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._create_tables()
+
+    def register(self, kind: str, handler):
+        self.handlers[kind] = handler
+
+    def submit(self, kind: str, params: dict) -> str:
+        dedup_key = f"{kind}:{json.dumps(params, sort_keys=True)}"
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE dedup_key = ? AND status IN (?, ?)",
+                    (dedup_key, QUEUED, RUNNING)
+                ).fetchone()
+                if row:
+                    self._conn.execute("COMMIT")
+                    return row[0]
+
+                job_id = uuid.uuid4().hex
+                self._conn.execute(
+                    """
+                    INSERT INTO jobs (id, kind, params, dedup_key, status, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (job_id, kind, json.dumps(params), dedup_key, QUEUED, now, now)
+                )
+                self._conn.execute("COMMIT")
+                return job_id
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT id, kind, params, status, progress_done, progress_total, result, error, created_at, updated_at
+                FROM jobs WHERE id = ?
+                """,
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        return {
+            "id": row[0],
+            "kind": row[1],
+            "params": json.loads(row[2]),
+            "status": row[3],
+            "progress": {"done": row[4], "total": row[5]},
+            "result": json.loads(row[6]) if row[6] is not None else None,
+            "error": row[7],
+            "created_at": row[8],
+            "updated_at": row[9],
+        }
+
+    def checkpoints(self, job_id: str) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT item_key, value FROM checkpoints WHERE job_id = ?", (job_id,)).fetchall()
+        return {item_key: json.loads(value) for item_key, value in rows}
+
+    def save_checkpoint(self, job_id: str, item_key: str, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (job_id, item_key, value) VALUES (?, ?, ?)",
+                (job_id, item_key, json.dumps(value))
+            )
+            self._conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def set_progress(self, job_id: str, done: int, total: int):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET progress_done = ?, progress_total = ?, heartbeat_at = ?, updated_at = ? WHERE id = ?",
+                (done, total, now, now, job_id)
+            )
+
+    def start(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work_loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def run_once(self) -> bool:
+        """Claim and run one job in the calling thread; returns False when the queue is empty."""
+        job = self._claim()
+        if job is None:
+            return False
+
+        job_id, kind, params = job
+        handler = self.handlers.get(kind)
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job_id, stop), name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind '{kind}'")
+            result = handler(JobContext(self, job_id, params))
+            self._finish(job_id, DONE, result=result)
+        except Exception as e:
+            logging.error(f"Job {job_id} ({kind}) failed: {e}")
+            self._finish(job_id, FAILED, error=str(e))
+        finally:
+            stop.set()
+        return True
+
+    def _heartbeat(self, job_id: str, stop: threading.Event):
+        # Keeps slow items (one long LLM call) from looking like a dead worker
+        while not stop.wait(self.stale_after / 3):
+            with self._lock:
+                self._conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def _work_loop(self):
+        while True:
+            try:
+                if not self.run_once():
+                    time.sleep(self.poll_interval)
+            except Exception as e:
+                logging.error(f"Job worker error: {e}")
+                time.sleep(self.poll_interval)
+
+    def _claim(self):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs whose worker stopped sending heartbeats resume from their checkpoints
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, updated_at = ? WHERE status = ? AND heartbeat_at < ?",
+                    (QUEUED, now, RUNNING, now - self.stale_after)
+                )
+                row = self._conn.execute(
+                    "SELECT id, kind, params FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                    (QUEUED,)
+                ).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, heartbeat_at = ?, updated_at = ?, worker = ? WHERE id = ?",
+                        (RUNNING, now, now, f"{os.getpid()}:{threading.get_ident()}", row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2])
+
+    def _finish(self, job_id: str, status: str, result=None, error: str = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+            if status == DONE:
+                self._conn.execute("DELETE FROM checkpoints WHERE job_id = ?", (job_id,))
+
+    def _create_tables(self):
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    dedup_key TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress_done INTEGER NOT NULL DEFAULT 0,
+                    progress_total INTEGER,
+                    result TEXT,
+                    error TEXT,
+                    worker TEXT,
+                    heartbeat_at REAL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_dedup ON jobs (dedup_key, status)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    job_id TEXT NOT NULL,
+                    item_key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    PRIMARY KEY (job_id, item_key)
+                )
+            """)
@@ -0,0 +1,67 @@
+from typing import Any
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatResult
+
+from services.llm_scheduler import LLMScheduler
+from utils.tracing import record_tokens, registry
+
+
+class ScheduledChatModel(BaseChatModel):
+    """Chat model wrapper that sends every call through an LLMScheduler.
+
+    Lives apart from the scheduler so that importing lanes and ``llm_options``
+    does not import LangChain.
+    """
+
+    model: BaseChatModel
+    scheduler: Any
+    model_name: str = ""
+    expected_output_tokens: int = 256
+
+    def __init__(self, model: BaseChatModel, scheduler: LLMScheduler, **kwargs):
+        kwargs.setdefault("model_name", getattr(model, "model_name", None) or model.__class__.__name__)
+        super().__init__(model=model, scheduler=scheduler, **kwargs)
+
+    @property
+    def _llm_type(self) -> str:
+        return f"scheduled-{self.model._llm_type}"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        key = (
+            tuple((message.type, str(message.content)) for message in messages),
+            tuple(stop or ()),
+            tuple(sorted((name, repr(value)) for name, value in kwargs.items())),
+        )
+        # Rough prompt size (4 characters per token) plus the expected reply
+        estimated_tokens = sum(len(str(message.content)) for message in messages) // 4 + self.expected_output_tokens
+
+        def call():
+            result = self.model._generate(messages, stop=stop, **kwargs)
+            usage = (result.llm_output or {}).get("token_usage") or {}
+            return result, usage.get("total_tokens")
+
+        return self.scheduler.run(key, call, estimated_tokens)
+
+
+class TokenUsageCallback(BaseCallbackHandler):
+    """Counts LLM calls and prompt/completion tokens, globally and on the current trace."""
+
+    def on_llm_end(self, response, **kwargs):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens")
+        completion_tokens = usage.get("completion_tokens")
+
+        if prompt_tokens is None:
+            # Batched and streamed generations report usage on each message instead
+            prompt_tokens = completion_tokens = 0
+            for generations in response.generations:
+                for generation in generations:
+                    metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                    prompt_tokens += metadata.get("input_tokens", 0)
+                    completion_tokens += metadata.get("output_tokens", 0)
+
+        registry.inc("llm_requests_total")
+        record_tokens("prompt", prompt_tokens or 0)
+        record_tokens("completion", completion_tokens or 0)
@@ -0,0 +1,153 @@
+import csv
+import json
+
+import numpy as np
+
+from db.columnar import to_columnar
+from db.metrics_queries import MetricsQueryBuilder
+from services.risk_scoring import RISK_ZONES, RiskScoringEngine
+
+
+def parse_window(value: str) -> tuple[int, int]:
+    """Parse a "FROM-TO" week window such as "1-12"."""
+    try:
+        week_from, week_to = (int(part) for part in value.split("-", 1))
+    except ValueError:
+        raise ValueError(f"Week window must look like 1-12, got '{value}'")
+    if week_from > week_to:
+        raise ValueError(f"Week window {value} ends before it starts")
+    return week_from, week_to
+
+
+def id_shards(first_id: int, last_id: int, shard_size: int) -> list[tuple[int, int]]:
+    return [(start, min(start + shard_size - 1, last_id)) for start in range(first_id, last_id + 1, shard_size)]
+
+
+class CohortScorer:
+    """Scores every user of an id range for several week windows in one streamed scan.
+
+    Weekly rows are read in ``batch_size`` chunks and folded into per-user
+    sums and counts for each window, so memory depends on the shard size and
+    not on the number of weeks or rows.
+    """
+
+    def __init__(self, db_pool, metric_weights: dict, batch_size: int = 10000):
+        self.db_pool = db_pool
+        self.engine = RiskScoringEngine(metric_weights)
+        self.queries = MetricsQueryBuilder(self.engine.metrics)
+        self.batch_size = batch_size
+
+    def score_shard(self, first_id: int, last_id: int, windows: list[tuple[int, int]]) -> list[dict]:
+        size = last_id - first_id + 1
+        metrics = len(self.engine.metrics)
+        sums = np.zeros((len(windows), metrics, size))
+        counts = np.zeros((len(windows), metrics, size))
+
+        week_from = min(window[0] for window in windows)
+        week_to = max(window[1] for window in windows)
+        sql, params = self.queries.cohort_weeks(first_id, last_id, week_from, week_to)
+        columns = ["user_id", "week", *self.engine.metrics]
+
+        for batch in self.db_pool.fetchmany(sql, params, self.batch_size):
+            values = to_columnar(columns, [batch], key_columns=0).values
+            users = values[:, 0].astype(np.int64) - first_id
+            weeks = values[:, 1]
+            present = ~np.isnan(values[:, 2:])
+            metric_values = np.where(present, values[:, 2:], 0.0)
+            for w, (window_from, window_to) in enumerate(windows):
+                in_window = (weeks >= window_from) & (weeks <= window_to)
+                window_users = users[in_window]
+                for m in range(metrics):
+                    # NULL metrics are skipped like SQL AVG does
+                    sums[w, m] += np.bincount(window_users, weights=metric_values[in_window, m], minlength=size)
+                    counts[w, m] += np.bincount(window_users, weights=present[in_window, m], minlength=size)
+
+        emails = dict(self.db_pool.fetchall(*self.queries.emails_between(first_id, last_id)))
+        records = []
+        for w, (window_from, window_to) in enumerate(windows):
+            scored = np.flatnonzero((counts[w] > 0).all(axis=0))
+            if not len(scored):
+                continue
+
+            averages = (sums[w][:, scored] / counts[w][:, scored]).T
+            scores = self.engine.score(averages)
+            for position, offset in enumerate(scored.tolist()):
+                user_id = first_id + offset
+                record = {
+                    "user_id": user_id,
+                    "email": emails.get(user_id),
+                    "week_from": window_from,
+                    "week_to": window_to,
+                }
+                for metric, average in zip(self.engine.metrics, scores.averages[position]):
+                    record[f"avg_{metric}"] = round(float(average), 4)
+                record["subtotal"] = round(float(scores.subtotals[position]), 4)
+                record["total"] = float(scores.totals[position])
+                record["zone"] = RISK_ZONES[scores.zone_index[position]]
+                record["weakest_metric"] = scores.weakest_metric(position)
+                records.append(record)
+        return records
+
+
+class CSVExportWriter:
+    def __init__(self, path: str):
+        self._handle = open(path, "w", newline="", encoding="utf-8")
+        self._writer = None
+
+    def write(self, records: list[dict]):
+        if not records:
+            return
+        if self._writer is None:
+            self._writer = csv.DictWriter(self._handle, fieldnames=list(records[0]))
+            self._writer.writeheader()
+        self._writer.writerows(records)
+        self._handle.flush()
+
+    def close(self):
+        self._handle.close()
+
+
+class JSONLExportWriter:
+    def __init__(self, path: str):
+        self._handle = open(path, "w", encoding="utf-8")
+
+    def write(self, records: list[dict]):
+        self._handle.writelines(json.dumps(record) + "\n" for record in records)
+        self._handle.flush()
+
+    def close(self):
+        self._handle.close()
+
+
+class ParquetExportWriter:
+    """One row group per written shard; needs the optional ``pyarrow`` package."""
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet output needs pyarrow: pip install pyarrow")
+
+        self._pyarrow = pyarrow
+        self._path = path
+        self._writer = None
+
+    def write(self, records: list[dict]):
+        if not records:
+            return
+        table = self._pyarrow.Table.from_pylist(records)
+        if self._writer is None:
+            self._writer = self._pyarrow.parquet.ParquetWriter(self._path, table.schema)
+        self._writer.write_table(table.cast(self._writer.schema))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+EXPORT_WRITERS = {
+    "csv": CSVExportWriter,
+    "jsonl": JSONLExportWriter,
+    "parquet": ParquetExportWriter,
+}
@@ -0,0 +1,160 @@
+import bisect
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+
+def trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class EmailSearchIndex:
+    """In-memory autocomplete index over ``users.email``.
+
+    A sorted list answers prefix lookups with bisect and a trigram posting
+    index answers substring lookups. The index is loaded in a background
+    thread and then refreshed incrementally from rows with a higher id, so it
+    tracks new users; edits or deletes of existing emails are picked up by
+    ``reload()``. ``search`` returns None until the first load completes so
+    callers can fall back to the database.
+    """
+
+    def __init__(self, db_pool, refresh_interval: float = 30, cache_size: int = 1024, chunk_size: int = 50000):
+        self.db_pool = db_pool
+        self.refresh_interval = refresh_interval
+        self.cache_size = cache_size
+        self.chunk_size = chunk_size
+        self.ready = False
+        self._emails = []
+        self._sorted = []
+        self._postings = {}
+        self._grams_by_bigram = {}
+        self._last_id = 0
+        self._cache = OrderedDict()
+        self._lock = threading.RLock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+
+        self._thread = threading.Thread(target=self._run, name="email-search-index", daemon=True)
+        self._thread.start()
+
+    def search(self, query: str, limit: int = 10):
+        if not self.ready:
+            return None
+
+        query = query.strip().lower()
+        key = (query, limit)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+            results = self._search(query, limit)
+            self._cache[key] = results
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return results
+
+    def reload(self):
+        with self._lock:
+            self._emails = []
+            self._sorted = []
+            self._postings = {}
+            self._grams_by_bigram = {}
+            self._last_id = 0
+            self._cache.clear()
+        self.refresh()
+
+    def refresh(self) -> int:
+        """Pull users with an id above the last one seen; returns the number added."""
+        added = 0
+        while True:
+            rows = self.db_pool.fetchall(
+                "SELECT id, email FROM users WHERE id > %s ORDER BY id LIMIT %s",
+                (self._last_id, self.chunk_size)
+            )
+            if not rows:
+                break
+
+            self._add(rows, bulk=not self.ready)
+            added += len(rows)
+            if len(rows) < self.chunk_size:
+                break
+
+        if added and not self.ready:
+            with self._lock:
+                self._sorted.sort()
+        self.ready = True
+        return added
+
+    def _run(self):
+        while True:
+            try:
+                added = self.refresh()
+                if added:
+                    logging.info(f"Email search index: {added} emails added, {len(self._emails)} total")
+            except Exception as e:
+                logging.error(f"Email search index refresh failed: {e}")
+            time.sleep(self.refresh_interval)
+
+    def _add(self, rows: list[tuple], bulk: bool):
+        with self._lock:
+            for user_id, email in rows:
+                position = len(self._emails)
+                lowered = email.lower()
+                self._emails.append(email)
+                if bulk:
+                    # Sorted once after the initial load instead of per insert
+                    self._sorted.append((lowered, position))
+                else:
+                    bisect.insort(self._sorted, (lowered, position))
+                for gram in trigrams(lowered):
+                    postings = self._postings.get(gram)
+                    if postings is None:
+                        postings = self._postings[gram] = []
+                        for bigram in {gram[:2], gram[1:]}:
+                            self._grams_by_bigram.setdefault(bigram, []).append(gram)
+                    postings.append(position)
+                self._last_id = max(self._last_id, user_id)
+            self._cache.clear()
+
+    def _search(self, query: str, limit: int) -> list[str]:
+        results = []
+        seen = set()
+
+        # Prefix matches first, in email order
+        start = bisect.bisect_left(self._sorted, (query,))
+        for lowered, position in self._sorted[start:start + limit]:
+            if not lowered.startswith(query):
+                break
+            results.append(self._emails[position])
+            seen.add(position)
+
+        if len(results) < limit:
+            substring_matches = []
+            for position in self._substring_candidates(query):
+                if position not in seen and query in self._emails[position].lower():
+                    substring_matches.append(self._emails[position])
+                    seen.add(position)
+                    if len(results) + len(substring_matches) >= limit:
+                        break
+            results.extend(sorted(substring_matches, key=str.lower))
+
+        return results
+
+    def _substring_candidates(self, query: str):
+        if len(query) >= 3:
+            # Every match contains every trigram of the query, so the rarest one bounds the candidates
+            return min((self._postings.get(gram, []) for gram in trigrams(query)), key=len)
+
+        # Two-character queries: walk postings of the trigrams that contain the query
+        return (
+            position
+            for gram in self._grams_by_bigram.get(query, ())
+            for position in self._postings[gram]
+        )
@@ -0,0 +1,177 @@
+import gzip
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from utils.tracing import record_cache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class Uncacheable(Exception):
+    """Raised by a fragment builder to send ``body`` once, without caching it or giving it an ETag."""
+
+    def __init__(self, body):
+        super().__init__("Response must not be cached")
+        self.body = body
+
+
+class DataVersion:
+    """Cheap token that changes whenever users or student_metrics get new rows.
+
+    The highest ids of both tables are read at most every ``check_interval``
+    seconds; with a snapshot reader its mapped version is part of the token
+    too. Updates and deletes that keep the highest ids are not seen, so
+    cached fragments still need a TTL; ``bump()`` forces a new token.
+    """
+
+    def __init__(self, db_pool, check_interval: float = 5, snapshot=None):
+        self.db_pool = db_pool
+        self.check_interval = check_interval
+        self.snapshot = snapshot
+        self._ids = (0, 0)
+        self._bumps = 0
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> str:
+        if time.monotonic() >= self._next_check:
+            with self._lock:
+                if time.monotonic() >= self._next_check:
+                    self._next_check = time.monotonic() + self.check_interval
+                    self._read_ids()
+
+        version = f"{self._ids[0]}.{self._ids[1]}.{self._bumps}"
+        if self.snapshot is not None and self.snapshot.snapshot is not None:
+            version += f".{self.snapshot.snapshot.version}"
+        return version
+
+    def bump(self):
+        with self._lock:
+            self._bumps += 1
+
+    def _read_ids(self):
+        try:
+            row = self.db_pool.fetchall(
+                "SELECT (SELECT COALESCE(MAX(id), 0) FROM users), (SELECT COALESCE(MAX(id), 0) FROM student_metrics)"
+            )[0]
+            self._ids = (int(row[0]), int(row[1]))
+        except Exception as e:
+            # Keep the last token; fragments still expire by TTL
+            logging.error(f"Data version: could not read the latest ids: {e}")
+
+
+class CachedFragment:
+    """A rendered response body with its strong ETag and compressed variants, built on first request."""
+
+    def __init__(self, body: bytes, mimetype: str, min_compress_size: int = 1024):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.created_at = time.monotonic()
+        self.min_compress_size = min_compress_size
+        self._encoded = {}
+
+    def negotiate(self, accept_encoding: str) -> str:
+        """The encoding to send for an Accept-Encoding header: "br", "gzip" or None for the plain body."""
+        if len(self.body) < self.min_compress_size:
+            return None
+        accepted = set()
+        for part in (accept_encoding or "").lower().split(","):
+            name, _, params = part.strip().partition(";")
+            if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                accepted.add(name.strip())
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def encoded(self, encoding: str) -> bytes:
+        if encoding is None:
+            return self.body
+        if encoding not in self._encoded:
+            if encoding == "br":
+                self._encoded[encoding] = brotli.compress(self.body, quality=5)
+            else:
+                self._encoded[encoding] = gzip.compress(self.body, compresslevel=6, mtime=0)
+        return self._encoded[encoding]
+
+    def etag_for(self, encoding: str) -> str:
+        # Each encoding is its own representation, so it gets its own strong validator
+        return self.etag if encoding is None else f"{self.etag}-{encoding}"
+
+    def etags(self) -> list[str]:
+        return [self.etag, f"{self.etag}-gzip", f"{self.etag}-br"]
+
+
+class FragmentCache:
+    """LRU cache of rendered fragments keyed by route arguments and the data version.
+
+    A new data version makes every older key unreachable; those entries age
+    out of the LRU. Entries older than ``ttl`` seconds are rebuilt as well.
+    """
+
+    def __init__(self, data_version: DataVersion, max_entries: int = 512, ttl: float = 300,
+                 min_compress_size: int = 1024):
+        self.data_version = data_version
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.min_compress_size = min_compress_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, route: str, key: tuple) -> CachedFragment:
+        cache_key = (route, key, self.data_version.current())
+        with self._lock:
+            fragment = self._entries.get(cache_key)
+            if fragment is not None and time.monotonic() - fragment.created_at >= self.ttl:
+                del self._entries[cache_key]
+                fragment = None
+            if fragment is not None:
+                self._entries.move_to_end(cache_key)
+        return fragment
+
+    def get_or_build(self, route: str, key: tuple, build, mimetype: str) -> CachedFragment:
+        """Return the cached fragment or render it with ``build()``, which returns a str or bytes body.
+
+        A builder that raises Uncacheable (e.g. for an error or fallback render) stores nothing.
+        """
+        fragment = self.get(route, key)
+        if fragment is not None:
+            self.hits += 1
+            record_cache("fragment", "hit")
+            return fragment
+
+        self.misses += 1
+        record_cache("fragment", "miss")
+        version = self.data_version.current()
+        body = build()
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        fragment = CachedFragment(body, mimetype, self.min_compress_size)
+        with self._lock:
+            self._entries[(route, key, version)] = fragment
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return fragment
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "data_version": self.data_version.current(),
+            "brotli": brotli is not None,
+        }
@@ -0,0 +1,212 @@
+import contextvars
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from utils.tracing import record_cache, registry, span
+
+LANES = {"interactive": 0, "bulk": 1}
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {"RateLimitError", "APIConnectionError", "APITimeoutError", "InternalServerError"}
+
+_lane = contextvars.ContextVar("llm_lane", default="interactive")
+_coalesce = contextvars.ContextVar("llm_coalesce", default=True)
+
+
+@contextmanager
+def llm_options(lane: str = None, coalesce: bool = None):
+    """Set the priority lane and/or single-flight coalescing for LLM calls made inside the block.
+
+    Context variables follow the work into langchain batch threads and
+    utils.concurrency workers. Without a scheduler in front of the model the
+    options have no effect.
+    """
+    tokens = []
+    if lane is not None:
+        if lane not in LANES:
+            raise ValueError(f"Unknown LLM lane '{lane}'")
+        tokens.append((_lane, _lane.set(lane)))
+    if coalesce is not None:
+        tokens.append((_coalesce, _coalesce.set(coalesce)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class TokenBucket:
+    """Refills ``per_minute`` units evenly over a minute; may go negative to settle actual usage."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.available = float(per_minute)
+        self._updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.capacity / 60)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` is available; 0 when it already is. Call ``refill`` first."""
+        # A request larger than the whole bucket only waits for a full bucket
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) * 60 / self.capacity
+
+    def take(self, amount: float):
+        self.available -= amount
+
+
+class LLMScheduler:
+    """Coordinates every call to the shared chat model.
+
+    - single flight: identical prompts already in flight share one call
+    - token buckets for requests and tokens per minute
+    - at most ``max_concurrency`` calls at once, granted by lane priority
+      (interactive before bulk), FIFO within a lane
+    - retryable failures (429, 5xx, timeouts) back off with full jitter and
+      queue again, so the slot goes to the next caller meanwhile
+    """
+
+    def __init__(self, max_concurrency: int = 8, requests_per_minute: float = 500, tokens_per_minute: float = 200000,
+                 max_retries: int = 4, retry_base_delay: float = 0.5, retry_max_delay: float = 20):
+        self.max_concurrency = max(1, max_concurrency)
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.running = 0
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._condition = threading.Condition()
+
+    def run(self, key, fn, estimated_tokens: int = 0):
+        """Run ``fn`` under the limits and return its result.
+
+        ``fn`` returns ``(result, used_tokens)``, where ``used_tokens`` settles
+        the token estimate; ``key`` identifies identical requests for single
+        flight (None disables it).
+        """
+        if key is None or not _coalesce.get():
+            return self._run_with_retries(fn, estimated_tokens)
+
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        record_cache("llm_inflight", "miss" if leader else "hit")
+        if not leader:
+            return future.result()
+
+        try:
+            result = self._run_with_retries(fn, estimated_tokens)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "running": self.running,
+                "waiting": len(self._waiting),
+                "inflight": len(self._inflight),
+                "requests_available": round(self.requests.available, 1) if self.requests else None,
+                "tokens_available": round(self.tokens.available, 1) if self.tokens else None,
+            }
+
+    def _run_with_retries(self, fn, estimated_tokens: int):
+        attempt = 0
+        while True:
+            self._acquire(estimated_tokens)
+            used_tokens = None
+            try:
+                result, used_tokens = fn()
+                return result
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    raise
+                attempt += 1
+                delay = self._retry_delay(e, attempt)
+                registry.inc("llm_retries_total")
+                logging.warning(f"LLM call failed ({e.__class__.__name__}), retry {attempt} in {delay:.2f}s")
+            finally:
+                self._release(estimated_tokens, used_tokens)
+            time.sleep(delay)
+
+    def _acquire(self, estimated_tokens: int):
+        lane = _lane.get()
+        ticket = (LANES[lane], next(self._sequence))
+        with span(f"llm_queue_{lane}"), self._condition:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    timeout = None
+                    if self._waiting[0] == ticket and self.running < self.max_concurrency:
+                        timeout = self._bucket_wait(estimated_tokens)
+                        if timeout == 0:
+                            break
+                    self._condition.wait(timeout)
+            except BaseException:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+                raise
+
+            heapq.heappop(self._waiting)
+            self.running += 1
+            if self.requests:
+                self.requests.take(1)
+            if self.tokens:
+                self.tokens.take(estimated_tokens)
+            # The next waiter may also fit
+            self._condition.notify_all()
+
+    def _release(self, estimated_tokens: int, used_tokens: int = None):
+        with self._condition:
+            self.running -= 1
+            if self.tokens and used_tokens is not None:
+                # Settle the estimate against what the provider reported
+                self.tokens.take(used_tokens - estimated_tokens)
+            self._condition.notify_all()
+
+    def _bucket_wait(self, estimated_tokens: int) -> float:
+        wait = 0.0
+        if self.requests:
+            self.requests.refill()
+            wait = max(wait, self.requests.wait_time(1))
+        if self.tokens:
+            self.tokens.refill()
+            wait = max(wait, self.tokens.wait_time(estimated_tokens))
+        return wait
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+        return status in RETRYABLE_STATUS or error.__class__.__name__ in RETRYABLE_ERRORS
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            retry_after = float(headers.get("retry-after"))
+        except (TypeError, ValueError):
+            retry_after = 0.0
+        backoff = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+        return max(retry_after, backoff)
@@ -0,0 +1,118 @@
+import logging
+import random
+import threading
+import time
+
+from services.llm_scheduler import llm_options
+from utils.tracing import record_cache
+
+MESSAGE_TEMPLATE = """
+    The student's weakest metric is: {metric}.
+    The student's dropout risk zone is: {zone}.
+    Write a motivational message (15+ tokens) to help improve. Return only the message.
+"""
+
+FALLBACK_MESSAGE = "Motivational message could not be generated."
+
+
+class MotivationMessageProvider:
+    """Motivational messages per (weakest metric, risk zone).
+
+    Modes:
+        pool  - keep a small pool of messages per pair, filled with one ``batch``
+                call and refreshed by a background thread (default)
+        batch - no reuse across reports, but one ``batch`` call per report
+        llm   - one LLM call per student (legacy behaviour)
+    """
+
+    def __init__(self, llm, mode: str = "pool", pool_size: int = 3, refresh_interval: int = 3600):
+        from langchain_core.output_parsers import StrOutputParser
+        from langchain_core.prompts import ChatPromptTemplate
+        self.chain = ChatPromptTemplate.from_template(MESSAGE_TEMPLATE) | llm | StrOutputParser()
+        self.mode = mode
+        self.pool_size = max(1, pool_size)
+        self.refresh_interval = refresh_interval
+        self._pool = {}
+        self._lock = threading.Lock()
+        self._fill_lock = threading.Lock()
+        self._refresh_thread = None
+
+    def get(self, metric: str, zone: str) -> str:
+        return self.get_many([(metric, zone)])[0]
+
+    def get_many(self, pairs: list[tuple[str, str]]) -> list[str]:
+        if self.mode == "llm":
+            return [self._generate([pair])[0] for pair in pairs]
+
+        if self.mode == "batch":
+            distinct = list(dict.fromkeys(pairs))
+            messages = dict(zip(distinct, self._generate(distinct)))
+            return [messages[pair] for pair in pairs]
+
+        missing = [pair for pair in dict.fromkeys(pairs) if pair not in self._pool]
+        for pair in dict.fromkeys(pairs):
+            record_cache("message_pool", "miss" if pair in missing else "hit")
+        if missing:
+            # Concurrent reports asking for the same new pair fill it once
+            with self._fill_lock:
+                missing = [pair for pair in missing if pair not in self._pool]
+                if missing:
+                    self.refresh(missing)
+
+        return [random.choice(self._pool.get(pair) or [FALLBACK_MESSAGE]) for pair in pairs]
+
+    def refresh(self, pairs: list[tuple[str, str]] = None):
+        """Regenerate the pools for ``pairs`` (all known pairs by default) in one batch."""
+        pairs = list(pairs if pairs is not None else self._pool.keys())
+        if not pairs:
+            return
+
+        requests = [pair for pair in pairs for _ in range(self.pool_size)]
+        # The pool wants distinct variants of identical prompts, so they must not be coalesced
+        with llm_options(coalesce=False):
+            messages = self._generate(requests)
+
+        fresh = {}
+        for pair, message in zip(requests, messages):
+            if message != FALLBACK_MESSAGE:
+                fresh.setdefault(pair, []).append(message)
+
+        with self._lock:
+            for pair in pairs:
+                # A pair whose refresh failed keeps its previous pool; a new one stays missing,
+                # so the next report tries again instead of serving the fallback until the next refresh
+                if pair in fresh:
+                    self._pool[pair] = fresh[pair]
+
+    def start_background_refresh(self):
+        if self.mode != "pool" or not self.refresh_interval or self._refresh_thread is not None:
+            return
+
+        self._refresh_thread = threading.Thread(target=self._refresh_loop, name="message-pool-refresh", daemon=True)
+        self._refresh_thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                with llm_options(lane="bulk"):
+                    self.refresh()
+            except Exception as e:
+                logging.error(f"Motivational message pool refresh failed: {e}")
+
+    def _generate(self, pairs: list[tuple[str, str]]) -> list[str]:
+        inputs = [{"metric": metric.replace("_", " "), "zone": zone} for metric, zone in pairs]
+        try:
+            results = self.chain.batch(inputs, return_exceptions=True)
+        except Exception as e:
+            logging.error(f"Motivational message generation failed: {e}")
+            return [FALLBACK_MESSAGE] * len(pairs)
+
+        messages = []
+        for result in results:
+            if isinstance(result, Exception):
+                logging.error(f"Motivational message generation failed: {result}")
+                messages.append(FALLBACK_MESSAGE)
+            else:
+                messages.append(result.strip())
+        return messages
@@ -0,0 +1,131 @@
+import logging
+from pathlib import Path
+
+MIGRATION = Path(__file__).resolve().parent.parent / "db" / "migrations" / "001_create_student_metrics_prefix.sql"
+TABLE = "student_metrics_prefix"
+
+
+class MetricsAggregates:
+    """Maintains ``student_metrics_prefix``: per-user cumulative sums and counts for every week.
+
+    Besides the row count ``cnt``, each metric keeps its own count of non-NULL
+    values (``cnt_<metric>``), which its sum is divided by.
+
+    Every user has one row per week from 0 to ``max_week``, so any week range
+    average is answered from two rows (see MetricsQueryBuilder). ``refresh``
+    recomputes only weeks at or after ``from_week`` for the given users, on top
+    of the stored row for ``from_week - 1``; ``rebuild`` recreates the table
+    from scratch and swaps it in atomically.
+    """
+
+    def __init__(self, db_pool, metrics: list[str], max_week: int = 53):
+        self.db_pool = db_pool
+        self.metrics = list(metrics)
+        self.max_week = max_week
+
+    def ensure_table(self):
+        with self.db_pool.cursor(commit=True) as cursor:
+            cursor.execute(MIGRATION.read_text())
+
+    def rebuild(self):
+        self.ensure_table()
+        staging = f"{TABLE}_new"
+        with self.db_pool.cursor(commit=True) as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+            # From the migration rather than LIKE, so a rebuild also brings an older table up to date
+            cursor.execute(MIGRATION.read_text().replace(f"EXISTS {TABLE} (", f"EXISTS {staging} (", 1))
+            cursor.execute(*self._prefix_insert_sql(staging, from_week=0))
+            logging.info(f"Rebuilt {TABLE}: {cursor.rowcount} rows")
+
+        with self.db_pool.cursor(commit=True) as cursor:
+            cursor.execute(f"RENAME TABLE {TABLE} TO {TABLE}_old, {staging} TO {TABLE}")
+            cursor.execute(f"DROP TABLE {TABLE}_old")
+
+    def refresh(self, user_ids: list[int] = None, from_week: int = 1):
+        """Recompute prefix rows from ``from_week`` on, for ``user_ids`` or every user.
+
+        Users that have no prefix rows yet are built from week 0.
+        """
+        if user_ids is not None and not user_ids:
+            return
+
+        from_week = max(1, int(from_week))
+        with self.db_pool.cursor(commit=True) as cursor:
+            new_users = self._users_without_rows(cursor, user_ids)
+            known_users = None if user_ids is None else sorted(set(user_ids) - set(new_users))
+
+            if new_users:
+                cursor.execute(*self._prefix_insert_sql(TABLE, from_week=0, user_ids=new_users))
+
+            if known_users is None or known_users:
+                user_filter, params = self._user_filter("user_id", known_users, exclude=new_users)
+                cursor.execute(f"DELETE FROM {TABLE} WHERE week >= %s {user_filter}", (from_week, *params))
+                cursor.execute(*self._prefix_insert_sql(
+                    TABLE, from_week=from_week, user_ids=known_users, exclude=new_users
+                ))
+
+        logging.info(f"Refreshed {TABLE} from week {from_week} for {len(user_ids) if user_ids else 'all'} users")
+
+    def _users_without_rows(self, cursor, user_ids: list[int] = None) -> list[int]:
+        user_filter, params = self._user_filter("u.id", user_ids)
+        cursor.execute(f"""
+            SELECT u.id FROM users u
+            LEFT JOIN {TABLE} p ON p.user_id = u.id AND p.week = 0
+            WHERE p.user_id IS NULL {user_filter}
+        """, params)
+        return [row[0] for row in cursor.fetchall()]
+
+    @staticmethod
+    def _user_filter(column: str, user_ids: list[int] = None, exclude: list[int] = None) -> tuple[str, tuple]:
+        sql, params = "", ()
+        if user_ids is not None:
+            sql += f" AND {column} IN ({', '.join(['%s'] * len(user_ids))})"
+            params += tuple(user_ids)
+        if exclude:
+            sql += f" AND {column} NOT IN ({', '.join(['%s'] * len(exclude))})"
+            params += tuple(exclude)
+        return sql, params
+
+    def _prefix_insert_sql(self, table: str, from_week: int, user_ids: list[int] = None,
+                           exclude: list[int] = None) -> tuple[str, tuple]:
+        metric_sums = ", ".join(f"COUNT({m}) AS cnt_{m}, SUM({m}) AS sum_{m}" for m in self.metrics)
+        running = ",\n                ".join(
+            f"COALESCE(b.{column}, 0) + SUM(COALESCE(a.{column}, 0)) OVER running"
+            for m in self.metrics for column in (f"cnt_{m}", f"sum_{m}")
+        )
+        columns = ", ".join(f"cnt_{m}, sum_{m}" for m in self.metrics)
+        user_filter, user_params = self._user_filter("id", user_ids, exclude)
+        metrics_filter, metrics_params = self._user_filter("user_id", user_ids, exclude)
+
+        sql = f"""
+            INSERT INTO {table} (user_id, week, cnt, {columns})
+            WITH RECURSIVE weeks (week) AS (
+                SELECT %s UNION ALL SELECT week + 1 FROM weeks WHERE week < %s
+            ),
+            weekly AS (
+                SELECT user_id, week, COUNT(*) AS cnt, {metric_sums}
+                FROM student_metrics
+                WHERE week BETWEEN %s AND %s {metrics_filter}
+                GROUP BY user_id, week
+            ),
+            scope AS (
+                SELECT id AS user_id FROM users WHERE 1 = 1 {user_filter}
+            )
+            SELECT
+                s.user_id,
+                w.week,
+                COALESCE(b.cnt, 0) + SUM(COALESCE(a.cnt, 0)) OVER running,
+                {running}
+            FROM scope s
+            CROSS JOIN weeks w
+            LEFT JOIN weekly a ON a.user_id = s.user_id AND a.week = w.week
+            LEFT JOIN {table} b ON b.user_id = s.user_id AND b.week = %s
+            WINDOW running AS (PARTITION BY s.user_id ORDER BY w.week)
+        """
+        params = (
+            from_week, self.max_week,
+            from_week, self.max_week, *metrics_params,
+            *user_params,
+            from_week - 1,
+        )
+        return sql, params
@@ -1,49 +1,111 @@
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
 import logging
 
+import numpy as np
+
+from services.message_provider import MotivationMessageProvider
+from services.risk_scoring import NO_DATA_ZONE, CohortScores, RiskScoringEngine
+from utils.tracing import span
+
 class MetricsAnalyser:
-    def __init__(self, metric_weights: dict, llm):
+    def __init__(self, metric_weights: dict, llm, message_provider: MotivationMessageProvider = None):
         self.metric_weights = metric_weights
         self.llm = llm
+        self.engine = RiskScoringEngine(metric_weights)
+        self.message_provider = message_provider or MotivationMessageProvider(llm, mode="llm")
 
-    def analyse(self, metrics: list[float]):
-        metric_order = list(self.metric_weights.keys())
-        summary = []
-        subtotal = 0.0
-        min_metric = None
-        min_value = None
-
-        for metric, value in zip(metric_order, metrics):
-            weighted = round(value * self.metric_weights[metric], 2)
-            summary.append({"label": metric.replace("_", " ").title(), "value": weighted})
-            subtotal += weighted
-            if min_value is None or value < min_value:
-                min_value = value
-                min_metric = metric
-
-        total_score = round(subtotal * 100, 2)
-        motivation_zone = (
-            "Red - High Risk" if total_score <= 45 else
-            "Yellow - Moderate Risk" if total_score <= 75 else
-            "Green - Low Risk"
-        )
+    @property
+    def prefers_batch(self) -> bool:
+        return self.message_provider.mode == "batch"
+
+    def score(self, metrics: list[float]) -> dict:
+        scores = self.engine.score([metrics])
+        if scores.zone_index[0] == NO_DATA_ZONE:
+            raise ValueError(f"Failed to score metrics {metrics}: missing values")
+
+        return self._format_score(scores, 0)
 
+    def score_many(self, rows) -> list:
+        """Score a whole cohort in one engine call; malformed rows come back as None.
+
+        ``rows`` may be a students x metrics float array (e.g. ``ColumnarResult.values``),
+        which is scored as-is; rows with NaN count as malformed.
+        """
         try:
-            message_prompt = ChatPromptTemplate.from_template("""
-                The student's weakest metric is: {metric}.
-                Write a motivational message (15+ tokens) to help improve. Return only the message.
-            """)
-            message_chain = message_prompt | self.llm | StrOutputParser()
-            motivation_message = message_chain.invoke({"metric": min_metric.replace("_", " ")}).strip()
-        except Exception as e:
-            logging.error(f"Motivational message generation failed: {e}")
-            motivation_message = "Motivational message could not be generated."
+            matrix = np.asarray(rows, dtype=np.float64)
+        except (TypeError, ValueError):
+            matrix = None
+        if matrix is not None and matrix.ndim == 2 and matrix.shape[1] == len(self.engine.metrics):
+            return self._score_matrix(matrix)
+
+        valid = []
+        values = []
+        for i, metrics in enumerate(rows):
+            try:
+                row = [float(value) for value in metrics]
+                if len(row) != len(self.engine.metrics):
+                    raise ValueError(f"Expected {len(self.engine.metrics)} metrics, got {len(row)}")
+            except Exception as e:
+                logging.error(f"Failed to score metrics {metrics}: {e}")
+                continue
+            valid.append(i)
+            values.append(row)
+
+        results = [None] * len(rows)
+        if values:
+            scores = self.engine.score(values)
+            for position, i in enumerate(valid):
+                results[i] = self._format_score(scores, position)
+        return results
+
+    def _score_matrix(self, matrix: np.ndarray) -> list:
+        complete = ~np.isnan(matrix).any(axis=1)
+        valid = np.flatnonzero(complete)
+        for i in np.flatnonzero(~complete):
+            logging.error(f"Failed to score metrics {matrix[i].tolist()}: missing values")
 
+        results = [None] * len(matrix)
+        if len(valid):
+            scores = self.engine.score(matrix if complete.all() else matrix[valid])
+            for position, i in enumerate(valid.tolist()):
+                results[i] = self._format_score(scores, position)
+        return results
+
+    def _format_score(self, scores: CohortScores, i: int) -> dict:
         return {
-            "metrics": summary,
-            "metric_zone": motivation_zone,
-            "subtotal": round(subtotal, 4),
-            "total": f"{total_score}%",
-            "motivation_message": motivation_message,
-        }
\ No newline at end of file
+            "metrics": [
+                {"label": metric.replace("_", " ").title(), "value": float(value)}
+                for metric, value in zip(scores.metrics, scores.weighted[i])
+            ],
+            "metric_zone": scores.zone(i),
+            "subtotal": round(float(scores.subtotals[i]), 4),
+            "total": f"{float(scores.totals[i])}%",
+            "weakest_metric": scores.weakest_metric(i),
+        }
+
+    def analyse(self, metrics: list[float]):
+        with span("scoring"):
+            score = self.score(metrics)
+        with span("messages"):
+            message = self.message_provider.get(score["weakest_metric"], score["metric_zone"])
+
+        return self._with_message(score, message)
+
+    def analyse_many(self, rows: list[list[float]]) -> list:
+        """Score every row, then fetch all motivational messages in one provider call.
+
+        Rows that fail to score come back as None so one bad row does not sink the report.
+        """
+        with span("scoring"):
+            scores = self.score_many(rows)
+        scored = [score for score in scores if score is not None]
+        with span("messages"):
+            messages = iter(self.message_provider.get_many([(s["weakest_metric"], s["metric_zone"]) for s in scored]))
+
+        return [self._with_message(score, next(messages)) if score is not None else None for score in scores]
+
+    @staticmethod
+    def _with_message(score: dict, message: str) -> dict:
+        result = {key: value for key, value in score.items() if key != "weakest_metric"}
+        result["motivation_message"] = message
+
+        return result
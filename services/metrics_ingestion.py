@@ -0,0 +1,232 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+from services.risk_scoring import RISK_ZONES, RiskScoringEngine
+from utils.tracing import registry, span
+
+
+class MetricsIngestor:
+    """Writes weekly metric records in micro-batches and keeps every student's risk zone current.
+
+    Each student's running sums and counts per metric live in memory. A
+    student is loaded from ``student_metrics`` once, the first time a record
+    for them arrives; after that every batch only adds its own rows, so no
+    history is re-read. The zone is scored on the running averages over
+    all weeks. Students whose zone changed are passed to the subscribers
+    as dicts ``{"user_id", "week", "previous_zone", "zone", "total"}``.
+    ``previous_zone`` is None for a student without history.
+
+    Records are dicts with ``user_id``, ``week`` and metric columns. Missing
+    metrics are stored as NULL and left out of the averages, like SQL AVG.
+    """
+
+    def __init__(self, db_pool, metric_weights: dict, extra_columns=("silence",), batch_size: int = 1000,
+                 flush_interval: float = 1.0, aggregates=None, report_cache=None):
+        self.db_pool = db_pool
+        self.engine = RiskScoringEngine(metric_weights)
+        self.columns = ["user_id", "week", *self.engine.metrics, *extra_columns]
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.aggregates = aggregates
+        self.report_cache = report_cache
+        self._insert_sql = (
+            f"INSERT INTO student_metrics ({', '.join(self.columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(self.columns))})"
+        )
+        self._subscribers = []
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._rows = {}
+        self._sums = np.zeros((0, len(self.engine.metrics)))
+        self._counts = np.zeros((0, len(self.engine.metrics)))
+        self._zones = np.zeros(0, dtype=np.int8)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, callback):
+        """Call ``callback(changes)`` with the list of zone changes after every flush that has any."""
+        self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        self._subscribers.remove(callback)
+
+    def submit(self, records: list[dict]):
+        """Queue records; a full batch is flushed right away, the rest by ``flush`` or the background thread."""
+        for record in records:
+            if record.get("user_id") is None or record.get("week") is None:
+                raise ValueError(f"Metric record needs user_id and week: {record}")
+        with self._pending_lock:
+            self._pending.extend(records)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self) -> list[dict]:
+        """Write every queued record and return the zone changes they caused."""
+        changes = []
+        with self._flush_lock:
+            while True:
+                with self._pending_lock:
+                    batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+                if not batch:
+                    break
+                try:
+                    changes.extend(self._ingest(batch))
+                except Exception:
+                    # _ingest only raises before its insert is committed; keep the batch for the next flush
+                    with self._pending_lock:
+                        self._pending[:0] = batch
+                    raise
+        return changes
+
+    def zone(self, user_id: int) -> str:
+        """Current zone of a student seen by this ingestor, or None."""
+        row = self._rows.get(user_id)
+        if row is None or self._zones[row] < 0:
+            return None
+        return RISK_ZONES[self._zones[row]]
+
+    def start(self):
+        """Flush whatever is queued every ``flush_interval`` seconds in a daemon thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="metrics-ingestor", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Metrics ingestion failed: {e}")
+
+    def _ingest(self, records: list[dict]) -> list[dict]:
+        started = time.perf_counter()
+        rows = [tuple(record.get(column) for column in self.columns) for record in records]
+        user_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        metric_count = len(self.engine.metrics)
+        values = np.array([row[2:2 + metric_count] for row in rows], dtype=np.float64)
+
+        with span("ingest"):
+            # History of new students must be read before their first rows are written
+            self._load_students(sorted(set(user_ids.tolist()) - self._rows.keys()))
+            with self.db_pool.cursor(commit=True) as cursor:
+                cursor.executemany(self._insert_sql, rows)
+
+            # The rows are written; from here on a failure must not get them requeued and inserted twice
+            try:
+                positions = np.array([self._rows[user_id] for user_id in user_ids.tolist()])
+                present = ~np.isnan(values)
+                np.add.at(self._sums, positions, np.where(present, values, 0.0))
+                np.add.at(self._counts, positions, present)
+
+                changes = self._rescore(np.unique(positions), user_ids, positions, rows)
+            except Exception as e:
+                logging.error(f"Failed to update running zones after ingesting {len(rows)} rows: {e}")
+                self._forget_students(set(user_ids.tolist()))
+                changes = []
+
+        weeks = {row[1] for row in rows}
+        try:
+            if self.aggregates is not None:
+                self.aggregates.refresh(user_ids=sorted(set(user_ids.tolist())), from_week=min(weeks))
+            if self.report_cache is not None:
+                self.report_cache.invalidate_weeks(weeks)
+        except Exception as e:
+            logging.error(f"Failed to update aggregates after ingesting weeks {sorted(weeks)}: {e}")
+
+        registry.inc("ingested_rows_total", len(rows))
+        logging.info(f"Ingested {len(rows)} rows for {len(set(user_ids.tolist()))} students "
+                     f"in {time.perf_counter() - started:.3f}s; {len(changes)} zone changes")
+        if changes:
+            self._notify(changes)
+        return changes
+
+    def _load_students(self, user_ids: list[int]):
+        metric_count = len(self.engine.metrics)
+        sums = np.zeros((len(user_ids), metric_count))
+        counts = np.zeros((len(user_ids), metric_count))
+        if user_ids:
+            placeholders = ", ".join(["%s"] * len(user_ids))
+            aggregates = ", ".join(
+                [f"COUNT({m})" for m in self.engine.metrics] + [f"SUM({m})" for m in self.engine.metrics]
+            )
+            history = self.db_pool.fetchall(
+                f"SELECT user_id, {aggregates} FROM student_metrics "
+                f"WHERE user_id IN ({placeholders}) GROUP BY user_id",
+                tuple(user_ids)
+            )
+            index = {user_id: i for i, user_id in enumerate(user_ids)}
+            for row in history:
+                i = index[row[0]]
+                counts[i] = [float(value) for value in row[1:1 + metric_count]]
+                sums[i] = [float(value or 0) for value in row[1 + metric_count:]]
+
+        first = len(self._zones)
+        for offset, user_id in enumerate(user_ids):
+            self._rows[user_id] = first + offset
+        self._sums = np.concatenate([self._sums, sums])
+        self._counts = np.concatenate([self._counts, counts])
+        self._zones = np.concatenate([self._zones, self._score_zones(sums, counts)])
+
+    def _forget_students(self, user_ids: set):
+        """Drop possibly half-updated state; these students are reloaded from student_metrics on their next record."""
+        for user_id in user_ids:
+            self._rows.pop(user_id, None)
+
+    def _score_zones(self, sums: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        """Zone index per student; -1 while some metric has no value yet."""
+        zones = np.full(len(sums), -1, dtype=np.int8)
+        complete = (counts > 0).all(axis=1)
+        if complete.any():
+            zones[complete] = self.engine.score(sums[complete] / counts[complete]).zone_index
+        return zones
+
+    def _rescore(self, affected: np.ndarray, user_ids: np.ndarray, positions: np.ndarray, rows: list) -> list[dict]:
+        previous = self._zones[affected]
+        current = self._score_zones(self._sums[affected], self._counts[affected])
+        self._zones[affected] = current
+
+        changed = np.flatnonzero((previous != current) & (current >= 0))
+        if not len(changed):
+            return []
+
+        # Report each change against the latest week ingested for that student
+        latest = {}
+        for user_id, position, row in zip(user_ids.tolist(), positions.tolist(), rows):
+            if position not in latest or row[1] > latest[position][1]:
+                latest[position] = (user_id, row[1])
+
+        complete = affected[changed]
+        totals = self.engine.score(self._sums[complete] / self._counts[complete]).totals
+        changes = []
+        for i, position, total in zip(changed.tolist(), complete.tolist(), totals.tolist()):
+            user_id, week = latest[position]
+            changes.append({
+                "user_id": user_id,
+                "week": week,
+                "previous_zone": RISK_ZONES[previous[i]] if previous[i] >= 0 else None,
+                "zone": RISK_ZONES[current[i]],
+                "total": total,
+            })
+            registry.inc("risk_zone_changes_total", zone=RISK_ZONES[current[i]])
+        return changes
+
+    def _notify(self, changes: list[dict]):
+        for callback in self._subscribers:
+            try:
+                callback(changes)
+            except Exception as e:
+                logging.error(f"Zone change subscriber {callback} failed: {e}")
@@ -0,0 +1,243 @@
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils.tracing import record_cache
+
+
+class MemoryReportStore:
+    """In-process LRU of at most ``max_entries`` reports; entries older than ``max_age`` seconds are dropped."""
+
+    def __init__(self, max_entries: int = 1000, max_age: float = None):
+        self.max_entries = max(1, max_entries)
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry, time.time()):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: dict):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            now = time.time()
+            for expired in [k for k, e in self._entries.items() if self._expired(e, now)]:
+                del self._entries[expired]
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def items(self):
+        with self._lock:
+            return list(self._entries.items())
+
+    def _expired(self, entry: dict, now: float) -> bool:
+        return self.max_age is not None and now - entry["created_at"] >= self.max_age
+
+
+class FileReportStore:
+    """One JSON file per report, so cached reports survive restarts and are shared by workers."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, key: str):
+        try:
+            with open(self._path(key), encoding="utf-8") as handle:
+                return json.load(handle)["entry"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def set(self, key: str, entry: dict):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump({"key": key, "entry": entry}, handle)
+        os.replace(tmp_path, path)
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def items(self):
+        items = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as handle:
+                    data = json.load(handle)
+                items.append((data["key"], data["entry"]))
+            except (OSError, ValueError, KeyError):
+                continue
+        return items
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+
+class ReportCache:
+    """Cache of whole analysis reports with stale-while-revalidate.
+
+    Entries younger than ``ttl`` are served as-is. Entries younger than
+    ``stale_ttl`` are served immediately while one background thread
+    recomputes them. Ranking reports remember how many students they hold,
+    so a cached top-50 also answers a top-10 request.
+
+    When ``db_pool`` is given, the cache polls ``student_metrics`` at most
+    every ``check_interval`` seconds for rows with an id above the last one
+    seen. Entries whose week range covers any of those weeks are dropped.
+    """
+
+    def __init__(self, store, ttl: float = 300, stale_ttl: float = 3600, db_pool=None, check_interval: float = 10):
+        self.store = store
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.db_pool = db_pool
+        self.check_interval = check_interval
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._last_metric_id = None
+        self._next_check = 0.0
+
+    @staticmethod
+    def make_key(action: str, week_from: int, week_to: int, weights: dict, *extra) -> str:
+        weights_part = ",".join(f"{name}={weight}" for name, weight in weights.items())
+        extra_part = "|".join(str(value) for value in extra)
+        return f"{action}|{int(week_from)}|{int(week_to)}|{extra_part}|{weights_part}"
+
+    def get_or_compute(self, key: str, week_from: int, week_to: int, compute, num_students: int = None):
+        """Return the cached report for ``key`` or build it with ``compute(num_students)``.
+
+        For ranking reports pass ``num_students``; an entry built for at least
+        that many students is a hit, and callers slice the result themselves.
+        """
+        self._check_for_new_weeks()
+
+        entry = self.store.get(key)
+        if entry is not None and (num_students is None or entry["num_students"] >= num_students):
+            age = time.time() - entry["created_at"]
+            if age < self.ttl:
+                self.hits += 1
+                record_cache("report", "hit")
+                return entry["value"]
+            if age < self.stale_ttl:
+                self.stale_hits += 1
+                record_cache("report", "stale")
+                self._refresh_in_background(key, week_from, week_to, compute, entry["num_students"])
+                return entry["value"]
+
+        self.misses += 1
+        record_cache("report", "miss")
+        value = compute(num_students)
+        self._store(key, week_from, week_to, num_students, value)
+        return value
+
+    def invalidate_weeks(self, weeks):
+        weeks = {int(week) for week in weeks}
+        if not weeks:
+            return
+
+        dropped = 0
+        for key, entry in self.store.items():
+            if any(entry["week_from"] <= week <= entry["week_to"] for week in weeks):
+                self.store.delete(key)
+                dropped += 1
+        if dropped:
+            logging.info(f"Report cache: dropped {dropped} reports covering weeks {sorted(weeks)}")
+
+    def clear(self):
+        for key, _ in self.store.items():
+            self.store.delete(key)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.store.__class__.__name__,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+        }
+
+    def _store(self, key, week_from, week_to, num_students, value):
+        self.store.set(key, {
+            "created_at": time.time(),
+            "week_from": min(int(week_from), int(week_to)),
+            "week_to": max(int(week_from), int(week_to)),
+            "num_students": num_students,
+            "value": value,
+        })
+
+    def _refresh_in_background(self, key, week_from, week_to, compute, num_students):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._store(key, week_from, week_to, num_students, compute(num_students))
+            except Exception as e:
+                logging.error(f"Report cache: background refresh failed for {key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        # Run in a copy of the caller's context so the LLM lane and the request trace carry over
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(refresh,), name="report-cache-refresh", daemon=True).start()
+
+    def _check_for_new_weeks(self):
+        if self.db_pool is None or time.monotonic() < self._next_check:
+            return
+        self._next_check = time.monotonic() + self.check_interval
+
+        try:
+            if self._last_metric_id is None:
+                self._last_metric_id = self.db_pool.fetchall("SELECT COALESCE(MAX(id), 0) FROM student_metrics")[0][0]
+                return
+
+            rows = self.db_pool.fetchall(
+                "SELECT week, MAX(id) FROM student_metrics WHERE id > %s GROUP BY week",
+                (self._last_metric_id,)
+            )
+        except Exception as e:
+            logging.error(f"Report cache: could not check student_metrics for new rows: {e}")
+            return
+
+        if rows:
+            self._last_metric_id = max(row[1] for row in rows)
+            self.invalidate_weeks(row[0] for row in rows)
+
+
+def build_report_cache(backend: str, directory: str, ttl: float, stale_ttl: float, db_pool=None,
+                       check_interval: float = 10, max_entries: int = 1000):
+    if backend == "file":
+        store = FileReportStore(directory)
+    elif backend == "memory":
+        store = MemoryReportStore(max_entries=max_entries, max_age=max(stale_ttl, ttl))
+    else:
+        return None
+    return ReportCache(store, ttl=ttl, stale_ttl=stale_ttl, db_pool=db_pool, check_interval=check_interval)
@@ -0,0 +1,82 @@
+import numpy as np
+
+RISK_ZONES = ("Red - High Risk", "Yellow - Moderate Risk", "Green - Low Risk", "No Data")
+# Zone index of students with a metric that has no values at all (NaN average)
+NO_DATA_ZONE = 3
+RED_ZONE_MAX = 45
+YELLOW_ZONE_MAX = 75
+
+
+def _round(values: np.ndarray, digits: int) -> np.ndarray:
+    # Python's round() is exact on the binary value; np.round scales by 10**digits first and
+    # lands on the other side of a tie for some inputs, which would move scores and zones
+    rounded = [round(value, digits) for value in values.ravel().tolist()]
+    return np.asarray(rounded, dtype=np.float64).reshape(values.shape)
+
+
+class CohortScores:
+    """Scores for a cohort, one entry per student along the first axis."""
+
+    def __init__(self, averages, weighted, subtotals, totals, zone_index, weakest_index, metrics):
+        self.averages = averages
+        self.weighted = weighted
+        self.subtotals = subtotals
+        self.totals = totals
+        self.zone_index = zone_index
+        self.weakest_index = weakest_index
+        self.metrics = metrics
+
+    def __len__(self):
+        return len(self.subtotals)
+
+    def zone(self, i: int) -> str:
+        return RISK_ZONES[self.zone_index[i]]
+
+    def weakest_metric(self, i: int) -> str:
+        return self.metrics[self.weakest_index[i]]
+
+
+class RiskScoringEngine:
+    """Vectorized dropout-risk scoring: weighted subtotals, totals, zones and weakest metrics.
+
+    Input is either students x metrics (already averaged) or students x metrics x weeks,
+    with metrics ordered like ``metric_weights``. Missing weeks may be NaN; a student
+    with no value at all for some metric gets a NaN total and the NO_DATA_ZONE, and
+    their weakest metric is picked among the metrics that have values.
+    """
+
+    def __init__(self, metric_weights: dict):
+        self.metrics = list(metric_weights.keys())
+        self.weights = np.asarray(list(metric_weights.values()), dtype=np.float64)
+
+    def score(self, values) -> CohortScores:
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 1:
+            values = values[np.newaxis, :]
+        if values.ndim == 3:
+            values = self.averages(values)
+        if values.shape[1] != len(self.metrics):
+            raise ValueError(f"Expected {len(self.metrics)} metrics, got {values.shape[1]}")
+
+        weighted = _round(values * self.weights, 2)
+        # Added metric by metric, in the same order as a Python sum over the row
+        subtotals = np.zeros(len(weighted))
+        for column in weighted.T:
+            subtotals += column
+        totals = _round(subtotals * 100, 2)
+
+        missing = np.isnan(values).any(axis=1)
+        zone_index = np.where(totals <= RED_ZONE_MAX, 0, np.where(totals <= YELLOW_ZONE_MAX, 1, 2))
+        zone_index[missing] = NO_DATA_ZONE
+        weakest_index = np.argmin(np.where(np.isnan(values), np.inf, values), axis=1)
+
+        return CohortScores(values, weighted, subtotals, totals, zone_index, weakest_index, self.metrics)
+
+    @staticmethod
+    def averages(values) -> np.ndarray:
+        """Average students x metrics x weeks over weeks, ignoring NaN (missing) weeks."""
+        values = np.asarray(values, dtype=np.float64)
+        counts = np.sum(~np.isnan(values), axis=2)
+        sums = np.nansum(values, axis=2)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return sums / counts
@@ -0,0 +1,228 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+
+def normalize_question(question: str) -> str:
+    """Collapse whitespace and case so reformatted prompts share one entry."""
+    return re.sub(r"\s+", " ", question).strip().lower()
+
+
+def schema_fingerprint(schema: str) -> str:
+    return hashlib.sha256(schema.encode("utf-8")).hexdigest()
+
+
+class SQLCache(ABC):
+    """Generated-SQL cache keyed by normalized question, schema hash and model name.
+
+    Entries written under a different schema hash are dropped as soon as a new
+    hash is seen, so a migration never serves SQL written for the old schema.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._schema_hash = None
+        self._lock = threading.Lock()
+
+    def get(self, question: str, schema: str, model: str):
+        schema_hash = schema_fingerprint(schema)
+        with self._lock:
+            self._check_schema(schema_hash)
+            sql = self._get(self._key(question, schema_hash, model))
+            if sql is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return sql
+
+    def set(self, question: str, schema: str, model: str, sql: str):
+        schema_hash = schema_fingerprint(schema)
+        with self._lock:
+            self._check_schema(schema_hash)
+            self._set(self._key(question, schema_hash, model), schema_hash, sql)
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.__class__.__name__,
+                "size": self._size(),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _check_schema(self, schema_hash: str):
+        if self._schema_hash != schema_hash:
+            self.invalidations += self._drop_other_schemas(schema_hash)
+            self._schema_hash = schema_hash
+
+    @staticmethod
+    def _key(question: str, schema_hash: str, model: str) -> str:
+        raw = f"{model}\x00{schema_hash}\x00{normalize_question(question)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @abstractmethod
+    def _get(self, key: str):
+        ...
+
+    @abstractmethod
+    def _set(self, key: str, schema_hash: str, sql: str):
+        ...
+
+    @abstractmethod
+    def _drop_other_schemas(self, schema_hash: str) -> int:
+        ...
+
+    @abstractmethod
+    def _clear(self):
+        ...
+
+    @abstractmethod
+    def _size(self) -> int:
+        ...
+
+
+class NullSQLCache(SQLCache):
+    def _get(self, key):
+        return None
+
+    def _set(self, key, schema_hash, sql):
+        pass
+
+    def _drop_other_schemas(self, schema_hash):
+        return 0
+
+    def _clear(self):
+        pass
+
+    def _size(self):
+        return 0
+
+
+class MemorySQLCache(SQLCache):
+    """In-process LRU with a per-entry TTL (0 disables expiry)."""
+
+    def __init__(self, max_size: int = 256, ttl: int = 3600):
+        super().__init__()
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        _, sql, created_at = entry
+        if self.ttl and time.time() - created_at > self.ttl:
+            del self._entries[key]
+            self.evictions += 1
+            return None
+
+        self._entries.move_to_end(key)
+        return sql
+
+    def _set(self, key, schema_hash, sql):
+        self._entries[key] = (schema_hash, sql, time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _drop_other_schemas(self, schema_hash):
+        stale = [key for key, entry in self._entries.items() if entry[0] != schema_hash]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def _clear(self):
+        self._entries.clear()
+
+    def _size(self):
+        return len(self._entries)
+
+
+class SQLiteSQLCache(SQLCache):
+    """On-disk LRU/TTL cache that survives process restarts."""
+
+    def __init__(self, path: str, max_size: int = 4096, ttl: int = 86400):
+        super().__init__()
+        self.max_size = max_size
+        self.ttl = ttl
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS sql_cache (
+                key TEXT PRIMARY KEY,
+                schema_hash TEXT NOT NULL,
+                sql TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def _get(self, key):
+        row = self.conn.execute("SELECT sql, created_at FROM sql_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        sql, created_at = row
+        now = time.time()
+        if self.ttl and now - created_at > self.ttl:
+            self.conn.execute("DELETE FROM sql_cache WHERE key = ?", (key,))
+            self.conn.commit()
+            self.evictions += 1
+            return None
+
+        self.conn.execute("UPDATE sql_cache SET last_used = ? WHERE key = ?", (now, key))
+        self.conn.commit()
+        return sql
+
+    def _set(self, key, schema_hash, sql):
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO sql_cache (key, schema_hash, sql, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+            (key, schema_hash, sql, now, now)
+        )
+        overflow = self._size() - self.max_size
+        if overflow > 0:
+            self.conn.execute(
+                "DELETE FROM sql_cache WHERE key IN (SELECT key FROM sql_cache ORDER BY last_used LIMIT ?)",
+                (overflow,)
+            )
+            self.evictions += overflow
+        self.conn.commit()
+
+    def _drop_other_schemas(self, schema_hash):
+        deleted = self.conn.execute("DELETE FROM sql_cache WHERE schema_hash != ?", (schema_hash,)).rowcount
+        self.conn.commit()
+        return deleted
+
+    def _clear(self):
+        self.conn.execute("DELETE FROM sql_cache")
+        self.conn.commit()
+
+    def _size(self):
+        return self.conn.execute("SELECT COUNT(*) FROM sql_cache").fetchone()[0]
+
+
+def build_sql_cache(backend: str, max_size: int, ttl: int, path: str = None) -> SQLCache:
+    if backend == "sqlite":
+        return SQLiteSQLCache(path or "sql_cache.sqlite3", max_size=max_size, ttl=ttl)
+    if backend == "memory":
+        return MemorySQLCache(max_size=max_size, ttl=ttl)
+    return NullSQLCache()
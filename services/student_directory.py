@@ -0,0 +1,71 @@
+import base64
+import threading
+import time
+
+
+def encode_cursor(email: str) -> str:
+    return base64.urlsafe_b64encode(email.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> str:
+    padding = "=" * (-len(token) % 4)
+    return base64.urlsafe_b64decode(token + padding).decode("utf-8")
+
+
+class StudentDirectory:
+    """Student listing with keyset pagination on email and a short-lived cached total."""
+
+    def __init__(self, db_pool, count_ttl: float = 60):
+        self.db_pool = db_pool
+        self.count_ttl = count_ttl
+        self._count = None
+        self._count_expires = 0.0
+        self._lock = threading.Lock()
+
+    def count(self) -> int:
+        if self._count is not None and time.monotonic() < self._count_expires:
+            return self._count
+
+        with self._lock:
+            if self._count is None or time.monotonic() >= self._count_expires:
+                self._count = self.db_pool.fetchall("SELECT COUNT(*) FROM users")[0][0]
+                self._count_expires = time.monotonic() + self.count_ttl
+        return self._count
+
+    def invalidate_count(self):
+        self._count_expires = 0.0
+
+    def page(self, after: str = None, before: str = None, per_page: int = 10) -> dict:
+        """Return one page of emails plus opaque next/prev cursors.
+
+        ``after`` pages forward from a cursor, ``before`` pages backward; with
+        neither the first page is returned. Every page is an index range scan
+        on email, so deep pages cost the same as the first one.
+        """
+        if before:
+            rows = self.db_pool.fetchall(
+                "SELECT email FROM users WHERE email < %s ORDER BY email DESC LIMIT %s",
+                (decode_cursor(before), per_page + 1)
+            )
+            has_prev = len(rows) > per_page
+            emails = [row[0] for row in rows[:per_page]][::-1]
+            has_next = True
+        elif after:
+            rows = self.db_pool.fetchall(
+                "SELECT email FROM users WHERE email > %s ORDER BY email LIMIT %s",
+                (decode_cursor(after), per_page + 1)
+            )
+            has_next = len(rows) > per_page
+            emails = [row[0] for row in rows[:per_page]]
+            has_prev = True
+        else:
+            rows = self.db_pool.fetchall("SELECT email FROM users ORDER BY email LIMIT %s", (per_page + 1,))
+            has_next = len(rows) > per_page
+            emails = [row[0] for row in rows[:per_page]]
+            has_prev = False
+
+        return {
+            "students": [{"email": email} for email in emails],
+            "next_cursor": encode_cursor(emails[-1]) if emails and has_next else None,
+            "prev_cursor": encode_cursor(emails[0]) if emails and has_prev else None,
+        }
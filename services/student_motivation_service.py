@@ -1,78 +1,66 @@
-from decimal import Decimal
 from typing import Dict, Any
-import psycopg2
-import statistics
+
+import numpy as np
+
 from config.settings import Settings
+from db.columnar import to_columnar
+from db.metrics_queries import MetricsQueryBuilder
+from dependencies.container import container
+from services.risk_scoring import NO_DATA_ZONE, RiskScoringEngine
 
 class StudentMotivationService:
     def __init__(self):
-        self.conn = psycopg2.connect(Settings.mysql_dsn())
-        self.cursor = self.conn.cursor()
-        self.weights = {
-            "homework_submitted": Decimal(Settings.WEIGHT_HOMEWORK_SUBMITTED),
-            "homework_on_time": Decimal(Settings.WEIGHT_HOMEWORK_ON_TIME),
-            "homework_score": Decimal(Settings.WEIGHT_HOMEWORK_SCORE),
-            "attendance": Decimal(Settings.WEIGHT_ATTENDANCE),
-            "student_participation": Decimal(Settings.WEIGHT_STUDENT_PARTICIPATION),
-            "teacher_participation": Decimal(Settings.WEIGHT_TEACHER_PARTICIPATION),
-            "silence": Decimal(Settings.WEIGHT_SILENCE),
-            "test_score": Decimal(Settings.WEIGHT_TEST_SCORE),
-        }
+        self.db_pool = container.db_pool
+        self.weights = Settings.metric_weights()
+        self.engine = RiskScoringEngine(self.weights)
+        self.queries = MetricsQueryBuilder(
+            self.engine.metrics,
+            use_aggregates=Settings.METRIC_AGGREGATES,
+            max_week=Settings.MAX_WEEK
+        )
 
     def calculate_motivation(self, email: str, week_from: int, week_to: int) -> Dict[str, Any]:
-        self.cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
-        row = self.cursor.fetchone()
-        if not row:
-            return {"error": "Student not found"}
-        user_id = row[0]
+        columns = ", ".join(self.engine.metrics)
+        with self.db_pool.cursor() as cursor:
+            cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
+            row = cursor.fetchone()
+            if not row:
+                return {"error": "Student not found"}
+            user_id = row[0]
 
-        self.cursor.execute("""
-            SELECT
-                homework_submitted,
-                homework_on_time,
-                homework_score,
-                attendance,
-                student_participation,
-                test_score
-            FROM student_metrics
-            WHERE user_id = %s AND week BETWEEN %s AND %s
-        """, (user_id, week_from, week_to))
+            if self.queries.use_aggregates:
+                # Range averages straight from the prefix table
+                cursor.execute(*self.queries.student_averages(email, week_from, week_to))
+                rows = cursor.fetchall()
+                values = [[float(value) for value in rows[0]]] if rows else None
+            else:
+                cursor.execute(f"""
+                    SELECT {columns}
+                    FROM student_metrics
+                    WHERE user_id = %s AND week BETWEEN %s AND %s
+                """, (user_id, week_from, week_to))
+                weeks = to_columnar(self.engine.metrics, [cursor.fetchall()], key_columns=0)
+                # One student x metrics x weeks, as a transposed view of the weeks x metrics matrix
+                values = weeks.values.T[np.newaxis] if len(weeks) else None
 
-        rows = self.cursor.fetchall()
-        if not rows:
+        if values is None:
             return {"error": "No data for given weeks"}
 
-        metrics = list(zip(*rows))
+        scores = self.engine.score(values)
+        if scores.zone_index[0] == NO_DATA_ZONE:
+            return {"error": "No data for some metrics in the given weeks"}
 
         averages = {
-            "homework_submitted": round(statistics.mean(metrics[0]), 4),
-            "homework_on_time": round(statistics.mean(metrics[1]), 4),
-            "homework_score": round(statistics.mean(metrics[2]), 4),
-            "attendance": round(statistics.mean(metrics[3]), 4),
-            "student_participation": round(statistics.mean(metrics[4]), 4),
-            # "teacher_participation": round(statistics.mean(metrics[5]), 4),
-            # "silence": round(statistics.mean(metrics[6]), 4),
-            "test_score": round(statistics.mean(metrics[7]), 4),
+            metric: round(float(value), 4)
+            for metric, value in zip(scores.metrics, scores.averages[0])
         }
 
-        # Calculate subtotal и total
-        subtotal = sum(averages[key] * self.weights[key] for key in averages)
-        total = round(subtotal * 100, 2)
-
-        # Find the lowest
-        lowest_metric = min(
-            {k: v for k, v in averages.items()}, key=averages.get
-        )
-
         return {
             "student": email,
             "weeks": f"{week_from} to {week_to}",
             "averages": averages,
-            "subtotal": float(round(subtotal, 4)),
-            "total": float(total),
-            "lowest_metric": lowest_metric
+            "subtotal": round(float(scores.subtotals[0]), 4),
+            "total": float(scores.totals[0]),
+            "lowest_metric": scores.weakest_metric(0)
         }
 
-    def __del__(self):
-        self.cursor.close()
-        self.conn.close()
\ No newline at end of file
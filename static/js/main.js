@@ -15,6 +15,32 @@ document.addEventListener("DOMContentLoaded", function () {
         if (preloader) preloader.style.display = 'none';
     }
 
+    // Last body and ETag per URL; repeat views are revalidated with If-None-Match and come back as 304s
+    const responseCache = new Map();
+    const RESPONSE_CACHE_SIZE = 100;
+
+    async function fetchCached(url) {
+        const cached = responseCache.get(url);
+        const response = await fetch(url, {
+            headers: cached ? { 'If-None-Match': cached.etag } : {},
+            cache: 'no-store',
+        });
+        if (response.status === 304 && cached) {
+            return cached.body;
+        }
+
+        const body = await response.text();
+        const etag = response.headers.get('ETag');
+        responseCache.delete(url);
+        if (response.ok && etag) {
+            responseCache.set(url, { etag, body });
+            if (responseCache.size > RESPONSE_CACHE_SIZE) {
+                responseCache.delete(responseCache.keys().next().value);
+            }
+        }
+        return body;
+    }
+
     async function sendRequest(path, data, method = 'POST') {
         const response = await fetch(`${API_BASE_URL}/${path}`, {
             method: method,
@@ -24,6 +50,20 @@ document.addEventListener("DOMContentLoaded", function () {
         return await response.json();
     }
 
+    // Single-student and ranking analyses go out as GET so they can be revalidated; email lists
+    // (up to a whole table page) stay in a POST body to keep clear of URL length limits
+    async function requestAnalysis(data) {
+        if (data.action === 'analyse_students' || Array.isArray(data.emails)) {
+            return await sendRequest('analysis', data);
+        }
+        const params = new URLSearchParams();
+        Object.entries(data).forEach(([key, value]) => {
+            if (value === undefined || value === null || value === '') return;
+            params.set(key, value);
+        });
+        return JSON.parse(await fetchCached(`${API_BASE_URL}/analysis?${params}`));
+    }
+
     // Tab switching
     document.querySelectorAll('#analysisTabs .nav-link').forEach(link => {
         link.addEventListener('click', function (e) {
@@ -42,12 +82,14 @@ document.addEventListener("DOMContentLoaded", function () {
     });
 
     // Load student table
-    window.fetchStudents = async function (page = 1) {
+    // Pages are addressed by an opaque email cursor; "page" only drives the "Page N of M" label
+    window.fetchStudents = async function (page = 1, cursor = '', direction = 'after') {
         showLoader();
         analysisBlock.innerHTML = '';
         studentTableBlock.innerHTML = '';
-        const response = await fetch(`${API_BASE_URL}/students?page=${page}`);
-        studentTableBlock.innerHTML = await response.text();
+        const params = new URLSearchParams({ page: Math.max(1, page) });
+        if (cursor) params.set(direction, cursor);
+        studentTableBlock.innerHTML = await fetchCached(`${API_BASE_URL}/students?${params}`);
         hideLoader();
     };
 
@@ -67,7 +109,29 @@ document.addEventListener("DOMContentLoaded", function () {
             num_students: 1
         };
 
-        const data = await sendRequest('analysis', payload);
+        const data = await requestAnalysis(payload);
+        if (data.html) {
+            analysisBlock.innerHTML = data.html;
+        } else {
+            analysisBlock.innerHTML = `<p class="text-danger">${data.error || 'Unknown error'}</p>`;
+        }
+        hideLoader();
+    };
+
+    // Analysis of every student on the current table page, in one request
+    window.showPageAnalysis = async function () {
+        showLoader();
+        const emails = Array.from(studentTableBlock.querySelectorAll('tr[data-email]')).map(row => row.dataset.email);
+        analysisBlock.innerHTML = '';
+
+        const payload = {
+            action: 'analyse_students',
+            emails,
+            week_from: document.getElementById('week_from').value,
+            week_to: document.getElementById('week_to').value
+        };
+
+        const data = await requestAnalysis(payload);
         if (data.html) {
             analysisBlock.innerHTML = data.html;
         } else {
@@ -92,7 +156,7 @@ document.addEventListener("DOMContentLoaded", function () {
                 num_students: 1
             };
 
-            const data = await sendRequest('analysis', payload);
+            const data = await requestAnalysis(payload);
             if (data.html) {
                 outputBlock.innerHTML = data.html;
             } else {
@@ -124,7 +188,7 @@ document.addEventListener("DOMContentLoaded", function () {
                 num_students: number
             };
 
-            const data = await sendRequest('analysis', payload);
+            const data = await requestAnalysis(payload);
             if (data.html) {
                 motivatedResults.innerHTML = data.html;
             } else {
@@ -157,8 +221,7 @@ document.addEventListener("DOMContentLoaded", function () {
 
             autocompleteTimeout = setTimeout(async () => {
                 try {
-                    const res = await fetch(`${API_BASE_URL}/search-students?q=${encodeURIComponent(query)}`);
-                    const emails = await res.json();
+                    const emails = JSON.parse(await fetchCached(`${API_BASE_URL}/search-students?q=${encodeURIComponent(query)}`));
 
                     resultBox.innerHTML = '';
                     emails.forEach(email => {
@@ -0,0 +1,48 @@
+ANALYSIS_ACTIONS = ("analyse_student", "analyse_students", "most_motivated", "less_motivated")
+
+
+class InvalidAnalysisRequest(ValueError):
+    """Bad /analysis input; both apps answer it with a 400."""
+
+
+def is_true(value) -> bool:
+    # JSON bodies carry booleans, GET query parameters carry strings such as "0" or "false"
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes")
+    return bool(value)
+
+
+def parse_analysis_request(data: dict) -> dict:
+    """Validate an /analysis JSON body or query string, shared by the Flask and FastAPI apps.
+
+    Weeks and ``num_students`` become ints, ``emails`` a list (a string is
+    split on commas) and ``background``/``trace`` booleans.
+    """
+    action = data.get("action")
+    if action not in ANALYSIS_ACTIONS:
+        raise InvalidAnalysisRequest("Unknown action")
+    try:
+        week_from, week_to = int(data.get("week_from")), int(data.get("week_to"))
+    except (TypeError, ValueError):
+        raise InvalidAnalysisRequest("week_from and week_to must be integers")
+    try:
+        num_students = int(data.get("num_students", 1))
+    except (TypeError, ValueError):
+        raise InvalidAnalysisRequest("num_students must be an integer")
+
+    emails = data.get("emails")
+    if isinstance(emails, str):
+        emails = emails.split(",")
+
+    return {
+        "action": action,
+        "week_from": week_from,
+        "week_to": week_to,
+        "email": data.get("email"),
+        "num_students": num_students,
+        "emails": emails or None,
+        "after": data.get("after") or None,
+        "before": data.get("before") or None,
+        "background": is_true(data.get("background")),
+        "trace": is_true(data.get("trace")),
+    }
@@ -0,0 +1,93 @@
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+
+def run_bounded(fn, items: list, max_workers: int, timeout: float = None) -> list:
+    """Run ``fn`` over ``items`` with at most ``max_workers`` calls in flight.
+
+    Results keep the order of ``items``. A call that raises, or that is still
+    running ``timeout`` seconds after it started, is returned as the exception
+    instance instead of cancelling the others.
+    """
+    if not items:
+        return []
+
+    started = {}
+
+    def call(index, item):
+        started[index] = time.monotonic()
+        return fn(item)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))))
+    # Each call runs in a copy of the caller's context so request tracing follows it into the workers
+    futures = {
+        executor.submit(contextvars.copy_context().run, call, index, item): index
+        for index, item in enumerate(items)
+    }
+    results = [None] * len(items)
+    pending = set(futures)
+
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=_next_deadline(pending, futures, started, timeout),
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    results[index] = e
+
+            if timeout is not None:
+                now = time.monotonic()
+                for future in list(pending):
+                    index = futures[future]
+                    if index in started and now - started[index] >= timeout:
+                        results[index] = TimeoutError(f"Item {index} timed out after {timeout}s")
+                        pending.discard(future)
+    finally:
+        # Timed-out calls cannot be interrupted; let them finish in the background
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results
+
+
+def iter_bounded(fn, items: list, max_workers: int):
+    """Yield ``(index, result)`` for ``fn`` over ``items`` as each call finishes.
+
+    A call that raises yields its exception instead of stopping the others.
+    Closing the generator early cancels calls that have not started yet.
+    """
+    if not items:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))))
+    futures = {
+        executor.submit(contextvars.copy_context().run, fn, item): index
+        for index, item in enumerate(items)
+    }
+    try:
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as e:
+                yield futures[future], e
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _next_deadline(pending, futures, started, timeout):
+    if timeout is None:
+        return None
+
+    now = time.monotonic()
+    remaining = [
+        started[futures[future]] + timeout - now
+        for future in pending
+        if futures[future] in started
+    ]
+    if len(remaining) < len(pending):
+        # Queued items start their clock when a worker picks them up; poll for that
+        remaining.append(0.05)
+    return max(0.0, min(remaining))
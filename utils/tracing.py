@@ -0,0 +1,182 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers cache hits and fast queries up to long LLM-bound reports
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_current_trace = contextvars.ContextVar("trace", default=None)
+
+
+class MetricsRegistry:
+    """Process-wide histograms and counters, rendered in the Prometheus text format."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._histograms = {}
+        self._counters = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram["counts"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def render(self) -> str:
+        with self._lock:
+            histograms = {key: dict(value, counts=list(value["counts"])) for key, value in self._histograms.items()}
+            counters = dict(self._counters)
+
+        lines = []
+        for name in sorted({key[0] for key in histograms}):
+            self._header(lines, name, "histogram")
+            for (metric, labels), histogram in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, count in zip(self.buckets, histogram["counts"]):
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))} {count}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(histogram['sum'])}")
+                lines.append(f"{name}_count{_labels(labels)} {histogram['count']}")
+
+        for name in sorted({key[0] for key in counters}):
+            self._header(lines, name, "counter")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines: list, name: str, kind: str):
+        if name in self._help:
+            lines.append(f"# HELP {name} {self._help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+
+class Trace:
+    """Per-request breakdown: spans, LLM token counts and cache hits.
+
+    Spans recorded from worker threads land here too, as long as the work was
+    submitted with the request's context (see utils.concurrency).
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+        self.tokens = {}
+        self.cache = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, stage: str, start: float, seconds: float):
+        with self._lock:
+            self.spans.append((stage, start - self.started, seconds))
+
+    def add_tokens(self, kind: str, count: int):
+        with self._lock:
+            self.tokens[kind] = self.tokens.get(kind, 0) + count
+
+    def add_cache(self, cache: str, result: str):
+        with self._lock:
+            counts = self.cache.setdefault(cache, {})
+            counts[result] = counts.get(result, 0) + 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span[1])
+            stages = {}
+            for stage, _, seconds in spans:
+                totals = stages.setdefault(stage, {"count": 0, "ms": 0.0})
+                totals["count"] += 1
+                totals["ms"] += seconds * 1000
+
+            return {
+                "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+                "stages": {stage: {"count": t["count"], "ms": round(t["ms"], 2)} for stage, t in stages.items()},
+                "spans": [
+                    {"stage": stage, "start_ms": round(offset * 1000, 2), "ms": round(seconds * 1000, 2)}
+                    for stage, offset, seconds in spans
+                ],
+                "tokens": dict(self.tokens),
+                "cache": {cache: dict(counts) for cache, counts in self.cache.items()},
+            }
+
+
+registry = MetricsRegistry()
+registry.describe("analysis_stage_seconds", "Time spent per pipeline stage")
+registry.describe("http_request_seconds", "Request latency per endpoint")
+registry.describe("llm_requests_total", "LLM calls")
+registry.describe("llm_tokens_total", "LLM tokens by type")
+registry.describe("cache_requests_total", "Cache lookups by cache and result")
+registry.describe("http_not_modified_total", "Conditional requests answered with 304 Not Modified")
+registry.describe("sql_guard_total", "Generated SQL vetted by the guard, by result")
+registry.describe("ingested_rows_total", "Weekly metric rows written by the ingestor")
+registry.describe("risk_zone_changes_total", "Students whose running risk zone changed, by new zone")
+
+
+def start_trace() -> Trace:
+    trace = Trace()
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def span(stage: str):
+    """Time a pipeline stage into ``analysis_stage_seconds`` and the current trace, if any."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        registry.observe("analysis_stage_seconds", seconds, stage=stage)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_span(stage, start, seconds)
+
+
+def record_cache(cache: str, result: str):
+    """Count a cache lookup; ``result`` is "hit", "miss" or "stale"."""
+    registry.inc("cache_requests_total", cache=cache, result=result)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_cache(cache, result)
+
+
+def record_tokens(kind: str, count: int):
+    if not count:
+        return
+    registry.inc("llm_tokens_total", count, type=kind)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_tokens(kind, count)
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))